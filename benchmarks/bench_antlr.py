@@ -0,0 +1,102 @@
+"""
+Compare the two ways of parsing with ANTLR: building and walking a parse tree ("tree") against reading transitions off
+the token stream with SLL-first prediction ("treeless"). Each phase is timed separately: lexing, parsing (prediction
+plus tree building) and extracting the transitions.
+
+Usage: python benchmarks/bench_antlr.py [--transitions N] [--tapes T] [--repeat R]
+"""
+
+import argparse
+import time
+
+from varphi_devkit import VarphiCompiler
+from varphi_devkit.antlr import (
+    BailErrorStrategy,
+    CommonTokenStream,
+    InputStream,
+    ParseTreeWalker,
+    PredictionMode,
+    VarphiLexer,
+    VarphiParser,
+)
+
+from programs import generate_program
+
+
+class NullCompiler(VarphiCompiler):
+    frontend = "antlr"
+
+    def handle_transition(self, transition):
+        pass
+
+    def generate_compiled_program(self):
+        return ""
+
+
+def time_phases(program: str, mode: str) -> dict:
+    """Time the lexing, parsing and extraction phases of one ANTLR parse in the given mode."""
+    start = time.perf_counter()
+    token_stream = CommonTokenStream(VarphiLexer(InputStream(program)))
+    token_stream.fill()
+    lexed = time.perf_counter()
+
+    token_stream.seek(0)
+    parser = VarphiParser(token_stream)
+    parser.removeErrorListeners()
+    if mode == "treeless":
+        parser.buildParseTrees = False
+        parser._interp.predictionMode = PredictionMode.SLL
+        parser._errHandler = BailErrorStrategy()
+    tree = parser.program()
+    parsed = time.perf_counter()
+
+    compiler = NullCompiler()
+    with compiler._session_scope() as session:
+        if mode == "treeless":
+            compiler._handle_tokens(session, token_stream.tokens)
+        else:
+            ParseTreeWalker().walk(compiler, tree)
+    extracted = time.perf_counter()
+
+    compiler = NullCompiler()
+    compiler.antlr_mode = mode
+    compiler.compile(program)
+    total = time.perf_counter() - extracted
+    return {
+        "lex": lexed - start,
+        "parse": parsed - lexed,
+        "extract": extracted - parsed,
+        "compile": total,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare parsing with ANTLR through a parse tree and off the token stream."
+    )
+    parser.add_argument("--transitions", type=int, default=5000)
+    parser.add_argument("--tapes", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    program = generate_program(
+        args.transitions, tapes=args.tapes, variable_density=0.4, comment_density=0
+    )
+    # Warm up the DFA caches, which are shared by every parser
+    NullCompiler().compile(program)
+
+    phases = ("lex", "parse", "extract", "compile")
+    print(f"{args.transitions} transitions, {args.tapes} tapes (best of {args.repeat})")
+    print(f"{'mode':10}" + "".join(f"{phase:>12}" for phase in phases))
+    for mode in ("tree", "treeless"):
+        runs = [time_phases(program, mode) for _ in range(args.repeat)]
+        print(
+            f"{mode:10}"
+            + "".join(
+                f"{min(r[phase] for r in runs) * 1000:9.1f} ms" for phase in phases
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
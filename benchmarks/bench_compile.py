@@ -0,0 +1,223 @@
+"""
+Measure the throughput of each phase of compiling a synthetic program, with both front ends.
+
+Fast front end: scanning (lexing and parsing lines by hand), building transitions (validation and canonicalization,
+the latter also timed on its own, with an empty cache) and dispatching them to a backend (one at a time, and in
+batches). ANTLR front end: lexing, parsing (treeless, and building a parse tree), walking the parse tree and extracting
+the transitions off the token stream. End-to-end compiles are timed for both. Each phase reports transitions/s and
+µs/line (best of the repeats), and the results can be written as JSON to compare devkit versions and machines.
+
+Usage: python benchmarks/bench_compile.py [--lines N] [--states S] [--tapes T] [--variable-density D]
+                                          [--comment-density D] [--seed N] [--repeat R] [--frontends fast,antlr]
+                                          [--json PATH]
+"""
+
+import argparse
+import datetime
+import importlib.metadata
+import io
+import json
+import platform
+import sys
+import time
+from typing import Callable
+
+from varphi_devkit import VarphiCompiler
+from varphi_devkit.compiler import _canonicalize_variables
+from varphi_devkit.scanner import scan
+
+from programs import generate_program
+
+
+class NullCompiler(VarphiCompiler):
+    def handle_transition(self, transition):
+        pass
+
+    def generate_compiled_program(self):
+        return ""
+
+
+class NullBatchCompiler(NullCompiler):
+    def handle_transitions(self, transitions):
+        pass
+
+
+def best_time(function: Callable[[], object], repeat: int) -> float:
+    """Run a function repeat times, and return its shortest duration."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def fast_phases(program: str, repeat: int) -> dict[str, float]:
+    """Time the phases of the fast front end."""
+    compiler = NullCompiler()
+    session = compiler._open_session()
+
+    def scan_program():
+        return [raw for raw, _, _ in scan(io.StringIO(program, newline="\n"))]
+
+    raws = scan_program()
+
+    def canonicalize():
+        _canonicalize_variables.cache_clear()
+        for raw in raws:
+            _canonicalize_variables(raw[1], raw[3])
+
+    def build():
+        session.expected_tape_count = None
+        return [compiler._build_transition(session, raw) for raw in raws]
+
+    transitions = build()
+
+    def dispatch(backend: VarphiCompiler) -> Callable[[], None]:
+        def run():
+            with backend._session_scope() as backend_session:
+                backend._dispatch_transitions(backend_session, transitions)
+
+        return run
+
+    return {
+        "fast.scan": best_time(scan_program, repeat),
+        "fast.canonicalize": best_time(canonicalize, repeat),
+        "fast.build": best_time(build, repeat),
+        "fast.dispatch": best_time(dispatch(NullCompiler()), repeat),
+        "fast.dispatch_batched": best_time(dispatch(NullBatchCompiler()), repeat),
+        "fast.compile": best_time(lambda: NullCompiler().compile(program), repeat),
+    }
+
+
+def antlr_phases(program: str, repeat: int) -> dict[str, float]:
+    """Time the phases of the ANTLR front end."""
+    from varphi_devkit.antlr import (
+        BailErrorStrategy,
+        CommonTokenStream,
+        InputStream,
+        ParseTreeWalker,
+        PredictionMode,
+        VarphiLexer,
+        VarphiParser,
+    )
+
+    def lex():
+        token_stream = CommonTokenStream(VarphiLexer(InputStream(program)))
+        token_stream.fill()
+        return token_stream
+
+    def parser(tree: bool) -> VarphiParser:
+        token_stream.seek(0)
+        parser = VarphiParser(token_stream)
+        parser.removeErrorListeners()
+        if not tree:
+            parser.buildParseTrees = False
+            parser._interp.predictionMode = PredictionMode.SLL
+            parser._errHandler = BailErrorStrategy()
+        return parser
+
+    token_stream = lex()
+    tree = parser(True).program()
+    compiler = NullCompiler()
+    compiler.frontend = "antlr"
+
+    def walk():
+        with compiler._session_scope():
+            ParseTreeWalker().walk(compiler, tree)
+
+    def extract():
+        with compiler._session_scope() as session:
+            compiler._handle_tokens(session, token_stream.tokens)
+
+    return {
+        "antlr.lex": best_time(lex, repeat),
+        "antlr.parse": best_time(lambda: parser(False).program(), repeat),
+        "antlr.parse_tree": best_time(lambda: parser(True).program(), repeat),
+        "antlr.walk": best_time(walk, repeat),
+        "antlr.extract": best_time(extract, repeat),
+        "antlr.compile": best_time(lambda: compiler.compile(program), repeat),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure the throughput of each phase of compiling a synthetic program."
+    )
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--states", type=int, default=50)
+    parser.add_argument("--tapes", type=int, default=2)
+    parser.add_argument("--variable-density", type=float, default=0.3)
+    parser.add_argument("--comment-density", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--frontends", default="fast,antlr")
+    parser.add_argument("--json", metavar="PATH", help="write the results to PATH")
+    args = parser.parse_args()
+
+    parameters = {
+        "lines": args.lines,
+        "states": args.states,
+        "tapes": args.tapes,
+        "variable_density": args.variable_density,
+        "comment_density": args.comment_density,
+        "seed": args.seed,
+    }
+    program = generate_program(**parameters)
+    transitions = sum(1 for raw, _, _ in scan(io.StringIO(program)) if raw)
+    frontends = args.frontends.split(",")
+    if "antlr" in frontends:
+        # Warm up the DFA caches, which are shared by every parser
+        compiler = NullCompiler()
+        compiler.frontend = "antlr"
+        compiler.compile(program)
+
+    timings = {}
+    if "fast" in frontends:
+        timings.update(fast_phases(program, args.repeat))
+    if "antlr" in frontends:
+        timings.update(antlr_phases(program, args.repeat))
+
+    phases = {
+        phase: {
+            "seconds": seconds,
+            "transitions_per_second": transitions / seconds,
+            "us_per_line": seconds / args.lines * 1e6,
+        }
+        for phase, seconds in timings.items()
+    }
+    print(
+        f"{args.lines} lines, {transitions} transitions, {args.tapes} tapes "
+        f"(best of {args.repeat})"
+    )
+    print(f"{'phase':24}{'transitions/s':>16}{'µs/line':>10}")
+    for phase, result in phases.items():
+        print(
+            f"{phase:24}{result['transitions_per_second']:16,.0f}"
+            f"{result['us_per_line']:10.2f}"
+        )
+
+    if args.json is not None:
+        try:
+            version = importlib.metadata.version("varphi-devkit")
+        except importlib.metadata.PackageNotFoundError:
+            version = None
+        report = {
+            "benchmark": "compile",
+            "devkit_version": version,
+            "python": sys.version,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "parameters": parameters,
+            "repeat": args.repeat,
+            "transitions": transitions,
+            "phases": phases,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Measure the startup cost of the devkit: the time to import it, the time to load the ANTLR runtime (when the front
+end needs it), and the time of the first and of later compiles with each front end. Every measurement runs in a fresh
+interpreter, so that nothing is already imported or warmed up.
+
+Exits with status 1 if the median import time exceeds --max-import-ms, if importing the devkit imports antlr4, or if
+the median first compile of a front end is more than --max-first-ratio times slower than later ones, so that startup
+regressions fail the run.
+
+Usage: python benchmarks/bench_import.py [--runs N] [--max-import-ms MS] [--max-first-ratio R]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from varphi_devkit import VarphiCompiler
+imported = time.perf_counter()
+antlr_imported = "antlr4" in sys.modules
+if sys.argv[1] == "antlr":
+    import varphi_devkit.antlr
+runtime_loaded = time.perf_counter()
+
+
+class NullCompiler(VarphiCompiler):
+    frontend = sys.argv[1]
+
+    def handle_transition(self, transition):
+        pass
+
+    def generate_compiled_program(self):
+        return ""
+
+
+program = "s0 (1, $x) s1 (0, $x) (LEFT, RIGHT)\\ns1 (BLANK, 0) s0 (1, 1) (STAY, LEFT)\\n" * 50
+times = []
+for _ in range(3):
+    before = time.perf_counter()
+    NullCompiler().compile(program)
+    times.append(time.perf_counter() - before)
+print(
+    json.dumps(
+        {
+            "import": imported - start,
+            "runtime": runtime_loaded - imported,
+            "first": times[0],
+            "later": min(times[1:]),
+            "antlr_imported": antlr_imported,
+        }
+    )
+)
+"""
+
+
+def measure(frontend: str) -> dict:
+    """Run the probe in a fresh interpreter and return its timings."""
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE, frontend],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure the import time of the devkit and the cost of its first compiles."
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--max-import-ms",
+        type=float,
+        default=150.0,
+        help="fail if the median import time exceeds this (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-first-ratio",
+        type=float,
+        default=2.0,
+        help="fail if the median first compile is this many times slower than later ones (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    import_times = []
+    antlr_imported = False
+    failures = []
+    for frontend in ("fast", "antlr"):
+        runs = [measure(frontend) for _ in range(args.runs)]
+        import_times.extend(r["import"] for r in runs)
+        antlr_imported = antlr_imported or any(r["antlr_imported"] for r in runs)
+        medians = {
+            key: statistics.median(r[key] for r in runs)
+            for key in ("import", "runtime", "first", "later")
+        }
+        print(
+            f"{frontend:8}"
+            + "".join(
+                f"  {key} {value * 1000:7.2f} ms" for key, value in medians.items()
+            )
+        )
+        ratio = medians["first"] / medians["later"]
+        if ratio > args.max_first_ratio:
+            failures.append(
+                f"the first compile with the {frontend} front end is {ratio:.2f} times slower than later ones"
+                f" (more than {args.max_first_ratio:g})"
+            )
+
+    if antlr_imported:
+        failures.append("importing the devkit imported antlr4")
+    median = statistics.median(import_times) * 1000
+    if median > args.max_import_ms:
+        failures.append(
+            f"the median import time ({median:.2f} ms) exceeds {args.max_import_ms:g} ms"
+        )
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
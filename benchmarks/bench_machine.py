@@ -0,0 +1,156 @@
+"""
+Measure the speed of VarphiMachine, the reference interpreter, in steps per second.
+
+Machines: a binary counter ("counter", 1 tape, literal symbols), a machine copying a tape back and forth ("copy",
+2 tapes, variables and repeated variables), and a machine cycling through every symbol ("alphabet", 1 tape, 62
+transitions per state). Each machine runs for --steps steps (none of them halts), and is compared with a simulator
+scanning the transitions of the program in order at each step, as simple interpreters do.
+
+Usage: python benchmarks/bench_machine.py [--steps N] [--repeat R] [--machines M,...] [--no-linear] [--json PATH]
+"""
+
+import argparse
+import json
+import random
+import string
+import time
+
+from varphi_devkit import VarphiInterpreter, VarphiTransition, iter_transitions, BLANK
+
+COUNTER = """right (0) right (0) (RIGHT)
+right (1) right (1) (RIGHT)
+right (BLANK) carry (BLANK) (LEFT)
+carry (1) carry (0) (LEFT)
+carry (0) right (1) (RIGHT)
+carry (BLANK) right (1) (RIGHT)
+"""
+
+COPY = """forward (BLANK, BLANK) back (BLANK, BLANK) (LEFT, LEFT)
+forward ($x, $y) forward ($x, $x) (RIGHT, RIGHT)
+back (BLANK, BLANK) forward (BLANK, BLANK) (RIGHT, RIGHT)
+back ($x, $x) back ($x, $x) (LEFT, LEFT)
+"""
+
+
+# Symbols are single alphanumerical characters
+ALPHABET = string.digits + string.ascii_letters
+
+
+def alphabet_program() -> str:
+    """A machine sweeping its tape back and forth, replacing each symbol of ALPHABET by the next one."""
+    size = len(ALPHABET)
+    lines = []
+    for state, direction, turn in (
+        ("right", "RIGHT", "left"),
+        ("left", "LEFT", "right"),
+    ):
+        for i in range(size):
+            lines.append(
+                f"{state} ({ALPHABET[i]}) {state} ({ALPHABET[(i + 1) % size]}) ({direction})"
+            )
+        reverse = "LEFT" if direction == "RIGHT" else "RIGHT"
+        lines.append(f"{state} (BLANK) {turn} (BLANK) ({reverse})")
+    return "\n".join(lines) + "\n"
+
+
+def machines() -> dict[str, tuple[str, list]]:
+    """The benchmarked programs, with their input tapes."""
+    rng = random.Random(0)
+    return {
+        "counter": (COUNTER, [["0"]]),
+        "copy": (COPY, [[rng.choice("01") for _ in range(100)], []]),
+        "alphabet": (
+            alphabet_program(),
+            [[rng.choice(ALPHABET) for _ in range(100)]],
+        ),
+    }
+
+
+def linear_run(transitions: list[VarphiTransition], tapes: list, steps: int) -> None:
+    """Run a program for a number of steps, scanning its transitions in order at each step."""
+    moves = {"LEFT": -1, "RIGHT": 1, "STAY": 0}
+    cells = [dict(enumerate(tape)) for tape in tapes]
+    heads = [0] * len(tapes)
+    state = transitions[0].current_state
+    for _ in range(steps):
+        reads = [c.get(h, BLANK) for c, h in zip(cells, heads)]
+        for transition in transitions:
+            if transition.current_state != state:
+                continue
+            bindings = {}
+            for symbol, read in zip(transition.read_symbols, reads):
+                if symbol.startswith("$"):
+                    if bindings.setdefault(symbol, read) != read:
+                        break
+                elif symbol != read:
+                    break
+            else:
+                break
+        else:
+            return
+        for i, (symbol, direction) in enumerate(
+            zip(transition.write_symbols, transition.shift_directions)
+        ):
+            cells[i][heads[i]] = bindings[symbol] if symbol.startswith("$") else symbol
+            heads[i] += moves[direction]
+        state = transition.next_state
+
+
+def best_time(function, repeat: int) -> float:
+    """Run a function repeat times, and return its shortest duration."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure the speed of the reference interpreter in steps per second."
+    )
+    parser.add_argument("--steps", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--machines", default="counter,copy,alphabet")
+    parser.add_argument("--no-linear", action="store_true")
+    parser.add_argument("--json", metavar="PATH", help="write the results to PATH")
+    args = parser.parse_args()
+
+    results = {}
+    print(
+        f"{'machine':12}{'transitions':>12}{'indexed steps/s':>18}{'linear steps/s':>18}"
+    )
+    for name in args.machines.split(","):
+        program, tapes = machines()[name]
+        machine = VarphiInterpreter().build(program)
+
+        def indexed():
+            result = machine.run(tapes, max_steps=args.steps)
+            assert result.steps == args.steps
+
+        result = {
+            "transitions": machine.transition_count,
+            "steps": args.steps,
+            "indexed_steps_per_second": args.steps / best_time(indexed, args.repeat),
+        }
+        if not args.no_linear:
+            transitions = list(iter_transitions(program))
+            result["linear_steps_per_second"] = args.steps / best_time(
+                lambda: linear_run(transitions, tapes, args.steps), args.repeat
+            )
+        results[name] = result
+        linear = result.get("linear_steps_per_second")
+        print(
+            f"{name:12}{result['transitions']:12}{result['indexed_steps_per_second']:18,.0f}"
+            + (f"{linear:18,.0f}" if linear is not None else "")
+        )
+
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "machine", "machines": results}, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
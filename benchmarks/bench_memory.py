@@ -0,0 +1,271 @@
+"""
+Measure the memory used by each structure built while compiling synthetic programs of growing sizes, and fail if it
+regressed from a stored baseline.
+
+Structures: the ANTLR lexer's token buffer ("tokens"), the ANTLR parse tree ("parse_tree"), the walk of the parse tree
+by enterTransition(), with its canonicalization ("walk"), the VarphiTransitions kept by a backend ("transitions"), and
+whole compiles with the fast front end ("compile") and one line at a time ("compile_stream"). Every measurement runs in
+a fresh interpreter, and reports the peak number of bytes allocated while building the structure (traced with
+tracemalloc) per transition, the peak RSS of the interpreter, and the top allocation sites of the structure.
+
+With the default --baseline, the run fails (with exit status 1) if the bytes per transition of any measurement exceed
+the ones recorded in the baseline by more than the tolerance. --update-baseline records the current values instead.
+ANTLR is slow, so ANTLR structures are only measured up to --max-antlr-lines lines; sizes up to 10M lines are
+practical for the other structures.
+
+Usage: python benchmarks/bench_memory.py [--sizes 1000,10000,100000] [--structures S,...] [--max-antlr-lines N]
+                                         [--top N] [--baseline PATH] [--tolerance F] [--update-baseline] [--json PATH]
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+from varphi_devkit import VarphiCompiler
+from varphi_devkit.scanner import scan
+
+from programs import generate_program
+
+STRUCTURES = (
+    "tokens",
+    "parse_tree",
+    "walk",
+    "transitions",
+    "compile",
+    "compile_stream",
+)
+_ANTLR_STRUCTURES = ("tokens", "parse_tree", "walk")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "memory_baseline.json")
+
+
+class NullCompiler(VarphiCompiler):
+    def handle_transition(self, transition):
+        pass
+
+    def generate_compiled_program(self):
+        return ""
+
+
+class CollectingCompiler(NullCompiler):
+    def init_session(self, session):
+        session.transitions = []
+
+    def handle_transition(self, transition):
+        self.session.transitions.append(transition)
+
+    def handle_transitions(self, transitions):
+        self.session.transitions.extend(transitions)
+
+
+def build(structure: str, program: str):
+    """
+    Prepare the inputs of a structure (not traced), and return a function building it (traced).
+    The function returns the structure, so that it is still alive when its allocation sites are listed.
+    """
+    if structure == "tokens":
+        from varphi_devkit.antlr import CommonTokenStream, InputStream, VarphiLexer
+
+        input_stream = InputStream(program)
+
+        def tokens():
+            token_stream = CommonTokenStream(VarphiLexer(input_stream))
+            token_stream.fill()
+            return token_stream
+
+        return tokens
+
+    if structure in ("parse_tree", "walk"):
+        from varphi_devkit.antlr import (
+            CommonTokenStream,
+            InputStream,
+            ParseTreeWalker,
+            VarphiLexer,
+            VarphiParser,
+        )
+
+        token_stream = CommonTokenStream(VarphiLexer(InputStream(program)))
+        token_stream.fill()
+
+        def parse_tree():
+            parser = VarphiParser(token_stream)
+            parser.removeErrorListeners()
+            return parser.program()
+
+        if structure == "parse_tree":
+            return parse_tree
+
+        tree = parse_tree()
+        compiler = NullCompiler()
+
+        def walk():
+            with compiler._session_scope():
+                ParseTreeWalker().walk(compiler, tree)
+
+        return walk
+
+    if structure == "transitions":
+
+        def transitions():
+            compiler = CollectingCompiler()
+            compiler.compile(program)
+            return compiler.session.transitions
+
+        return transitions
+
+    if structure == "compile":
+        return lambda: NullCompiler().compile(program)
+
+    if structure == "compile_stream":
+        lines = program.splitlines(True)
+        return lambda: NullCompiler().compile_stream(iter(lines))
+
+    raise ValueError(f"Unknown structure: {structure!r}")
+
+
+def measure(structure: str, lines: int, top: int) -> dict:
+    """Measure a structure for a program of the given size, in this interpreter."""
+    program = generate_program(lines)
+    transitions = sum(1 for raw, _, _ in scan(io.StringIO(program)) if raw)
+    function = build(structure, program)
+    gc.collect()
+
+    tracemalloc.start()
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+
+    sites = snapshot.filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    ).statistics("lineno")
+    return {
+        "structure": structure,
+        "lines": lines,
+        "transitions": transitions,
+        "peak_bytes": peak,
+        "bytes_per_transition": peak / transitions,
+        # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        * (1 if sys.platform == "darwin" else 1024),
+        "top_sites": [
+            {
+                "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in sites[:top]
+        ],
+    }
+
+
+def measure_in_subprocess(structure: str, lines: int, top: int) -> dict:
+    """Measure a structure in a fresh interpreter, so that its peak RSS is its own."""
+    result = subprocess.run(
+        [sys.executable, __file__, "--child", structure, str(lines), str(top)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def check(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Compare results with a baseline, and describe the regressions."""
+    regressions = []
+    for result in results:
+        expected = (
+            baseline["bytes_per_transition"]
+            .get(result["structure"], {})
+            .get(str(result["lines"]))
+        )
+        if expected is None:
+            continue
+        if result["bytes_per_transition"] > expected * (1 + tolerance):
+            regressions.append(
+                f"{result['structure']} ({result['lines']} lines): "
+                f"{result['bytes_per_transition']:.0f} bytes per transition, "
+                f"baseline {expected:.0f}"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure the memory used while compiling, and fail if it regressed."
+    )
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--structures", default=",".join(STRUCTURES))
+    parser.add_argument("--max-antlr-lines", type=int, default=10_000)
+    parser.add_argument("--top", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", metavar="PATH", help="write the results to PATH")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        structure, lines, top = args.child
+        print(json.dumps(measure(structure, int(lines), int(top))))
+        return 0
+
+    results = []
+    print(f"{'structure':16}{'lines':>10}{'bytes/transition':>18}{'peak RSS':>12}")
+    for structure in args.structures.split(","):
+        for lines in map(int, args.sizes.split(",")):
+            if structure in _ANTLR_STRUCTURES and lines > args.max_antlr_lines:
+                continue
+            result = measure_in_subprocess(structure, lines, args.top)
+            results.append(result)
+            print(
+                f"{structure:16}{lines:10}{result['bytes_per_transition']:18.1f}"
+                f"{result['peak_rss_bytes'] / 2**20:9.1f} MB"
+            )
+            for site in result["top_sites"]:
+                print(f"    {site['bytes'] / 2**10:10.1f} KB  {site['site']}")
+
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "memory", "results": results}, f, indent=2)
+            f.write("\n")
+
+    if args.update_baseline:
+        baseline = {
+            "python": f"{sys.version_info.major}.{sys.version_info.minor}",
+            "bytes_per_transition": {},
+        }
+        for result in results:
+            baseline["bytes_per_transition"].setdefault(result["structure"], {})[
+                str(result["lines"])
+            ] = round(result["bytes_per_transition"], 1)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"Updated the baseline in {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    python = f"{sys.version_info.major}.{sys.version_info.minor}"
+    if baseline.get("python") != python:
+        print(
+            f"The baseline was recorded with Python {baseline.get('python')}, not {python}: "
+            "object sizes may differ"
+        )
+    regressions = check(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+A deterministic generator of synthetic Varphi programs, shared by the benchmarks.
+"""
+
+import random
+
+# Names of the variables programs read and write back
+_VARIABLES = ("$x", "$y", "$z", "$w")
+_LITERALS = ("0", "1", "BLANK")
+_DIRECTIONS = ("LEFT", "RIGHT", "STAY")
+
+
+def generate_program(
+    lines: int = 10_000,
+    states: int = 50,
+    tapes: int = 2,
+    variable_density: float = 0.3,
+    comment_density: float = 0.1,
+    seed: int = 0,
+) -> str:
+    """
+    Generate a valid program of the given number of lines (the same one for the same arguments).
+    Transitions go between states q0 to q{states - 1}, and use the given number of tapes. Each read symbol is a
+    variable with probability variable_density (and each write symbol then writes one of them back with the same
+    probability). A fraction comment_density of the lines are comments, mostly line comments and some block comments.
+    """
+    rng = random.Random(seed)
+    output = []
+    for i in range(lines):
+        # The grammar requires at least one transition
+        if i > 0 and rng.random() < comment_density:
+            if rng.random() < 0.8:
+                output.append(f"// comment {i}")
+            else:
+                output.append(f"/* block comment {i} */")
+            continue
+        reads = [
+            (
+                rng.choice(_VARIABLES)
+                if rng.random() < variable_density
+                else rng.choice(_LITERALS)
+            )
+            for _ in range(tapes)
+        ]
+        variables = [s for s in reads if s.startswith("$")]
+        writes = [
+            (
+                rng.choice(variables)
+                if variables and rng.random() < variable_density
+                else rng.choice(_LITERALS)
+            )
+            for _ in range(tapes)
+        ]
+        shifts = [rng.choice(_DIRECTIONS) for _ in range(tapes)]
+        output.append(
+            f"q{rng.randrange(states)} ({', '.join(reads)}) q{rng.randrange(states)} "
+            f"({', '.join(writes)}) ({', '.join(shifts)})"
+        )
+    return "\n".join(output) + "\n"
@@ -8,6 +8,19 @@ convenient abstraction layer for implementing custom Varphi backends.
 **Core API:**
 - `VarphiCompiler`: The abstract base class you must subclass. Override `handle_transition` to process logic.
 - `VarphiTransition`: A validated, canonicalized representation of a single transition line.
+- `iter_transitions`: Lazily yields the transitions of a program, for consumers that do not need a backend.
+- `VarphiCompilerConfig`: The configuration of a compiler, frozen for the duration of each compile.
+- `VarphiCompileSession`: The state of a single compile, letting one compiler compile several programs concurrently.
+- `VarphiCompileObserver`: Observes the phases of compiles, collecting their `VarphiCompileStats`.
+- `VarphiFanOutCompiler`: Parses each program once, and hands its transitions to several backends.
+- `VarphiIncrementalCompiler`: Recompiles successive versions of a program, re-parsing only the lines that changed.
+- `VarphiTransitionCache`: An opt-in on-disk cache letting `compile` skip parsing of programs it has already seen.
+- `VarphiCompactTransition`: An opt-in memory-efficient transition referencing interned names by integer IDs.
+- `VarphiSymbolTables`, `VarphiSymbolTable`: The per-compile tables interning the names of compact transitions.
+- `VarphiTransitionTable`: The transitions of a program stored column by column, as arrays of integer IDs.
+- `VarphiTableCompiler`: A base class for backends working on the whole `VarphiTransitionTable` of a program.
+- `VarphiInterpreter`: A backend building a `VarphiMachine`, the reference multi-tape Turing machine running programs.
+- `VarphiTape`, `VarphiRun`: The tapes of a `VarphiMachine`, and the result of running it.
 
 **Constants:**
 - `BLANK`, `LEFT`, `RIGHT`, `STAY`: Primitives for tape operations.
@@ -16,7 +29,25 @@ convenient abstraction layer for implementing custom Varphi backends.
 - `VarphiSyntaxError`: Base class for rich error reporting with source code context.
 """
 
-from .compiler import VarphiCompiler, VarphiTransition, BLANK, LEFT, RIGHT, STAY
+import importlib
+from typing import TYPE_CHECKING
+
+from .compiler import (
+    VarphiCompiler,
+    VarphiTransition,
+    VarphiCompilerConfig,
+    VarphiCompileSession,
+    iter_transitions,
+    BLANK,
+    LEFT,
+    RIGHT,
+    STAY,
+)
+from .observe import VarphiCompileObserver, VarphiCompileStats
+from .incremental import VarphiIncrementalCompiler
+from .cache import VarphiTransitionCache
+from .compact import VarphiCompactTransition, VarphiSymbolTables, VarphiSymbolTable
+from .table import VarphiTransitionTable, VarphiTableCompiler
 from .exceptions import (
     VarphiSyntaxError,
     VarphiTransitionInconsistentTapeCountError,
@@ -24,9 +55,49 @@ from .exceptions import (
     VarphiUndefinedVariableError,
 )
 
+# Imported on first use, so that importing the package stays fast
+_LAZY_IMPORTS = {
+    "VarphiFanOutCompiler": ".fanout",
+    "VarphiInterpreter": ".machine",
+    "VarphiMachine": ".machine",
+    "VarphiTape": ".machine",
+    "VarphiRun": ".machine",
+}
+
+if TYPE_CHECKING:
+    from .fanout import VarphiFanOutCompiler
+    from .machine import VarphiInterpreter, VarphiMachine, VarphiTape, VarphiRun
+
+
+def __getattr__(name: str):
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
 __all__ = [
     "VarphiCompiler",
     "VarphiTransition",
+    "VarphiCompilerConfig",
+    "VarphiCompileSession",
+    "iter_transitions",
+    "VarphiCompileObserver",
+    "VarphiCompileStats",
+    "VarphiFanOutCompiler",
+    "VarphiIncrementalCompiler",
+    "VarphiTransitionCache",
+    "VarphiCompactTransition",
+    "VarphiSymbolTables",
+    "VarphiSymbolTable",
+    "VarphiTransitionTable",
+    "VarphiTableCompiler",
+    "VarphiInterpreter",
+    "VarphiMachine",
+    "VarphiTape",
+    "VarphiRun",
     "BLANK",
     "LEFT",
     "RIGHT",
@@ -0,0 +1,194 @@
+"""
+Compiling Varphi programs from asyncio code.
+
+Compiling is CPU-bound and blocking, so it runs in an executor, leaving the event loop free. While a program compiles,
+the compiler checks a control object between lines and between transitions, which aborts the compile once it is
+cancelled or runs out of its time budget, and forwards the transitions to async iterators.
+"""
+
+import asyncio
+import concurrent.futures
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+if TYPE_CHECKING:
+    from .compiler import VarphiCompiler, VarphiTransition
+
+# Transitions are sent to async iterators in batches of this size, through a queue of at most this many batches
+BATCH_SIZE = 256
+MAX_QUEUED_BATCHES = 4
+
+
+class _Cancelled(Exception):
+    """Raised in the executor to abort a compile whose caller was cancelled."""
+
+
+class _CompileControl:
+    """
+    Checked by a compiler between lines and between transitions while it compiles a program in an executor.
+    Attributes:
+        - deadline (Optional[float]): The time.monotonic() time after which the compile is aborted with a TimeoutError.
+        - timeout (Optional[float]): The time budget of the compile in seconds, for error messages.
+        - cancelled (bool): Set from the event loop to abort the compile.
+    """
+
+    def __init__(self, timeout: Optional[float]):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.cancelled = False
+
+    def check(self) -> None:
+        """Abort the compile if it was cancelled or ran out of time."""
+        if self.cancelled:
+            raise _Cancelled
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TimeoutError(f"Compile exceeded its time budget of {self.timeout}s")
+
+    def transition(self, transition: "VarphiTransition") -> None:
+        """Called after each transition has been handled."""
+        pass
+
+    def finish(self) -> None:
+        """Called once the compile has handled every transition."""
+        pass
+
+
+class _StreamingControl(_CompileControl):
+    """A compile control also sending the handled transitions to an asyncio queue, in batches."""
+
+    def __init__(
+        self,
+        timeout: Optional[float],
+        loop: asyncio.AbstractEventLoop,
+        queue: asyncio.Queue,
+    ):
+        super().__init__(timeout)
+        self.loop = loop
+        self.queue = queue
+        self.batch: list = []
+
+    def transition(self, transition: "VarphiTransition") -> None:
+        self.batch.append(transition)
+        if len(self.batch) >= BATCH_SIZE:
+            self._send()
+
+    def finish(self) -> None:
+        if self.batch:
+            self._send()
+
+    def _send(self) -> None:
+        """Put the current batch on the queue, waiting while the queue is full."""
+        future = asyncio.run_coroutine_threadsafe(self.queue.put(self.batch), self.loop)
+        self.batch = []
+        while True:
+            try:
+                future.result(0.05)
+                return
+            except concurrent.futures.TimeoutError:
+                # The consumer may have stopped iterating, or the compile may have run out of time
+                try:
+                    self.check()
+                except BaseException:
+                    future.cancel()
+                    raise
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    """Retrieve the result of an abandoned compile, so that asyncio does not log its error as never retrieved."""
+    if not future.cancelled():
+        future.exception()
+
+
+def _run(compiler: "VarphiCompiler", program: str, control: _CompileControl) -> str:
+    """Compile a program under a compile control (in the executor)."""
+    from .compiler import _compile_control
+
+    # Sessions opened by this thread pick up the control
+    token = _compile_control.set(control)
+    try:
+        control.check()
+        result = compiler.compile(program)
+        control.finish()
+        return result
+    finally:
+        _compile_control.reset(token)
+
+
+async def _start(
+    compiler: "VarphiCompiler",
+    program: str,
+    control: _CompileControl,
+    executor: Optional[concurrent.futures.Executor],
+    semaphore: Optional[asyncio.Semaphore],
+) -> asyncio.Future:
+    """
+    Start compiling a program in an executor, once the semaphore (if any) is acquired.
+    The semaphore is only released once the compile is over in the executor, which may be well after its caller was
+    cancelled or stopped iterating, so the returned future must not be cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    if semaphore is None:
+        return loop.run_in_executor(executor, _run, compiler, program, control)
+    await semaphore.acquire()
+    try:
+        future = loop.run_in_executor(executor, _run, compiler, program, control)
+    except BaseException:
+        semaphore.release()
+        raise
+    future.add_done_callback(lambda _: semaphore.release())
+    return future
+
+
+async def compile_async(
+    compiler: "VarphiCompiler",
+    program: str,
+    *,
+    executor: Optional[concurrent.futures.Executor] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    """See VarphiCompiler.compile_async()."""
+    control = _CompileControl(timeout)
+    future = await _start(compiler, program, control, executor, semaphore)
+    try:
+        # Shielded, as cancelling the future would not stop the compile in the executor
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        control.cancelled = True
+        future.add_done_callback(_retrieve)
+        raise
+
+
+async def compile_async_iter(
+    compiler: "VarphiCompiler",
+    program: str,
+    *,
+    executor: Optional[concurrent.futures.Executor] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator["VarphiTransition"]:
+    """See VarphiCompiler.compile_async_iter()."""
+    queue: asyncio.Queue = asyncio.Queue(MAX_QUEUED_BATCHES)
+    control = _StreamingControl(timeout, asyncio.get_running_loop(), queue)
+    future = await _start(compiler, program, control, executor, semaphore)
+    try:
+        while True:
+            # Wait for the next batch, or for the end of the compile (which raises any error)
+            get = asyncio.ensure_future(queue.get())
+            await asyncio.wait({get, future}, return_when=asyncio.FIRST_COMPLETED)
+            if get.done():
+                for transition in get.result():
+                    yield transition
+                continue
+            get.cancel()
+            # The compile is over: drain the batches it queued before finishing
+            while not queue.empty():
+                for transition in queue.get_nowait():
+                    yield transition
+            future.result()
+            return
+    finally:
+        # Stop the compile if the consumer stopped iterating early (or was cancelled), and retrieve the error it
+        # will then end with
+        control.cancelled = True
+        future.add_done_callback(_retrieve)
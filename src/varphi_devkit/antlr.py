@@ -0,0 +1,179 @@
+"""
+The ANTLR-based parsing machinery, loaded lazily.
+
+Importing the antlr4 runtime and the generated lexer and parser dominates the startup time of short-lived processes,
+so the rest of the devkit only imports this module when a program actually has to be parsed with ANTLR.
+
+Lexers, token streams and parsers are not shared between concurrent parses, but are pooled: each parse takes a set of
+them from `parser_pool` and resets them onto its input, instead of building new ones.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from antlr4 import (
+    InputStream,
+    CommonTokenStream,
+    ParseTreeWalker,
+    PredictionMode,
+    Token,
+)
+from antlr4.error.ErrorListener import ErrorListener
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+from antlr4.error.Errors import ParseCancellationException
+from antlr4.IntervalSet import IntervalSet
+from antlr4.atn.ATNState import ATNState
+
+from .parser import VarphiLexer, VarphiParser, VarphiListener
+from .exceptions import VarphiSyntaxError
+
+__all__ = [
+    "InputStream",
+    "CommonTokenStream",
+    "ParseTreeWalker",
+    "PredictionMode",
+    "Token",
+    "BailErrorStrategy",
+    "ParseCancellationException",
+    "VarphiLexer",
+    "VarphiParser",
+    "VarphiListener",
+    "VarphiErrorListener",
+    "VarphiErrorCollector",
+    "VarphiParserPool",
+    "parser_pool",
+]
+
+# The maximum number of idle sets of recognizers kept by the parser pool
+MAX_POOLED_PARSERS = 16
+
+
+class VarphiErrorListener(ErrorListener):
+    """Custom ANTLR ErrorListener that converts syntax errors into VarphiSyntaxErrors."""
+
+    def __init__(self):
+        super().__init__()
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        raise VarphiSyntaxError(recognizer, offendingSymbol, line, column, msg)
+
+
+class VarphiErrorCollector(ErrorListener):
+    """ANTLR ErrorListener that collects syntax errors as VarphiSyntaxErrors, letting ANTLR recover from them."""
+
+    def __init__(self):
+        super().__init__()
+        self.errors: list[VarphiSyntaxError] = []
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+        self.errors.append(
+            VarphiSyntaxError(recognizer, offendingSymbol, line, column, msg)
+        )
+
+
+class _RecoveryErrorStrategy(DefaultErrorStrategy):
+    """
+    DefaultErrorStrategy that leaves the ATN alone while recovering from errors.
+
+    When sync() skips unwanted tokens at the end of a loop iteration, the Python runtime adds the error recovery set
+    to the token set returned by getExpectedTokens(), which may be the set the shared ATN caches for the state. That
+    changes the tokens every later parse in the process reports as expected, so this strategy adds to a copy instead.
+    """
+
+    def sync(self, recognizer) -> None:
+        if not self.inErrorRecoveryMode(recognizer):
+            state = recognizer._interp.atn.states[recognizer.state]
+            if state.stateType in (ATNState.PLUS_LOOP_BACK, ATNState.STAR_LOOP_BACK):
+                next_tokens = recognizer.atn.nextTokens(state)
+                if (
+                    recognizer.getTokenStream().LA(1) not in next_tokens
+                    and Token.EPSILON not in next_tokens
+                ):
+                    self.reportUnwantedToken(recognizer)
+                    expecting = IntervalSet()
+                    expecting.addSet(recognizer.getExpectedTokens())
+                    expecting.addSet(self.getErrorRecoverySet(recognizer))
+                    self.consumeUntil(recognizer, expecting)
+                    return
+        super().sync(recognizer)
+
+
+class VarphiParserPool:
+    """
+    A pool of reusable lexers, token streams and parsers.
+
+    Each parse takes an idle set of recognizers (or creates one), resets it onto its input with setInputStream() and
+    friends, and hands it back once done, so that concurrent parses (from several threads) never share recognizers.
+    The ATNs and DFA caches are shared by all recognizers anyway, as is usual with ANTLR.
+    Attributes:
+        - max_size (int): The maximum number of idle sets of recognizers kept for reuse.
+    """
+
+    def __init__(self, max_size: int = MAX_POOLED_PARSERS):
+        """Initialize an empty pool."""
+        self.max_size = max_size
+        self._idle: list[tuple[VarphiLexer, CommonTokenStream, VarphiParser]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def parser(
+        self, program: str, first_line: int = 1, error_listener=None
+    ) -> Iterator[tuple[CommonTokenStream, VarphiParser]]:
+        """
+        Lend a token stream and a parser set up to parse a program, with the default settings of a new parser.
+        first_line is the line number of the first line of program, and errors are reported to error_listener, which
+        defaults to a VarphiErrorListener raising VarphiSyntaxErrors.
+        The token stream and parser must not be used once the block ends (the tokens themselves remain valid).
+        """
+        with self._lock:
+            recognizers = self._idle.pop() if self._idle else None
+        if recognizers is None:
+            lexer = VarphiLexer(None)
+            token_stream = CommonTokenStream(lexer)
+            parser = VarphiParser(token_stream)
+        else:
+            lexer, token_stream, parser = recognizers
+        if error_listener is None:
+            error_listener = _RAISING_LISTENER
+
+        # Setting the input of a recognizer resets it
+        lexer.inputStream = InputStream(program)
+        lexer.line = first_line
+        lexer.removeErrorListeners()
+        lexer.addErrorListener(error_listener)
+        token_stream.setTokenSource(lexer)
+        parser.setInputStream(token_stream)
+        # reset() leaves the ATN state of the recognizer alone, but the root context takes it as its invoking state
+        parser.state = -1
+        parser.buildParseTrees = True
+        parser._interp.predictionMode = PredictionMode.LL
+        parser._errHandler = _RecoveryErrorStrategy()
+        parser.removeErrorListeners()
+        parser.addErrorListener(error_listener)
+        try:
+            yield token_stream, parser
+        finally:
+            # Do not keep the last program alive while idle
+            lexer.inputStream = InputStream("")
+            token_stream.setTokenSource(lexer)
+            parser.setInputStream(token_stream)
+            parser.removeErrorListeners()
+            with self._lock:
+                if len(self._idle) < self.max_size:
+                    self._idle.append((lexer, token_stream, parser))
+
+    def clear(self) -> None:
+        """Drop every idle set of recognizers."""
+        with self._lock:
+            self._idle.clear()
+
+    def __len__(self) -> int:
+        """The number of idle sets of recognizers."""
+        return len(self._idle)
+
+
+# The error listener used when none is given (it keeps no state)
+_RAISING_LISTENER = VarphiErrorListener()
+
+parser_pool = VarphiParserPool()
@@ -0,0 +1,317 @@
+"""
+Batch builds of directory trees of Varphi programs.
+
+Every source under a directory is compiled by a backend into the same relative path under an output directory, on a
+pool of worker processes. Like make, a build skips sources whose output is newer than themselves. Sources that are
+older than their output only in appearance (e.g. touched, or checked out again) are skipped too, if their contents
+still hash to the value recorded in the manifest of the previous build.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional, TextIO
+
+from .compiler import VarphiCompiler, _new_file_mode
+from .exceptions import VarphiSyntaxError
+
+# The file recording the backend and source hashes of the last build, in the output directory
+MANIFEST_NAME = ".varphi-build.json"
+_MANIFEST_FORMAT = 1
+# Number of slowest programs listed in the summary
+SLOWEST_COUNT = 5
+# Sources are sent to workers in chunks of at most this many, to amortize the cost of inter-process communication
+MAX_CHUNK_SIZE = 32
+
+# The backend of a worker process, loaded once by _init_worker()
+_worker_backend: Optional[Callable[[], VarphiCompiler]] = None
+
+
+@dataclass(frozen=True, slots=True)
+class BuildResult:
+    """
+    The outcome of building a single source.
+    Attributes:
+        - source (str): The path of the source, relative to the source directory.
+        - status (str): "compiled", "unchanged" (skipped, as its contents did not change) or "failed".
+        - seconds (float): The time spent compiling the source.
+        - digest (str): The SHA-256 hash of the contents of the source (hexadecimal).
+        - error (Optional[str]): The rendered diagnostic (or other error) of a failed source.
+    """
+
+    source: str
+    status: str
+    seconds: float
+    digest: str
+    error: Optional[str] = None
+
+
+@dataclass
+class BuildSummary:
+    """
+    The aggregated outcome of a build.
+    Attributes:
+        - results (list[BuildResult]): The results of the sources that were not up to date, in order of completion.
+        - up_to_date (int): The number of sources skipped without being read, as their output was newer.
+        - jobs (int): The number of worker processes.
+        - wall_seconds (float): The duration of the build.
+    """
+
+    results: list[BuildResult] = field(default_factory=list)
+    up_to_date: int = 0
+    jobs: int = 1
+    wall_seconds: float = 0.0
+
+    def count(self, status: str) -> int:
+        """Count the sources with a given status."""
+        return sum(result.status == status for result in self.results)
+
+    @property
+    def compile_seconds(self) -> float:
+        """The total time spent compiling, across all workers."""
+        return sum(result.seconds for result in self.results)
+
+    def format(self) -> str:
+        """Render the summary for humans."""
+        total = len(self.results) + self.up_to_date
+        compiled = self.count("compiled")
+        lines = [
+            f"Built {total} programs in {self.wall_seconds:.2f}s with {self.jobs} jobs: "
+            f"{compiled} compiled, {self.up_to_date + self.count('unchanged')} up to date, "
+            f"{self.count('failed')} failed"
+        ]
+        # Sources skipped as unchanged were not compiled, and are left out of the timings
+        timed = [result for result in self.results if result.status != "unchanged"]
+        if timed:
+            rate = len(timed) / self.wall_seconds if self.wall_seconds else 0.0
+            lines.append(
+                f"Compile time: {self.compile_seconds:.2f}s in total, "
+                f"{self.compile_seconds / len(timed) * 1000:.1f}ms per program, "
+                f"{rate:.0f} programs/s"
+            )
+            slowest = sorted(timed, key=lambda r: r.seconds, reverse=True)
+            lines.append(
+                "Slowest: "
+                + ", ".join(
+                    f"{r.source} ({r.seconds * 1000:.1f}ms)"
+                    for r in slowest[:SLOWEST_COUNT]
+                )
+            )
+        return "\n".join(lines)
+
+
+def find_sources(source_dir: str, extension: str) -> Iterator[str]:
+    """Yield the paths (relative to source_dir) of the sources with the given extension under it, in sorted order."""
+    for directory, subdirectories, files in os.walk(source_dir):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.endswith(extension):
+                yield os.path.relpath(os.path.join(directory, name), source_dir)
+
+
+def print_result(
+    result: BuildResult, verbose: bool = False, file: Optional[TextIO] = None
+) -> None:
+    """Report a result as the build goes (failures always, other results if verbose), to stderr by default."""
+    file = file if file is not None else sys.stderr
+    if result.status == "failed":
+        print(f"FAILED {result.source}", file=file)
+        print(result.error.lstrip("\n"), file=file)
+    elif verbose:
+        print(
+            f"{result.status} {result.source} ({result.seconds * 1000:.1f}ms)",
+            file=file,
+        )
+
+
+def build(
+    source_dir: str,
+    output_dir: str,
+    backend: str,
+    jobs: Optional[int] = None,
+    extension: str = ".varphi",
+    suffix: str = ".out",
+    force: bool = False,
+    on_result: Optional[Callable[[BuildResult], None]] = None,
+) -> BuildSummary:
+    """
+    Compile every source with the given extension under source_dir, with a backend given as "module:Class".
+    The output of a source is written to the same relative path under output_dir, its extension replaced with suffix.
+    Sources are compiled on jobs processes (os.cpu_count() if None; 1 compiles in this process), and on_result is
+    called with every result as soon as it is known. Up-to-date sources are skipped unless force is set.
+    """
+    from .cli import load_backend
+
+    start = time.perf_counter()
+    jobs = jobs or os.cpu_count() or 1
+    summary = BuildSummary(jobs=jobs)
+    load_backend(backend)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path)
+    if manifest.get("backend") != backend or manifest.get("suffix") != suffix:
+        # The outputs were built by another backend: none of them is up to date
+        manifest = {}
+    digests: dict[str, str] = manifest.get("sources", {})
+    if force:
+        digests = {}
+
+    # (source, input path, output path, digest of the previous build) of every source that is not up to date
+    tasks = []
+    # The digests of the sources that still exist
+    new_digests = {}
+    for source in find_sources(source_dir, extension):
+        input_path = os.path.join(source_dir, source)
+        stem = source[: len(source) - len(extension)]
+        output_path = os.path.join(output_dir, stem + suffix)
+        digest = digests.get(source)
+        if digest is not None:
+            new_digests[source] = digest
+            if _is_newer(output_path, input_path):
+                summary.up_to_date += 1
+                continue
+        tasks.append((source, input_path, output_path, digest))
+
+    try:
+        for result in _run(tasks, backend, jobs):
+            if result.status == "failed":
+                new_digests.pop(result.source, None)
+            else:
+                new_digests[result.source] = result.digest
+            summary.results.append(result)
+            if on_result is not None:
+                on_result(result)
+    finally:
+        # Even an interrupted build records what it did, so that the next one does not redo it
+        os.makedirs(output_dir, exist_ok=True)
+        _write_atomically(
+            manifest_path,
+            json.dumps(
+                {
+                    "format": _MANIFEST_FORMAT,
+                    "backend": backend,
+                    "suffix": suffix,
+                    "sources": new_digests,
+                }
+            ),
+        )
+    summary.wall_seconds = time.perf_counter() - start
+    return summary
+
+
+def _run(tasks: list[tuple], backend: str, jobs: int) -> Iterator[BuildResult]:
+    """Build sources (in this process if jobs is 1), yielding their results as soon as they are known."""
+    if jobs == 1 or len(tasks) <= 1:
+        _init_worker(backend)
+        yield from _build_chunk(tasks)
+        return
+
+    # Small chunks keep every worker busy until the end, while amortizing the cost of sending tasks
+    chunk_size = max(1, min(MAX_CHUNK_SIZE, len(tasks) // (jobs * 8)))
+    chunks = [tasks[i : i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(chunks)),
+        initializer=_init_worker,
+        initargs=(backend,),
+    ) as executor:
+        futures = [executor.submit(_build_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def _init_worker(backend: str) -> None:
+    """Load the backend of a worker process."""
+    global _worker_backend
+    from .cli import load_backend
+
+    _worker_backend = load_backend(backend)
+
+
+def _build_chunk(tasks: list[tuple]) -> list[BuildResult]:
+    """Build a chunk of sources (in a worker process)."""
+    return [_build_one(*task) for task in tasks]
+
+
+def _build_one(
+    source: str, input_path: str, output_path: str, old_digest: Optional[str]
+) -> BuildResult:
+    """Build a single source, unless its contents did not change since the previous build."""
+    start = time.perf_counter()
+    try:
+        with open(input_path, "rb") as f:
+            contents = f.read()
+    except OSError as error:
+        return BuildResult(source, "failed", 0.0, "", str(error))
+    digest = hashlib.sha256(contents).hexdigest()
+    if digest == old_digest and os.path.exists(output_path):
+        # Only the timestamp of the source changed: bring the one of its output up to date
+        os.utime(output_path)
+        return BuildResult(source, "unchanged", 0.0, digest)
+
+    try:
+        output = _worker_backend().compile(str(contents, "utf-8"))
+    except (VarphiSyntaxError, UnicodeDecodeError) as error:
+        _remove(output_path)
+        return BuildResult(
+            source, "failed", time.perf_counter() - start, digest, str(error)
+        )
+    except Exception as error:
+        # A failure of the backend itself
+        _remove(output_path)
+        return BuildResult(
+            source,
+            "failed",
+            time.perf_counter() - start,
+            digest,
+            f"{type(error).__name__}: {error}",
+        )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    _write_atomically(output_path, output)
+    return BuildResult(source, "compiled", time.perf_counter() - start, digest)
+
+
+def _is_newer(output_path: str, input_path: str) -> bool:
+    """Check whether an output exists and was modified after its input."""
+    try:
+        return os.stat(output_path).st_mtime_ns >= os.stat(input_path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def _read_manifest(path: str) -> dict:
+    """Read the manifest of the previous build (empty if there is none, or it cannot be read)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("format") != _MANIFEST_FORMAT:
+        return {}
+    return manifest
+
+
+def _write_atomically(path: str, text: str) -> None:
+    """Write a text file, so that readers see either its old or its new contents."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        # Temporary files are only readable by their owner: give the file the permissions of a new file instead
+        os.chmod(temp_path, _new_file_mode())
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        _remove(temp_path)
+        raise
+
+
+def _remove(path: str) -> None:
+    """Remove a file, if it exists."""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
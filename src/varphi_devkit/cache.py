@@ -0,0 +1,174 @@
+"""
+A content-addressed on-disk cache of parsed transition lists.
+
+Entries are keyed by a hash of the program source together with the devkit version (which pins the grammar), and
+hold the canonicalized transitions in a compact serialized form. Entries are written atomically, so several processes
+can safely share one cache directory, and the least recently used entries are evicted once the cache outgrows its size
+budget.
+"""
+
+import hashlib
+import marshal
+import mmap
+import os
+import zlib
+from typing import Optional, Union
+
+from .compiler import VarphiTransition
+
+# A program, either as text or as its UTF-8 encoding (e.g. a memory-mapped file)
+_Source = Union[str, bytes, memoryview, "mmap.mmap"]
+
+# Bump when the on-disk layout of entries changes
+_FORMAT_VERSION = 1
+_SUFFIX = ".vtc"
+# Eviction makes room down to this fraction of max_size, so that a full cache is not scanned again on every write
+_EVICTION_TARGET = 0.9
+
+
+def _devkit_version() -> str:
+    """The installed version of the devkit, which also identifies the grammar."""
+    # Imported here, as importlib.metadata is slow to import and only needed once a cache is created
+    from importlib import metadata
+
+    try:
+        return metadata.version("varphi-devkit")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class VarphiTransitionCache:
+    """
+    An opt-in persistent cache of the transitions parsed from Varphi programs.
+
+    Attach it to a compiler (`compiler.cache = VarphiTransitionCache(directory)`) to let compile() skip lexing and
+    parsing entirely when it has already seen the same program. Only programs that compile without errors are cached.
+    The total size of the entries is tracked in memory after the directory has been scanned once, and the directory is
+    only scanned again once it may exceed max_size (entries written by other processes sharing the directory are only
+    seen then).
+    Attributes:
+        - directory (str): The directory holding the cache entries. It is created if it does not exist.
+        - max_size (int): The total size in bytes of the entries above which the least recently used are evicted.
+    """
+
+    def __init__(self, directory: str, max_size: int = 256 * 1024 * 1024):
+        """Initialize a cache stored in the given directory."""
+        self.directory = os.fspath(directory)
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+        # The estimated total size of the entries, or None until the directory has been scanned
+        self._size: Optional[int] = None
+        self._salt = (
+            f"varphi-devkit {_devkit_version()} format {_FORMAT_VERSION} "
+            f"marshal {marshal.version}\0"
+        ).encode()
+
+    def key(self, program: _Source) -> str:
+        """Compute the cache key of a program. A program and its UTF-8 encoding have the same key."""
+        digest = hashlib.sha256(self._salt)
+        if isinstance(program, str):
+            program = program.encode("utf-8", "surrogatepass")
+        digest.update(program)
+        return digest.hexdigest()
+
+    def get(self, program: _Source) -> Optional[list[VarphiTransition]]:
+        """Retrieve the transitions of a program, or None if it is not cached."""
+        path = self._path(self.key(program))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            transitions = [
+                VarphiTransition(*row) for row in marshal.loads(zlib.decompress(data))
+            ]
+        except (OSError, EOFError, ValueError, TypeError, zlib.error):
+            # Missing, concurrently evicted or corrupt entries are all misses
+            return None
+        try:
+            # Refresh the access time used for LRU eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return transitions
+
+    def put(self, program: _Source, transitions: list[VarphiTransition]) -> None:
+        """Store the transitions of a program, evicting old entries if the cache grows too large."""
+        # Share equal strings and tuples so that marshal stores each of them only once
+        shared: dict = {}
+        rows = [
+            (
+                shared.setdefault(t.current_state, t.current_state),
+                shared.setdefault(t.read_symbols, t.read_symbols),
+                shared.setdefault(t.next_state, t.next_state),
+                shared.setdefault(t.write_symbols, t.write_symbols),
+                shared.setdefault(t.shift_directions, t.shift_directions),
+                t.line_number,
+            )
+            for t in transitions
+        ]
+        data = zlib.compress(marshal.dumps(rows), 1)
+
+        # Write to a temporary file first, so that readers never see a partial entry (tempfile is imported on first
+        # use, as it takes a noticeable part of the import time of the package)
+        import tempfile
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(self.key(program)))
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        if self._size is None or self._size + len(data) > self.max_size:
+            self._evict()
+        else:
+            self._size += len(data)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        for entry in self._entries():
+            self._remove(entry.path)
+        self._size = 0
+
+    def _path(self, key: str) -> str:
+        """The path of the file holding the entry with the given key."""
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def _entries(self) -> list[os.DirEntry]:
+        """List the entry files currently in the cache."""
+        with os.scandir(self.directory) as it:
+            return [e for e in it if e.name.endswith(_SUFFIX)]
+
+    def _evict(self) -> None:
+        """
+        Scan the cache, and if it exceeds max_size, remove the least recently used entries until it fits within
+        _EVICTION_TARGET of max_size.
+        """
+        entries = []
+        total = 0
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        if total > self.max_size:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_size * _EVICTION_TARGET:
+                    break
+                self._remove(path)
+                total -= size
+        self._size = total
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        """Remove an entry file, tolerating other processes removing it first."""
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,191 @@
+"""
+The varphi-devkit command-line tool.
+
+    varphi-devkit serve --backend MODULE:CLASS    Run a compile daemon for a backend (see varphi_devkit.server)
+    varphi-devkit compile [FILE ...]              Compile programs on the daemon (standard input by default)
+    varphi-devkit metrics [--format FORMAT]       Print the metrics of the daemon
+    varphi-devkit build SRC -o OUT --backend MODULE:CLASS [-j N]
+                                                  Compile a directory tree of programs (see varphi_devkit.build)
+"""
+
+import argparse
+import importlib
+import json
+import os
+import signal
+import sys
+from typing import Optional
+
+from .compiler import VarphiCompiler
+from .exceptions import VarphiSyntaxError
+
+
+def load_backend(spec: str) -> type[VarphiCompiler]:
+    """
+    Load a backend given as "module:Class" (the module is also looked up in the current directory).
+    Raises ValueError if the specification is malformed or does not name a VarphiCompiler subclass.
+    """
+    module_name, _, class_name = spec.partition(":")
+    if not module_name or not class_name:
+        raise ValueError(f"Backends are given as MODULE:CLASS, not {spec!r}")
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    backend = getattr(importlib.import_module(module_name), class_name, None)
+    if not (isinstance(backend, type) and issubclass(backend, VarphiCompiler)):
+        raise ValueError(f"{spec!r} is not a VarphiCompiler subclass")
+    return backend
+
+
+def _serve(args: argparse.Namespace) -> int:
+    from .server import VarphiCompileServer, serve_metrics
+
+    server = VarphiCompileServer(
+        args.socket, load_backend(args.backend), args.cache_size
+    )
+    if args.metrics_address is not None:
+        host, _, port = args.metrics_address.rpartition(":")
+        serve_metrics(server, host or "127.0.0.1", int(port))
+    # Stop cleanly (removing the socket) on SIGTERM as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Listening on {args.socket}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def _compile(args: argparse.Namespace) -> int:
+    from .server import VarphiCompileClient, VarphiDaemonError
+
+    status = 0
+    with VarphiCompileClient(args.socket) as client:
+        for path in args.files or ["-"]:
+            if path == "-":
+                program = sys.stdin.read()
+            else:
+                with open(path, encoding="utf-8", newline="") as f:
+                    program = f.read()
+            try:
+                sys.stdout.write(client.compile(program))
+            except VarphiSyntaxError as error:
+                print(f"{path}:{error}", file=sys.stderr)
+                status = 1
+            except VarphiDaemonError as error:
+                # The backend failed on the daemon
+                print(f"{path}: {error}", file=sys.stderr)
+                status = 1
+    return status
+
+
+def _metrics(args: argparse.Namespace) -> int:
+    from .server import VarphiCompileClient, format_prometheus
+
+    with VarphiCompileClient(args.socket) as client:
+        metrics = client.metrics()
+    if args.format == "json":
+        print(json.dumps(metrics, indent=2))
+    else:
+        sys.stdout.write(format_prometheus(metrics))
+    return 0
+
+
+def _build(args: argparse.Namespace) -> int:
+    from .build import build, print_result
+
+    summary = build(
+        args.source_dir,
+        args.output,
+        args.backend,
+        jobs=args.jobs,
+        extension=args.extension,
+        suffix=args.suffix,
+        force=args.force,
+        on_result=lambda result: print_result(result, args.verbose),
+    )
+    print(summary.format(), file=sys.stderr)
+    return 1 if summary.count("failed") else 0
+
+
+def _parser() -> argparse.ArgumentParser:
+    from .server import CACHE_SIZE, default_socket_path
+
+    parser = argparse.ArgumentParser(
+        prog="varphi-devkit", description="Tools for Varphi programs."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run a compile daemon")
+    serve.add_argument(
+        "--backend", required=True, help="the backend class, as MODULE:CLASS"
+    )
+    serve.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    serve.add_argument(
+        "--metrics-address",
+        metavar="[HOST:]PORT",
+        help="also serve Prometheus metrics over HTTP at /metrics",
+    )
+    serve.set_defaults(run=_serve)
+
+    compile_ = commands.add_parser("compile", help="compile programs on the daemon")
+    compile_.add_argument("files", nargs="*", metavar="FILE")
+    compile_.set_defaults(run=_compile)
+
+    metrics = commands.add_parser("metrics", help="print the metrics of the daemon")
+    metrics.add_argument(
+        "--format", choices=("prometheus", "json"), default="prometheus"
+    )
+    metrics.set_defaults(run=_metrics)
+
+    build = commands.add_parser("build", help="compile a directory tree of programs")
+    build.add_argument("source_dir", metavar="SRC")
+    build.add_argument(
+        "-o", "--output", required=True, metavar="OUT", help="the output directory"
+    )
+    build.add_argument(
+        "--backend", required=True, help="the backend class, as MODULE:CLASS"
+    )
+    build.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        metavar="N",
+        help="the number of worker processes (default: one per CPU)",
+    )
+    build.add_argument(
+        "--extension", default=".varphi", help="the extension of the sources"
+    )
+    build.add_argument(
+        "--suffix", default=".out", help="the extension given to the outputs"
+    )
+    build.add_argument(
+        "-B", "--force", action="store_true", help="rebuild up-to-date outputs too"
+    )
+    build.add_argument(
+        "-v", "--verbose", action="store_true", help="report every compiled source"
+    )
+    build.set_defaults(run=_build)
+
+    for command in (serve, compile_, metrics):
+        command.add_argument(
+            "--socket", default=default_socket_path(), help="the socket of the daemon"
+        )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the command-line tool, and return its exit status."""
+    args = _parser().parse_args(argv)
+    try:
+        return args.run(args)
+    except (OSError, ValueError, ImportError) as error:
+        print(f"varphi-devkit: {error}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+A compact representation of transitions for backends handling very large programs.
+
+State names, symbols and directions are interned into per-compile symbol tables, which assign them dense integer IDs in
+order of first appearance, and compact transitions only reference those IDs. Equal ID tuples are shared as well, so a
+compact transition costs a single small object, whatever the number of tapes.
+"""
+
+from dataclasses import dataclass, field
+
+from .compiler import VarphiTransition, LEFT, RIGHT, STAY
+
+
+class VarphiSymbolTable:
+    """
+    Interns names into dense integer IDs (0, 1, 2, ...), in order of first appearance.
+    Attributes:
+        - names (list[str]): The interned names, indexed by their ID.
+    """
+
+    __slots__ = ("names", "_ids", "_tuples")
+
+    def __init__(self, names: tuple[str, ...] = ()):
+        """Initialize a table, interning the given names first."""
+        self.names: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._tuples: dict[tuple[str, ...], tuple[int, ...]] = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name: str) -> int:
+        """Get the ID of a name, assigning it the next ID if it is new."""
+        id_ = self._ids.get(name)
+        if id_ is None:
+            id_ = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return id_
+
+    def intern_tuple(self, names: tuple[str, ...]) -> tuple[int, ...]:
+        """Get the tuple of IDs of a tuple of names. Equal tuples of names always give the same tuple object."""
+        ids = self._tuples.get(names)
+        if ids is None:
+            ids = self._tuples[names] = tuple(self.intern(name) for name in names)
+        return ids
+
+    def id(self, name: str) -> int:
+        """Get the ID of a name that has already been interned (raises KeyError otherwise)."""
+        return self._ids[name]
+
+    def __getitem__(self, id_: int) -> str:
+        return self.names[id_]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class VarphiSymbolTables:
+    """
+    The symbol tables shared by the compact transitions of a program.
+    Attributes:
+        - states (VarphiSymbolTable): The state names.
+        - symbols (VarphiSymbolTable): The tape symbols, including BLANK and canonical variables ($1, $2, ...).
+        - directions (VarphiSymbolTable): The shift directions, with the fixed IDs LEFT = 0, RIGHT = 1 and STAY = 2.
+    """
+
+    __slots__ = ("states", "symbols", "directions")
+
+    def __init__(self):
+        """Initialize empty tables."""
+        self.states = VarphiSymbolTable()
+        self.symbols = VarphiSymbolTable()
+        self.directions = VarphiSymbolTable((LEFT, RIGHT, STAY))
+
+    def compact(self, transition: VarphiTransition) -> "VarphiCompactTransition":
+        """Convert a transition to its compact form, interning its names."""
+        return VarphiCompactTransition(
+            self.states.intern(transition.current_state),
+            self.symbols.intern_tuple(transition.read_symbols),
+            self.states.intern(transition.next_state),
+            self.symbols.intern_tuple(transition.write_symbols),
+            self.directions.intern_tuple(transition.shift_directions),
+            transition.line_number,
+            self,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class VarphiCompactTransition:
+    """
+    A transition referencing its names by their IDs in a set of symbol tables.
+    Attributes:
+        - current_state (int): ID of the current state in tables.states.
+        - read_symbols (tuple[int, ...]): IDs of the read symbols in tables.symbols.
+        - next_state (int): ID of the next state in tables.states.
+        - write_symbols (tuple[int, ...]): IDs of the write symbols in tables.symbols.
+        - shift_directions (tuple[int, ...]): IDs of the shift directions in tables.directions.
+        - line_number (int): The line number in the source code this transition corresponds to.
+        - tables (VarphiSymbolTables): The symbol tables the IDs refer to.
+    """
+
+    current_state: int
+    read_symbols: tuple[int, ...]
+    next_state: int
+    write_symbols: tuple[int, ...]
+    shift_directions: tuple[int, ...]
+    line_number: int
+    tables: VarphiSymbolTables = field(compare=False, repr=False)
+
+    def to_transition(self) -> VarphiTransition:
+        """Build the string view of this transition."""
+        states = self.tables.states.names
+        symbols = self.tables.symbols.names
+        directions = self.tables.directions.names
+        return VarphiTransition(
+            current_state=states[self.current_state],
+            read_symbols=tuple(symbols[i] for i in self.read_symbols),
+            next_state=states[self.next_state],
+            write_symbols=tuple(symbols[i] for i in self.write_symbols),
+            shift_directions=tuple(directions[i] for i in self.shift_directions),
+            line_number=self.line_number,
+        )
@@ -1,24 +1,55 @@
+import io
+import itertools
+import mmap
+import os
+import threading
+import time
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Optional
-from antlr4 import InputStream, CommonTokenStream, ParseTreeWalker
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    TextIO,
+)
 
-from .parser import VarphiLexer
-from .parser import VarphiParser
-from .parser import VarphiListener
+from .observe import VarphiCompileStats, _phase
+from .scanner import RawTransition, scan
 
 from .exceptions import (
-    VarphiErrorListener,
+    VarphiSyntaxError,
     VarphiTransitionInconsistentTapeCountError,
     VarphiGlobalTapeCountError,
     VarphiUndefinedVariableError,
 )
 
+if TYPE_CHECKING:
+    import asyncio
+    import concurrent.futures
+    from .cache import VarphiTransitionCache
+    from .compact import VarphiSymbolTables, VarphiCompactTransition
+    from .aio import _CompileControl
+    from .observe import VarphiCompileObserver
+    from antlr4 import CommonTokenStream, Token
+    from .parser import VarphiParser
+
 BLANK = "_"
 LEFT = "LEFT"
 RIGHT = "RIGHT"
 STAY = "STAY"
 
+_FRONTENDS = ("fast", "antlr")
+_ANTLR_MODES = ("treeless", "tree")
+# Number of distinct (reads, writes) patterns whose canonical forms are remembered
+CANONICAL_CACHE_SIZE = 4096
+
 
 @dataclass(frozen=True)
 class VarphiTransition:
@@ -41,58 +72,919 @@ class VarphiTransition:
     line_number: int
 
 
-class VarphiCompiler(VarphiListener, ABC):
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def _canonicalize_variables(
+    reads: tuple[str, ...], writes: tuple[str, ...]
+) -> tuple[tuple[str, ...], tuple[str, ...], Optional[int]]:
+    """
+    Map user variables to $1, $2, $3... based on appearance in the read tuple.
+    Returns the canonical read and write tuples, along with the index of the first write symbol using a variable
+    that is not defined in the read tuple (None if every variable is defined).
+    Programs repeat a few patterns over and over, so results are cached: equal patterns share their canonical tuples.
+    """
+    # NOTE: This is just an optimization so that equivalent patterns ($x, $y) and ($y, $x) are easy call "equivalent"
+    variable_map = {}
+    next_var_id = 1
+    canonical_reads = []
+    for sym in reads:
+        if sym.startswith("$"):
+            # Check if we have already assigned an ID to this variable (e.g. read($x, $x))
+            if sym not in variable_map:
+                variable_map[sym] = f"${next_var_id}"
+                next_var_id += 1
+            canonical_reads.append(variable_map[sym])
+        else:
+            canonical_reads.append(sym)
+
+    # Map write variables to their canonical versions
+    canonical_writes = []
+    for i, sym in enumerate(writes):
+        if sym.startswith("$"):
+            if sym not in variable_map:
+                # This variable is not defined in the read tuple
+                return tuple(canonical_reads), tuple(canonical_writes), i
+            canonical_writes.append(variable_map[sym])
+        else:
+            canonical_writes.append(sym)
+
+    return tuple(canonical_reads), tuple(canonical_writes), None
+
+
+@dataclass(frozen=True, slots=True)
+class VarphiCompilerConfig:
+    """
+    The configuration of a Varphi compiler, frozen for the duration of each compile (see VarphiCompiler for details).
+    Attributes:
+        - frontend (str): The front end parsing programs, "fast" or "antlr".
+        - antlr_mode (str): How transitions are extracted when parsing with ANTLR, "treeless" or "tree".
+        - compact (bool): Whether transitions are handled as VarphiCompactTransitions.
+        - cache (Optional[VarphiTransitionCache]): The cache of the transitions of previously parsed programs, if any.
+        - batch_size (int): The maximum number of transitions passed to each call of handle_transitions().
+        - observer (Optional[VarphiCompileObserver]): The observer of the compiles, if any.
+    """
+
+    frontend: str = "fast"
+    antlr_mode: str = "treeless"
+    compact: bool = False
+    cache: Optional["VarphiTransitionCache"] = None
+    batch_size: int = 256
+    observer: Optional["VarphiCompileObserver"] = None
+
+    def __post_init__(self):
+        if self.frontend not in _FRONTENDS:
+            raise ValueError(f"Unknown frontend: {self.frontend!r}")
+        if self.antlr_mode not in _ANTLR_MODES:
+            raise ValueError(f"Unknown ANTLR mode: {self.antlr_mode!r}")
+        if self.batch_size < 1:
+            raise ValueError(f"Batch sizes must be positive, not {self.batch_size}")
+
+
+class VarphiCompileSession:
+    """
+    The state of a single compile (or of a backend kept up to date by a VarphiIncrementalCompiler).
+    Backends may store their own per-compile state as additional attributes, typically set in init_session().
+    Attributes:
+        - compiler (VarphiCompiler): The compiler this session belongs to.
+        - config (VarphiCompilerConfig): The configuration of the compiler when the session was opened.
+        - expected_tape_count (Optional[int]): The tape count of the first transition of the program, once known.
+        - symbol_tables (Optional[VarphiSymbolTables]): The tables interning the names of compact transitions, once created.
+        - control (Optional[_CompileControl]): The control checked while compiling from asyncio code, if any.
+        - output (Optional[TextIO]): The sink of the compiled program, once created (see VarphiCompiler.output).
+        - stats (Optional[VarphiCompileStats]): The statistics of the compile, if the configuration has an observer.
+    """
+
+    def __init__(self, compiler: "VarphiCompiler", config: VarphiCompilerConfig):
+        """Initialize a session for a compile by compiler with the given configuration."""
+        self.compiler = compiler
+        self.config = config
+        self.expected_tape_count: Optional[int] = None
+        self.symbol_tables: Optional["VarphiSymbolTables"] = None
+        self.control: Optional["_CompileControl"] = _compile_control.get()
+        self.output: Optional[TextIO] = None
+        self.stats: Optional[VarphiCompileStats] = (
+            VarphiCompileStats() if config.observer is not None else None
+        )
+
+
+@lru_cache(maxsize=64)
+def _config(
+    frontend: str,
+    antlr_mode: str,
+    compact: bool,
+    cache: Optional["VarphiTransitionCache"],
+    batch_size: int,
+    observer: Optional["VarphiCompileObserver"],
+) -> VarphiCompilerConfig:
+    """Get the (immutable, hence shared) configuration with the given values."""
+    return VarphiCompilerConfig(
+        frontend, antlr_mode, compact, cache, batch_size, observer
+    )
+
+
+# The session of the compile running in the current thread (or asyncio task), and the control to give new sessions
+_current_session: ContextVar[Optional[VarphiCompileSession]] = ContextVar(
+    "varphi_devkit_session", default=None
+)
+_compile_control: ContextVar[Optional["_CompileControl"]] = ContextVar(
+    "varphi_devkit_control", default=None
+)
+
+
+class _TokenContext(NamedTuple):
+    """Stands in for the parse tree context of a construct starting at the given token, for diagnostics."""
+
+    start: "Token"
+
+
+class VarphiCompiler(ABC):
     """
     An abstract Varphi compiler.
 
     Concrete Varphi compiler implementations must subclass this class and implement the following methods:
         - handle_transition(self, transition: VarphiTransition) -> None: Automatically called at compile-time on each transition in the Varphi program
         - generate_compiled_program(self) -> str: Returns the compiled Varphi program after all transitions have been handled via handle_transition()
+    Backends producing large programs can implement write_compiled_program(self, output: TextIO) -> None instead of
+    generate_compiled_program(), writing the compiled program to a sink one chunk at a time (and possibly writing to
+    the `output` sink while handling transitions). compile_to() then streams the compiled program to a file, while
+    compile() still returns it as a string.
     If __init__() is overridden to add additional attributes (e.g., the compiled program so far), then
         - super().__init__() must be called
         - compile(self, program: str) -> str must be overridden to reset the state, followed by a call to super().__init__()
+        - keyword arguments of compile() (e.g., workers) should be accepted and passed on to super().compile()
+    Alternatively, per-compile state can be kept in the session of each compile instead: it is initialized by
+    overriding init_session(self, session: VarphiCompileSession) -> None, and reached through the `session` property.
+    Such compilers need no reset, and a single instance can then compile several programs at the same time, from
+    different threads or asyncio tasks.
+
+    The front end used to parse programs is selected by the `frontend` attribute (per class or per instance):
+        - "fast" (default): A hand-written single-pass scanner. If it hits an error, the program is re-parsed with ANTLR to produce rich diagnostics.
+        - "antlr": Always parse with the ANTLR-generated lexer and parser.
+    When parsing with ANTLR, the `antlr_mode` attribute (per class or per instance) selects how transitions are extracted:
+        - "treeless" (default): Do not build a parse tree, and read the transitions off the token stream. Prediction uses SLL first and only falls back to full LL prediction (and the usual error reporting) if it fails.
+        - "tree": Build a full parse tree with full LL prediction, and walk it.
+    Subclasses that override any VarphiListener callback (e.g. enterTransition) are always parsed with ANTLR, building a parse tree.
+    The ANTLR runtime and the generated parser are only imported the first time a program is parsed with ANTLR.
+
+    Setting the `cache` attribute to a VarphiTransitionCache lets compile() reuse the transitions of programs it has
+    already parsed successfully (with the fast front end) instead of parsing them again.
+
+    Backends can also override handle_transitions(self, transitions: list) -> None to handle transitions in batches of
+    at most `batch_size` (an attribute, per class or per instance) at a time, which saves a call per transition. Batches
+    are used whenever the front end has several transitions at hand (e.g. compile() and compile_file() of valid
+    programs); handle_transition() is still called on transitions handled one at a time (e.g. by compile_stream(), or
+    when walking a parse tree), so it must be implemented too.
+
+    Setting the `compact` attribute to True makes handle_transition() (and retract_transition()) receive
+    VarphiCompactTransitions instead of VarphiTransitions. Their names are interned into the `symbol_tables` of the
+    compile, which are created anew for each compiled program.
+
+    These attributes are frozen into a VarphiCompilerConfig (see the `config` property) when each compile starts, so
+    changing them does not affect compiles in progress.
     """
 
-    _expected_tape_count: Optional[int]
+    frontend: str = "fast"
+    antlr_mode: str = "treeless"
+    cache: Optional["VarphiTransitionCache"] = None
+    compact: bool = False
+    batch_size: int = 256
+    observer: Optional["VarphiCompileObserver"] = None
 
     def __init__(self):
         """Initialize this compiler."""
-        self._expected_tape_count = None
+        pass
+
+    def __getstate__(self) -> dict:
+        """Pickle compilers without the sessions of their last compiles (see the `session` property)."""
+        state = self.__dict__.copy()
+        state.pop("_last_sessions", None)
+        return state
 
     @abstractmethod
-    def handle_transition(self, transition: VarphiTransition) -> None:
+    def handle_transition(
+        self, transition: "VarphiTransition | VarphiCompactTransition"
+    ) -> None:
         """Handle a single transition in a Varphi program."""
         pass
 
-    @abstractmethod
     def generate_compiled_program(self) -> str:
-        """Generate the compiled program after all transitions have been handled."""
+        """
+        Generate the compiled program after all transitions have been handled.
+        Compilers must implement either this method or write_compiled_program(): by default, this returns what
+        write_compiled_program() writes, after what was written to the `output` sink while handling transitions.
+        """
+        if not _overrides_write_compiled_program(type(self)):
+            raise NotImplementedError(
+                f"{type(self).__name__} implements neither generate_compiled_program() nor write_compiled_program()"
+            )
+        output = self.output
+        position = output.tell()
+        self.write_compiled_program(output)
+        program = output.getvalue()
+        # Leave the sink as it was, so that the program can be generated again (e.g. by VarphiIncrementalCompiler)
+        output.seek(position)
+        output.truncate()
+        return program
+
+    def write_compiled_program(self, output: TextIO) -> None:
+        """
+        Write the compiled program to a text sink after all transitions have been handled, e.g. one chunk at a time.
+        Optional: by default, this writes the result of generate_compiled_program().
+        """
+        output.write(self.generate_compiled_program())
+
+    def handle_transitions(
+        self, transitions: "list[VarphiTransition] | list[VarphiCompactTransition]"
+    ) -> None:
+        """
+        Handle a batch of consecutive transitions in a Varphi program.
+        Optional: the default implementation calls handle_transition() on each of them.
+        """
+        for transition in transitions:
+            self.handle_transition(transition)
+
+    def retract_transition(
+        self, transition: "VarphiTransition | VarphiCompactTransition"
+    ) -> None:
+        """
+        Undo a transition previously passed to handle_transition().
+        Optional: VarphiIncrementalCompiler only replays the transitions affected by an edit to compilers implementing it.
+        """
+        raise NotImplementedError
+
+    def init_session(self, session: VarphiCompileSession) -> None:
+        """
+        Initialize the per-compile state of this compiler in a new session, before any transition is handled.
+        Optional: compilers keeping all their per-compile state in sessions can compile several programs at a time.
+        """
         pass
 
-    def compile(self, program: str) -> str:
-        """Compile a Varphi program."""
-        # Reset state (subclasses must do so for their own state too)
-        self._expected_tape_count = None
+    @property
+    def config(self) -> VarphiCompilerConfig:
+        """The current configuration of this compiler (raises ValueError if it is not valid)."""
+        return _config(
+            self.frontend,
+            self.antlr_mode,
+            self.compact,
+            self.cache,
+            self.batch_size,
+            self.observer,
+        )
+
+    @property
+    def session(self) -> Optional[VarphiCompileSession]:
+        """
+        The session of the compile by this compiler running in the current thread (or asyncio task).
+        Outside of a compile, the session of the last compile that finished in the current thread (None if there was
+        none), so that threads sharing a compiler never see each other's results.
+        """
+        session = _current_session.get()
+        if session is not None and session.compiler is self:
+            return session
+        last_sessions = self.__dict__.get("_last_sessions")
+        return getattr(last_sessions, "session", None)
+
+    @property
+    def output(self) -> TextIO:
+        """
+        The text sink of the compiled program of the current compile, which backends may write to while handling
+        transitions: the destination of compile_to(), or an in-memory buffer behind the value returned by compile().
+        """
+        session = self.session
+        if session.output is None:
+            session.output = io.StringIO()
+        return session.output
+
+    @property
+    def stats(self) -> Optional[VarphiCompileStats]:
+        """The statistics of the current (or last) compile, if an observer was attached to it."""
+        session = self.session
+        return session.stats if session is not None else None
+
+    @property
+    def symbol_tables(self) -> Optional["VarphiSymbolTables"]:
+        """The symbol tables of the compact transitions of the current (or last) compile, if any."""
+        session = self.session
+        return session.symbol_tables if session is not None else None
+
+    def compile(self, program: str, workers: int = 1) -> str:
+        """
+        Compile a Varphi program.
+        With workers > 1, large programs are scanned in chunks on a pool of that many processes (fast front end only).
+        Transitions are still handled in source order, and errors are reported exactly as with a single worker.
+        """
+        with self._session_scope() as session:
+            self._handle_program(session, program, workers)
+            return self._generate(session)
+
+    def compile_file(self, path: "str | os.PathLike") -> str:
+        """
+        Compile a Varphi program stored in a UTF-8 encoded file.
+
+        The file is memory-mapped and scanned one line at a time, so its contents are never copied into memory as a
+        whole (only the ANTLR front end, which is also used to report errors, decodes the entire file).
+        Transitions are handled and errors are reported exactly as with compile() on the contents of the file.
+        """
+        with self._session_scope() as session:
+            config = session.config
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    # Empty files cannot be memory-mapped
+                    self._parse_with_antlr(session, "")
+                    return self._generate(session)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                    if self._uses_fast_frontend(config):
+                        cache = config.cache
+                        with _phase(session, "scan"):
+                            transitions = (
+                                cache.get(source) if cache is not None else None
+                            )
+                            if not transitions:
+                                transitions = self._scan_program(
+                                    session, _decode_lines(source)
+                                )
+                                if transitions is not None and cache is not None:
+                                    cache.put(source, transitions)
+                        if transitions is not None:
+                            self._dispatch_transitions(session, transitions)
+                            return self._generate(session)
+                        session.expected_tape_count = None
+                    program = str(source, "utf-8")
+
+            self._parse_with_antlr(session, program)
+            return self._generate(session)
+
+    def compile_stream(self, lines: Iterable[str]) -> str:
+        """
+        Compile a Varphi program read incrementally from a text file or any iterable of lines.
+
+        Each transition is handed to handle_transition() as soon as its line is complete, and nothing but the current
+        line is retained, so memory use does not grow with the size of the program. Unlike compile(), transitions
+        preceding an error have already been handled when the error is raised.
+        Files should be opened with newline="\\n" so that line endings reach the compiler untranslated.
+        """
+        with self._session_scope() as session:
+            self._handle_stream(session, lines)
+            return self._generate(session)
+
+    def compile_to(
+        self,
+        program: "str | Iterable[str]",
+        destination: "str | os.PathLike | TextIO",
+    ) -> None:
+        """
+        Compile a Varphi program, writing the compiled program to a text file (or any file-like object) as it goes.
+
+        program is either a whole program (compiled as by compile()) or an iterable of lines (compiled as by
+        compile_stream(), so that memory use does not grow with the size of the program). destination is either the
+        path of the output, which is only replaced once the program compiled successfully, or a writable text sink.
+        The compiled program is written by write_compiled_program(), and backends may also write to the `output` sink
+        while handling transitions, so that it never needs to be held in memory as a whole.
+        As compile() is not called, compilers resetting their state in compile() must keep it in sessions instead.
+        """
+        if isinstance(destination, (str, os.PathLike)):
+            with _atomic_output(destination) as output:
+                self.compile_to(program, output)
+            return
+        with self._session_scope() as session:
+            session.output = destination
+            if isinstance(program, str):
+                self._handle_program(session, program)
+            else:
+                self._handle_stream(session, program)
+            with _phase(session, "generate"):
+                self.write_compiled_program(destination)
+
+    async def compile_async(
+        self,
+        program: str,
+        *,
+        executor: Optional["concurrent.futures.Executor"] = None,
+        semaphore: Optional["asyncio.Semaphore"] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """
+        Compile a Varphi program from asyncio code, without blocking the event loop.
+
+        The compile runs in executor (a thread pool executor; the default executor of the loop if None), once semaphore
+        (if any) has been acquired, so that a shared semaphore bounds the number of concurrent compiles (it is only
+        released once the compile is over in the executor, even if the calling task was cancelled before).
+        It is aborted between two lines or transitions when the calling task is cancelled, or with a TimeoutError once
+        it has run for more than timeout seconds (parsing with ANTLR itself cannot be interrupted).
+        Concurrent compiles by a single compiler require it to keep its per-compile state in sessions (see init_session()).
+        """
+        from .aio import compile_async
+
+        return await compile_async(
+            self, program, executor=executor, semaphore=semaphore, timeout=timeout
+        )
+
+    def compile_async_iter(
+        self,
+        program: str,
+        *,
+        executor: Optional["concurrent.futures.Executor"] = None,
+        semaphore: Optional["asyncio.Semaphore"] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator["VarphiTransition | VarphiCompactTransition"]:
+        """
+        Compile a Varphi program like compile_async(), yielding every transition once it has been handled.
+        Transitions are passed to the event loop in batches, and the compile pauses while the consumer falls behind.
+        Breaking out of the iteration (or cancelling the iterating task) aborts the compile.
+        """
+        from .aio import compile_async_iter
+
+        return compile_async_iter(
+            self, program, executor=executor, semaphore=semaphore, timeout=timeout
+        )
+
+    def check(self, program: str) -> list[VarphiSyntaxError]:
+        """
+        Find every error in a Varphi program in a single pass, without handling any transition.
+        Returns the errors in source order (an empty list if the program is valid), but for the first one (see below).
+
+        Errors are recovered from at the end of each line (or of each transition spanning several lines), so every line
+        is checked on its own, and the global tape count is the one of the first valid transition.
+        The first error is always the one compile() raises, even if it is not the first in source order (compile()
+        reports syntax errors before tape count and variable errors).
+        """
+        # Checking uses a session of its own, which is neither initialized by the backend nor kept as the last one
+        session = VarphiCompileSession(self, self.config)
+        errors = []
+        checked_any = False
+        lines = io.StringIO(program, newline="\n").readlines()
+        for raw, first_line, source in scan(lines):
+            checked_any = True
+            if raw is not None and self._build_transition(session, raw) is not None:
+                continue
+            # Re-parse the exact text of the line (with its own line terminator, if any), as compile() would see it
+            end = first_line + source.count("\n")
+            errors.extend(
+                self._check_line_with_antlr(
+                    session, "".join(lines[first_line - 1 : end]), first_line
+                )
+            )
+        if not checked_any:
+            # The grammar requires at least one transition: parse the whole (blank) program to report it
+            return self._check_line_with_antlr(session, program, 1)
+        if errors:
+            # compile() parses the whole program with ANTLR once anything is wrong, and raises the first error of that
+            # parse, which may depend on the surrounding lines: report that error (instead of the ones of its line)
+            whole = VarphiCompileSession(self, self.config)
+            first_errors = self._check_line_with_antlr(whole, program, 1)
+            if first_errors:
+                first = first_errors[0]
+                errors = [first] + [e for e in errors if e.line != first.line]
+        return errors
+
+    def _handle_program(
+        self, session: VarphiCompileSession, program: str, workers: int = 1
+    ) -> None:
+        """Parse a whole program, and handle every transition (see compile())."""
+        config = session.config
+        if self._uses_fast_frontend(config):
+            cache = config.cache
+            with _phase(session, "scan"):
+                transitions = cache.get(program) if cache is not None else None
+                if not transitions:
+                    if workers > 1:
+                        from .parallel import scan_parallel
+
+                        transitions = scan_parallel(program, workers)
+                    else:
+                        transitions = self._scan_program(
+                            session, io.StringIO(program, newline="\n")
+                        )
+                    if transitions is not None and cache is not None:
+                        cache.put(program, transitions)
+            if transitions is not None:
+                self._dispatch_transitions(session, transitions)
+                return
+            # The fast front end hit an error: re-parse with ANTLR to raise the rich diagnostic
+            session.expected_tape_count = None
+
+        self._parse_with_antlr(session, program)
+
+    def _handle_stream(
+        self, session: VarphiCompileSession, lines: Iterable[str]
+    ) -> None:
+        """Parse a program one line at a time, and handle every transition as soon as it is complete (see compile_stream())."""
+        fast = self._uses_fast_frontend(session.config)
+        handled_any = False
+        with _phase(session, "scan"):
+            for raw, first_line, source in scan(lines):
+                handled_any = True
+                if fast and raw is not None:
+                    transition = self._build_transition(session, raw)
+                    if transition is not None:
+                        self._emit(session, transition)
+                        continue
+                # Re-parse just this line with ANTLR, which either handles it or raises the rich diagnostic
+                self._parse_line_with_antlr(session, source + "\n", first_line)
+
+        if not handled_any:
+            # The grammar requires at least one transition
+            self._parse_line_with_antlr(session, "", 1)
 
-        input_stream = InputStream(program)
-        error_listener = VarphiErrorListener()
+    def _generate(self, session: VarphiCompileSession) -> str:
+        """Generate the compiled program of a session."""
+        with _phase(session, "generate"):
+            return self.generate_compiled_program()
 
-        lexer = VarphiLexer(input_stream)
-        lexer.removeErrorListeners()
-        lexer.addErrorListener(error_listener)
+    def _open_session(self) -> VarphiCompileSession:
+        """Open a new session with the current configuration, and let the backend initialize its state in it."""
+        session = VarphiCompileSession(self, self.config)
+        self.init_session(session)
+        return session
+
+    @contextmanager
+    def _session_scope(
+        self, session: Optional[VarphiCompileSession] = None
+    ) -> Iterator[VarphiCompileSession]:
+        """
+        Make a session (a new one if None) the current session of this compiler in the current context.
+        A new session is the one of a compile: the observer (if any) is told when it starts and ends.
+        """
+        stats = None
+        if session is None:
+            session = self._open_session()
+            stats = session.stats
+        token = _current_session.set(session)
+        try:
+            if stats is None:
+                yield session
+                return
+            observer = session.config.observer
+            observer.compile_started(stats)
+            start = time.perf_counter()
+            try:
+                yield session
+            except BaseException as error:
+                stats.seconds = time.perf_counter() - start
+                stats.tape_count = session.expected_tape_count
+                observer.compile_failed(stats, error)
+                raise
+            stats.seconds = time.perf_counter() - start
+            stats.tape_count = session.expected_tape_count
+            observer.compile_finished(stats)
+        finally:
+            _current_session.reset(token)
+            last_sessions = self.__dict__.get("_last_sessions")
+            if last_sessions is None:
+                last_sessions = self.__dict__.setdefault(
+                    "_last_sessions", threading.local()
+                )
+            last_sessions.session = session
+
+    def _uses_fast_frontend(self, config: VarphiCompilerConfig) -> bool:
+        """Check whether programs can be parsed with the hand-written scanner instead of ANTLR."""
+        if config.frontend == "antlr":
+            return False
+        return not _overrides_listener_callbacks(type(self))
+
+    def _builds_parse_tree(self, config: VarphiCompilerConfig) -> bool:
+        """Check whether parsing with ANTLR must build and walk a parse tree."""
+        if config.antlr_mode == "tree":
+            return True
+        return _overrides_listener_callbacks(type(self))
+
+    def _scan_program(
+        self, session: VarphiCompileSession, lines: Iterable[str]
+    ) -> Optional[list[VarphiTransition]]:
+        """
+        Parse and validate a program with the hand-written scanner.
+        Returns None if the program contains any error, without calling handle_transition() on anything.
+        """
+        transitions = []
+        control = session.control
+        for raw, _, _ in scan(lines):
+            if control is not None:
+                control.check()
+            if raw is None:
+                return None
+            transition = self._build_transition(session, raw)
+            if transition is None:
+                return None
+            transitions.append(transition)
+        # The grammar requires at least one transition
+        return transitions or None
+
+    def _dispatch_transitions(
+        self, session: VarphiCompileSession, transitions: list[VarphiTransition]
+    ) -> None:
+        """Hand the transitions of a program parsed without errors to handle_transition(), in order."""
+        session.expected_tape_count = len(transitions[0].read_symbols)
+        with _phase(session, "handle"):
+            if (
+                session.config.compact
+                or session.control is not None
+                or session.stats is not None
+                or _overrides_handle_transitions(type(self))
+            ):
+                self._emit_all(session, transitions)
+            else:
+                for transition in transitions:
+                    self.handle_transition(transition)
 
-        token_stream = CommonTokenStream(lexer)
-        parser = VarphiParser(token_stream)
-        parser.removeErrorListeners()
-        parser.addErrorListener(error_listener)
+    def _emit(
+        self, session: VarphiCompileSession, transition: VarphiTransition
+    ) -> None:
+        """Hand a transition to handle_transition(), in compact form if the session is configured so."""
+        control = session.control
+        if control is not None:
+            control.check()
+        stats = session.stats
+        if stats is not None:
+            stats.count(transition)
+        if session.config.compact:
+            transition = self._symbol_tables(session).compact(transition)
+        if stats is None:
+            self.handle_transition(transition)
+        else:
+            with _phase(session, "handle", notify=False):
+                self.handle_transition(transition)
+        if control is not None:
+            control.transition(transition)
 
-        tree = parser.program()
-        walker = ParseTreeWalker()
-        walker.walk(self, tree)
+    def _emit_all(
+        self, session: VarphiCompileSession, transitions: Iterable[VarphiTransition]
+    ) -> None:
+        """Hand transitions to the backend, in batches if it handles batches (see _emit())."""
+        if not _overrides_handle_transitions(type(self)):
+            for transition in transitions:
+                self._emit(session, transition)
+            return
+        control = session.control
+        stats = session.stats
+        iterator = iter(transitions)
+        while batch := list(itertools.islice(iterator, session.config.batch_size)):
+            if control is not None:
+                control.check()
+            if stats is not None:
+                for transition in batch:
+                    stats.count(transition)
+            if session.config.compact:
+                tables = self._symbol_tables(session)
+                batch = [tables.compact(transition) for transition in batch]
+            with _phase(session, "handle", notify=False):
+                self.handle_transitions(batch)
+            if control is not None:
+                for transition in batch:
+                    control.transition(transition)
 
-        return self.generate_compiled_program()
+    def _retract(
+        self, session: VarphiCompileSession, transition: VarphiTransition
+    ) -> None:
+        """Hand a transition to retract_transition(), in compact form if the session is configured so."""
+        if session.config.compact:
+            transition = self._symbol_tables(session).compact(transition)
+        self.retract_transition(transition)
 
-    def enterTransition(self, ctx: VarphiParser.TransitionContext) -> None:
+    @staticmethod
+    def _symbol_tables(session: VarphiCompileSession) -> "VarphiSymbolTables":
+        """Get the symbol tables of a session, creating them on first use."""
+        if session.symbol_tables is None:
+            from .compact import VarphiSymbolTables
+
+            session.symbol_tables = VarphiSymbolTables()
+        return session.symbol_tables
+
+    @staticmethod
+    def _build_transition(
+        session: VarphiCompileSession, raw: RawTransition
+    ) -> Optional[VarphiTransition]:
+        """Validate and canonicalize a raw transition from the scanner, or return None if it is not valid."""
+        current_state, reads, next_state, writes, shifts, line_number = raw
+        current_tape_count = len(reads)
+        if len(writes) != current_tape_count or len(shifts) != current_tape_count:
+            return None
+        if session.expected_tape_count is None:
+            session.expected_tape_count = current_tape_count
+        elif current_tape_count != session.expected_tape_count:
+            return None
+        canonical_reads, canonical_writes, undefined = _canonicalize_variables(
+            reads, writes
+        )
+        if undefined is not None:
+            return None
+        return VarphiTransition(
+            current_state=current_state,
+            read_symbols=canonical_reads,
+            next_state=next_state,
+            write_symbols=canonical_writes,
+            shift_directions=shifts,
+            line_number=line_number,
+        )
+
+    def _parse_with_antlr(
+        self, session: VarphiCompileSession, program: str, first_line: int = 1
+    ) -> None:
+        """
+        Parse a program with the ANTLR-generated lexer and parser, and handle every transition.
+        first_line is the line number of the first line of program, when it is a fragment of a larger source.
+        """
+        try:
+            self._parse_and_handle_with_antlr(session, program, first_line)
+        except VarphiSyntaxError as error:
+            # Keep the ANTLR exceptions and the frames of the parser from being kept alive by the diagnostic
+            error.__context__ = None
+            raise error.with_traceback(None)
+
+    def _parse_and_handle_with_antlr(
+        self, session: VarphiCompileSession, program: str, first_line: int
+    ) -> None:
+        """Parse a program with ANTLR and handle every transition (see _parse_with_antlr())."""
+        from .antlr import (
+            BailErrorStrategy,
+            ParseCancellationException,
+            ParseTreeWalker,
+            PredictionMode,
+            parser_pool,
+        )
+
+        stats = session.stats
+        if self._builds_parse_tree(session.config):
+            with parser_pool.parser(program, first_line) as (token_stream, parser):
+                self._lex(session, token_stream)
+                with _phase(session, "parse"):
+                    tree = parser.program()
+                with _phase(session, "walk"):
+                    ParseTreeWalker().walk(self, tree)
+                if stats is not None:
+                    stats.tokens += len(token_stream.tokens)
+            return
+
+        # SLL prediction accepts every valid program of this grammar, so full LL prediction is only needed on errors
+        with parser_pool.parser(program, first_line) as (token_stream, parser):
+            parser.buildParseTrees = False
+            parser._interp.predictionMode = PredictionMode.SLL
+            parser._errHandler = BailErrorStrategy()
+            parser.removeErrorListeners()
+            try:
+                self._lex(session, token_stream)
+                with _phase(session, "parse"):
+                    parser.program()
+                tokens = token_stream.tokens
+            except (ParseCancellationException, VarphiSyntaxError):
+                tokens = None
+        if tokens is None:
+            # Parse again from scratch to report the first error exactly as full LL prediction finds it
+            with parser_pool.parser(program, first_line) as (token_stream, parser):
+                parser.buildParseTrees = False
+                self._lex(session, token_stream)
+                with _phase(session, "parse"):
+                    parser.program()
+                tokens = token_stream.tokens
+        if stats is not None:
+            stats.tokens += len(tokens)
+        with _phase(session, "walk"):
+            self._handle_tokens(session, tokens)
+
+    @staticmethod
+    def _lex(session: VarphiCompileSession, token_stream: "CommonTokenStream") -> None:
+        """
+        Lex a whole program up front when collecting statistics, so that lexing is timed apart from parsing.
+        Otherwise, the parser lexes the program as it goes.
+        """
+        if session.stats is not None:
+            with _phase(session, "lex"):
+                token_stream.fill()
+
+    def _handle_tokens(
+        self, session: VarphiCompileSession, tokens: list["Token"]
+    ) -> None:
+        """Handle the transitions of a successfully parsed program, given its tokens."""
+        self._emit_all(
+            session,
+            (
+                self._transition_from_tokens(session, transition_tokens)
+                for transition_tokens in _split_transition_tokens(tokens)
+            ),
+        )
+
+    def _transition_from_tokens(
+        self, session: VarphiCompileSession, tokens: list["Token"]
+    ) -> VarphiTransition:
+        """Extract, validate and canonicalize the transition made of the given tokens."""
+        from .antlr import VarphiParser
+
+        # The tokens are laid out as: state ( symbols ) state ( symbols ) ( directions ), with symbols separated by commas
+        closes = [i for i, t in enumerate(tokens) if t.type == VarphiParser.RPAREN]
+        read_tokens = tokens[2 : closes[0] : 2]
+        write_tokens = tokens[closes[0] + 3 : closes[1] : 2]
+        shift_tokens = tokens[closes[1] + 2 : closes[2] : 2]
+
+        def extract_symbol(token: "Token") -> str:
+            """Given a symbol token, extract the corresponding symbol string."""
+            return BLANK if token.type == VarphiParser.BLANK_KW else token.text
+
+        return self._validate_transition(
+            session,
+            _TokenContext(tokens[0]),
+            tokens[0].text,
+            tuple(extract_symbol(t) for t in read_tokens),
+            tokens[closes[0] + 1].text,
+            tuple(extract_symbol(t) for t in write_tokens),
+            tuple(t.text for t in shift_tokens),
+            lambda i: _TokenContext(write_tokens[i]),
+        )
+
+    def _parse_line_with_antlr(
+        self, session: VarphiCompileSession, source: str, first_line: int
+    ) -> None:
+        """Parse a single logical line of a larger program with ANTLR, attaching its source text to any error."""
+        try:
+            self._parse_with_antlr(session, source, first_line)
+        except VarphiSyntaxError as error:
+            _attach_source_line(error, source, first_line)
+            raise
+
+    def _check_line_with_antlr(
+        self, session: VarphiCompileSession, source: str, first_line: int
+    ) -> list[VarphiSyntaxError]:
+        """Collect the errors in a single logical line of a larger program, attaching its source text to them."""
+        from .antlr import VarphiErrorCollector, parser_pool
+
+        collector = VarphiErrorCollector()
+        with parser_pool.parser(source, first_line, collector) as (
+            token_stream,
+            parser,
+        ):
+            parser.buildParseTrees = False
+            parser.program()
+            tokens = token_stream.tokens
+        errors = collector.errors
+        if not errors:
+            for transition_tokens in _split_transition_tokens(tokens):
+                try:
+                    self._transition_from_tokens(session, transition_tokens)
+                except VarphiSyntaxError as error:
+                    errors.append(error.with_traceback(None))
+        for error in errors:
+            _attach_source_line(error, source, first_line)
+        return errors
+
+    # The parse tree is walked with the compiler itself as the listener: these are the ParseTreeListener callbacks
+    def visitTerminal(self, node) -> None:
+        pass
+
+    def visitErrorNode(self, node) -> None:
+        pass
+
+    def enterEveryRule(self, ctx) -> None:
+        pass
+
+    def exitEveryRule(self, ctx) -> None:
+        pass
+
+    # The VarphiListener callbacks of every grammar rule, so that subclasses overriding them can call super()
+    def enterProgram(self, ctx: "VarphiParser.ProgramContext") -> None:
+        pass
+
+    def exitProgram(self, ctx: "VarphiParser.ProgramContext") -> None:
+        pass
+
+    def exitTransition(self, ctx: "VarphiParser.TransitionContext") -> None:
+        pass
+
+    def enterRead_symbols(self, ctx: "VarphiParser.Read_symbolsContext") -> None:
+        pass
+
+    def exitRead_symbols(self, ctx: "VarphiParser.Read_symbolsContext") -> None:
+        pass
+
+    def enterWrite_symbols(self, ctx: "VarphiParser.Write_symbolsContext") -> None:
+        pass
+
+    def exitWrite_symbols(self, ctx: "VarphiParser.Write_symbolsContext") -> None:
+        pass
+
+    def enterShift_directions(
+        self, ctx: "VarphiParser.Shift_directionsContext"
+    ) -> None:
+        pass
+
+    def exitShift_directions(self, ctx: "VarphiParser.Shift_directionsContext") -> None:
+        pass
+
+    def enterState_id(self, ctx: "VarphiParser.State_idContext") -> None:
+        pass
+
+    def exitState_id(self, ctx: "VarphiParser.State_idContext") -> None:
+        pass
+
+    def enterSymbol(self, ctx: "VarphiParser.SymbolContext") -> None:
+        pass
+
+    def exitSymbol(self, ctx: "VarphiParser.SymbolContext") -> None:
+        pass
+
+    def enterDirection(self, ctx: "VarphiParser.DirectionContext") -> None:
+        pass
+
+    def exitDirection(self, ctx: "VarphiParser.DirectionContext") -> None:
+        pass
+
+    def enterTransition(self, ctx: "VarphiParser.TransitionContext") -> None:
         """Extract information from a raw transition context, and delegate to handle_transition()."""
         current_state = ctx.current_state.getText()
         next_state = ctx.next_state.getText()
@@ -132,6 +1024,35 @@ class VarphiCompiler(VarphiListener, ABC):
             else ()
         )
 
+        # The parse tree is walked within the session of the compile
+        session = self.session
+        transition = self._validate_transition(
+            session,
+            ctx,
+            current_state,
+            reads,
+            next_state,
+            writes,
+            shifts,
+            lambda i: write_ctx.symbol(i),
+        )
+        self._emit(session, transition)
+
+    @staticmethod
+    def _validate_transition(
+        session: VarphiCompileSession,
+        ctx,
+        current_state: str,
+        reads: tuple[str, ...],
+        next_state: str,
+        writes: tuple[str, ...],
+        shifts: tuple[str, ...],
+        write_symbol_ctx: Callable[[int], object],
+    ) -> VarphiTransition:
+        """
+        Validate and canonicalize a transition extracted by ANTLR.
+        ctx is the context of the transition, and write_symbol_ctx maps the index of a write symbol to its context.
+        """
         # Check if the tuple-lengths of the transition are all the same
         if len(writes) != len(reads) or len(shifts) != len(reads):
             raise VarphiTransitionInconsistentTapeCountError(
@@ -140,46 +1061,155 @@ class VarphiCompiler(VarphiListener, ABC):
 
         # Use the tuple lengths of the first transition as ground truth and make sure all other transitions are consistent
         current_tape_count = len(reads)
-        if self._expected_tape_count is None:
-            self._expected_tape_count = current_tape_count
-        elif current_tape_count != self._expected_tape_count:
+        if session.expected_tape_count is None:
+            session.expected_tape_count = current_tape_count
+        elif current_tape_count != session.expected_tape_count:
             raise VarphiGlobalTapeCountError(
-                ctx, self._expected_tape_count, current_tape_count
+                ctx, session.expected_tape_count, current_tape_count
             )
 
-        # Map user variables to $1, $2, $3... based on appearance in the read tuple
-        # NOTE: This is just an optimization so that equivalent patterns ($x, $y) and ($y, $x) are easy call "equivalent"
-        variable_map = {}
-        next_var_id = 1
-        canonical_reads = []
-        for sym in reads:
-            if sym.startswith("$"):
-                # Check if we have already assigned an ID to this variable (e.g. read($x, $x))
-                if sym not in variable_map:
-                    variable_map[sym] = f"${next_var_id}"
-                    next_var_id += 1
-                canonical_reads.append(variable_map[sym])
-            else:
-                canonical_reads.append(sym)
-
-        # Map write variables to their canonical versions
-        canonical_writes = []
-        for i, sym in enumerate(writes):
-            if sym.startswith("$"):
-                if sym not in variable_map:
-                    # This variable is not defined in the read tuple
-                    specific_ctx = write_ctx.symbol(i)
-                    raise VarphiUndefinedVariableError(specific_ctx, sym)
-                canonical_writes.append(variable_map[sym])
-            else:
-                canonical_writes.append(sym)
+        canonical_reads, canonical_writes, undefined = _canonicalize_variables(
+            reads, writes
+        )
+        if undefined is not None:
+            specific_ctx = write_symbol_ctx(undefined)
+            raise VarphiUndefinedVariableError(specific_ctx, writes[undefined])
 
-        transition = VarphiTransition(
+        return VarphiTransition(
             current_state=current_state,
-            read_symbols=tuple(canonical_reads),
+            read_symbols=canonical_reads,
             next_state=next_state,
-            write_symbols=tuple(canonical_writes),
+            write_symbols=canonical_writes,
             shift_directions=shifts,
             line_number=ctx.start.line,
         )
-        self.handle_transition(transition)
+
+
+class _TransitionCollector(VarphiCompiler):
+    """Collects the transitions of the lines iter_transitions() re-parses with ANTLR, in its session."""
+
+    def init_session(self, session: VarphiCompileSession) -> None:
+        session.transitions = []
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        self.session.transitions.append(transition)
+
+    def handle_transitions(self, transitions: list[VarphiTransition]) -> None:
+        self.session.transitions.extend(transitions)
+
+    def generate_compiled_program(self) -> str:
+        return ""
+
+
+def iter_transitions(source: "str | Iterable[str]") -> Iterator[VarphiTransition]:
+    """
+    Lazily yield the validated, canonicalized transitions of a Varphi program, without subclassing VarphiCompiler.
+
+    source is either a whole program or an iterable of lines (e.g. a text file opened with newline="\\n"). Lines are
+    only read and parsed as transitions are requested, so a consumer stopping early (e.g. with itertools.islice() or
+    takewhile()) does not pay for the rest of the program, and errors are only raised once their line is reached.
+    Diagnostics are the same as those of compile_stream().
+    """
+    lines = io.StringIO(source, newline="\n") if isinstance(source, str) else source
+    collector = _TransitionCollector()
+    session = collector._open_session()
+    scanned_any = False
+    for raw, first_line, text in scan(lines):
+        scanned_any = True
+        if raw is not None:
+            transition = collector._build_transition(session, raw)
+            if transition is not None:
+                yield transition
+                continue
+        # Re-parse just this line with ANTLR, which either yields its transitions or raises the rich diagnostic
+        # (the session is only current while parsing, not while the consumer runs)
+        with collector._session_scope(session):
+            collector._parse_line_with_antlr(session, text + "\n", first_line)
+        yield from session.transitions
+        session.transitions.clear()
+
+    if not scanned_any:
+        # The grammar requires at least one transition
+        with collector._session_scope(session):
+            collector._parse_line_with_antlr(session, "", 1)
+
+
+def _attach_source_line(error: VarphiSyntaxError, source: str, first_line: int) -> None:
+    """Attach its line of source code to an error raised in a fragment of a program starting at first_line."""
+    source_lines = source.split("\n")
+    if 0 <= error.line - first_line < len(source_lines):
+        error.source_line = source_lines[error.line - first_line]
+
+
+def _split_transition_tokens(tokens: list["Token"]) -> Iterator[list["Token"]]:
+    """Split the tokens of a syntactically valid program into the tokens of each transition."""
+    from .antlr import Token, VarphiParser
+
+    # Every transition of a valid program is a run of tokens terminated by a NEWLINE or by EOF
+    transition_tokens = []
+    for token in tokens:
+        if token.type == VarphiParser.NEWLINE or token.type == Token.EOF:
+            if transition_tokens:
+                yield transition_tokens
+                transition_tokens = []
+        else:
+            transition_tokens.append(token)
+
+
+@contextmanager
+def _atomic_output(path: "str | os.PathLike") -> Iterator[TextIO]:
+    """Open a UTF-8 text file to be written, replacing the file at path only if the block exits without an error."""
+    # Imported on first use, as it takes a noticeable part of the import time of the package
+    import tempfile
+
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.fspath(path)) or ".", suffix=".tmp"
+    )
+    try:
+        # Temporary files are only readable by their owner: give the output the permissions of a new file instead
+        os.chmod(temp_path, _new_file_mode())
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as output:
+            yield output
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+@lru_cache(maxsize=None)
+def _new_file_mode() -> int:
+    """
+    The permissions of files created by open() in this process, as the umask allows.
+    The umask can only be read by setting it, so it is only read once, to keep threads from seeing the temporary one.
+    """
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def _decode_lines(source: mmap.mmap) -> Iterator[str]:
+    """Decode the lines of a UTF-8 encoded memory-mapped file one at a time, keeping their line terminators."""
+    for line in iter(source.readline, b""):
+        yield line.decode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _overrides_handle_transitions(cls: type) -> bool:
+    """Check whether a compiler class handles transitions in batches."""
+    return cls.handle_transitions is not VarphiCompiler.handle_transitions
+
+
+@lru_cache(maxsize=None)
+def _overrides_write_compiled_program(cls: type) -> bool:
+    """Check whether a compiler class writes its compiled programs to sinks itself."""
+    return cls.write_compiled_program is not VarphiCompiler.write_compiled_program
+
+
+@lru_cache(maxsize=None)
+def _overrides_listener_callbacks(cls: type) -> bool:
+    """Check whether a compiler class overrides or adds any parse tree listener callback."""
+    return any(
+        getattr(cls, name) is not getattr(VarphiCompiler, name, None)
+        for name in dir(cls)
+        if name.startswith(("enter", "exit", "visit"))
+    )
@@ -1,5 +1,4 @@
-from antlr4.error.ErrorListener import ErrorListener
-from antlr4 import Token
+from typing import Optional
 
 RESET = "\033[0m"
 BOLD = "\033[1m"
@@ -12,80 +11,118 @@ WHITE = "\033[97m"
 class VarphiSyntaxError(Exception):
     """
     Base exception class for all Varphi compilation errors.
-    Captures context (line, column, symbol).
+
+    Diagnostics are detached from the parser: everything needed to render them is captured when they are created, and
+    they keep no reference to the lexer, parser, tokens or source. They are therefore cheap to keep and to pickle.
+    Attributes:
+        - line (int): The line number of the error.
+        - column (int): The column (from 0) of the error.
+        - msg (str): The description of the error.
+        - token_length (int): The number of characters of the offending token, underlined when rendering the error.
+        - source_line (Optional[str]): The offending line of source code, if it could be found.
     """
 
     def __init__(self, recognizer, offendingSymbol, line, column, msg):
-        self.recognizer = recognizer
-        self.offendingSymbol = offendingSymbol
         self.line = line
         self.column = column
         self.msg = msg
+        self.token_length = 1
+        self.source_line = None
         super().__init__(msg)
+        try:
+            self._capture(recognizer, offendingSymbol)
+        except Exception:
+            # Fallback: If anything fails, the error is rendered without a code preview
+            pass
+
+    def __reduce__(self):
+        # Subclasses take other arguments than args, so rebuild errors from their attributes instead
+        return _rebuild_error, (type(self), self.args, self.__dict__)
 
     def __str__(self) -> str:
         # Start the error message with a bold red "error:" label
         result = [f"\n{BOLD}{RED}error:{RESET} {BOLD}{WHITE}{self.msg}{RESET}"]
         result.append(f"{BLUE}   -->{RESET} line {self.line}:{self.column + 1}")
 
-        # Attempt to retrieve the input stream to show the code snippet
-        stream = None
-        try:
-            # Try getting the stream from the recognizer (parser/lexer)
-            if self.recognizer:
-                temp_stream = self.recognizer.getInputStream()
-                if hasattr(temp_stream, "tokenSource"):
-                    stream = temp_stream.tokenSource.inputStream
-                else:
-                    stream = temp_stream
-
-            # If that fails, try getting it from the offending symbol (token)
-            elif self.offendingSymbol:
-                if hasattr(self.offendingSymbol, "getInputStream"):
-                    stream = self.offendingSymbol.getInputStream()
-                elif hasattr(self.offendingSymbol, "tokenSource"):
-                    stream = self.offendingSymbol.tokenSource.inputStream
-
-            # If we successfully found the stream, generate the code preview
-            if stream:
-                lines = str(stream).splitlines()
-                # Ensure the line number is valid within the source
-                if 0 <= self.line - 1 < len(lines):
-                    code_line = lines[self.line - 1]
-
-                    # Formatting constants for the "gutter"
-                    gutter_width = 4
-                    line_num_str = str(self.line)
-
-                    # Print the empty pipe above the code line
-                    result.append(f"{BLUE}{' ' * gutter_width} |{RESET}")
-
-                    # Print the actual line of code with the line number
-                    result.append(
-                        f"{BLUE}{line_num_str:>{gutter_width}} |{RESET} {code_line}"
-                    )
-
-                    # Calculate the length of the error squiggle (^)
-                    token_len = 1
-                    if self.offendingSymbol and isinstance(self.offendingSymbol, Token):
-                        start = self.offendingSymbol.start
-                        stop = self.offendingSymbol.stop
-                        if start is not None and stop is not None:
-                            token_len = stop - start + 1
-
-                    # Create the pointer line (e.g., "      |     ^~~~")
-                    padding = " " * self.column
-                    pointer = f"{BOLD}{RED}^{'~' * (token_len - 1)}{RESET}"
-                    result.append(
-                        f"{BLUE}{' ' * gutter_width} |{RESET} {padding}{pointer}"
-                    )
+        # If the offending line was found, generate the code preview
+        code_line = self.source_line
+        if code_line is not None:
+            # Formatting constants for the "gutter"
+            gutter_width = 4
+            line_num_str = str(self.line)
 
-        except Exception:
-            # Fallback: If anything fails during error generation, just return the basic message
-            pass
+            # Print the empty pipe above the code line
+            result.append(f"{BLUE}{' ' * gutter_width} |{RESET}")
+
+            # Print the actual line of code with the line number
+            result.append(f"{BLUE}{line_num_str:>{gutter_width}} |{RESET} {code_line}")
+
+            # Create the pointer line (e.g., "      |     ^~~~")
+            padding = " " * self.column
+            pointer = f"{BOLD}{RED}^{'~' * (self.token_length - 1)}{RESET}"
+            result.append(f"{BLUE}{' ' * gutter_width} |{RESET} {padding}{pointer}")
 
         return "\n".join(result)
 
+    def _capture(self, recognizer, offendingSymbol) -> None:
+        """Capture the length of the offending token and the offending line of source code."""
+        stream = None
+        index = None
+        if offendingSymbol is not None:
+            # An offending symbol implies that the ANTLR runtime is already loaded
+            from antlr4 import Token
+
+            if isinstance(offendingSymbol, Token):
+                start = offendingSymbol.start
+                stop = offendingSymbol.stop
+                if start is not None and stop is not None:
+                    self.token_length = max(stop - start + 1, 1)
+                    index = start
+
+        # Retrieve the input stream from the recognizer (parser/lexer), or else from the offending symbol (token)
+        if recognizer:
+            if hasattr(recognizer, "getInputStream"):
+                # Parsers read from a token stream
+                stream = recognizer.getInputStream().tokenSource.inputStream
+            else:
+                # Lexer errors start at the beginning of the token being matched
+                stream = recognizer.inputStream
+                index = recognizer._tokenStartCharIndex
+        elif offendingSymbol is not None:
+            if hasattr(offendingSymbol, "getInputStream"):
+                stream = offendingSymbol.getInputStream()
+            elif hasattr(offendingSymbol, "tokenSource"):
+                stream = offendingSymbol.tokenSource.inputStream
+
+        if stream:
+            self.source_line = _find_line(str(stream), self.line, index)
+
+
+def _find_line(text: str, line: int, index: Optional[int]) -> Optional[str]:
+    """
+    Retrieve a line of text, given its line number and, if known, the offset of a character on it.
+    With an offset, only that line is scanned, instead of the whole text.
+    """
+    if index is not None and 0 <= index <= len(text):
+        start = text.rfind("\n", 0, index) + 1
+        if start >= len(text):
+            return None
+        end = text.find("\n", index)
+        return text[start : end if end >= 0 else len(text)].rstrip("\r")
+    lines = text.splitlines()
+    # Ensure the line number is valid within the source
+    if 0 <= line - 1 < len(lines):
+        return lines[line - 1]
+    return None
+
+
+def _rebuild_error(cls: type, args: tuple, state: dict) -> VarphiSyntaxError:
+    """Rebuild a pickled error without calling its constructor."""
+    error = cls.__new__(cls)
+    error.args = args
+    error.__dict__.update(state)
+    return error
+
 
 class VarphiTransitionInconsistentTapeCountError(VarphiSyntaxError):
     """Raised when a single transition has mismatched read/write/shift tuple lengths."""
@@ -120,11 +157,10 @@ class VarphiUndefinedVariableError(VarphiSyntaxError):
         super().__init__(None, ctx.start, ctx.start.line, ctx.start.column, msg)
 
 
-class VarphiErrorListener(ErrorListener):
-    """Custom ANTLR ErrorListener that converts syntax errors into VarphiSyntaxErrors."""
-
-    def __init__(self):
-        super().__init__()
+def __getattr__(name: str):
+    # VarphiErrorListener depends on the ANTLR runtime, which is only loaded when first needed
+    if name == "VarphiErrorListener":
+        from .antlr import VarphiErrorListener
 
-    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
-        raise VarphiSyntaxError(recognizer, offendingSymbol, line, column, msg)
+        return VarphiErrorListener
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
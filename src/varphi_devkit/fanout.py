@@ -0,0 +1,410 @@
+"""
+Compiling a program with several backends while parsing it only once.
+
+A VarphiFanOutCompiler parses each program once, and hands every canonical transition to several backends, each of
+which then generates its own output. Slow backends can run in worker threads or processes, fed with batches of
+transitions through bounded queues, so that parsing proceeds while they work and memory use stays bounded.
+"""
+
+import copy
+from typing import TYPE_CHECKING, Callable, Iterable, Optional, TextIO
+
+from .compiler import VarphiCompiler, VarphiCompileSession, VarphiTransition
+
+# The modules running backends in worker threads and processes are only imported by the modes using them
+if TYPE_CHECKING:
+    import multiprocessing
+    import multiprocessing.connection
+    import os
+    import queue
+
+# How backends are run
+_MODES = ("inline", "thread", "process")
+# Transitions are sent to backends in batches of this size, through queues of at most this many batches
+BATCH_SIZE = 256
+QUEUE_SIZE = 16
+# How often a full queue checks that the worker process of its backend is still alive, in seconds
+_POLL_SECONDS = 0.1
+
+# Sent to a backend in place of a batch once the program has been parsed, or once its compile failed
+_FINISH = "finish"
+_ABORT = "abort"
+
+
+class VarphiFanOutCompiler(VarphiCompiler):
+    """
+    A compiler parsing each program once, and handing its transitions to several backends.
+
+    compile(), compile_file() and compile_stream() return the outputs of generate_compiled_program() of every backend,
+    in the order of the backends. If parsing fails, or any backend fails, the error is raised and no output is
+    returned. Each backend compiles in a session of its own, in which its own `compact` setting applies; backends
+    only receive transitions through handle_transition(), so their front end settings and parse tree listener
+    callbacks are ignored.
+
+    As the compile() of backends is not called, backends keeping per-compile state on themselves rather than in
+    sessions could not reset it: every compile runs on fresh backends instead. Backends given as instances are copied
+    (deep copies, or copies into worker processes in "process" mode, where they must be picklable), and only their
+    outputs come back, so the instances given are left untouched. Backends that cannot be copied can be given as
+    factories instead (e.g. their class), which are called for every compile.
+    A fan-out compiler compiles one program at a time.
+    Attributes:
+        - backends (list[VarphiCompiler | Callable[[], VarphiCompiler]]): The backends (or their factories), in the
+          order of the outputs.
+        - mode (str): "inline" to run the backends in the thread parsing the program, "thread" to run each of them in
+          a worker thread of its own, or "process" to run each of them in a worker process of its own.
+        - queue_size (int): The maximum number of batches of transitions waiting to be handled by a worker.
+    """
+
+    def __init__(
+        self,
+        backends: Iterable["VarphiCompiler | Callable[[], VarphiCompiler]"],
+        mode: str = "inline",
+        queue_size: int = QUEUE_SIZE,
+    ):
+        """Initialize a fan-out compiler (raises ValueError if mode is not known)."""
+        super().__init__()
+        if mode not in _MODES:
+            raise ValueError(f"Unknown fan-out mode: {mode!r}")
+        self.backends = list(backends)
+        self.mode = mode
+        self.queue_size = queue_size
+        self._channels: list[_Channel] = []
+        self._batch: list[VarphiTransition] = []
+
+    def compile(self, program: str, workers: int = 1) -> list[str]:
+        """Compile a Varphi program with every backend (see VarphiCompiler.compile())."""
+        return self._fan_out(super().compile, program, workers)
+
+    def compile_file(self, path: "str | os.PathLike") -> list[str]:
+        """Compile a Varphi program stored in a file with every backend (see VarphiCompiler.compile_file())."""
+        return self._fan_out(super().compile_file, path)
+
+    def compile_stream(self, lines: Iterable[str]) -> list[str]:
+        """Compile a Varphi program read incrementally with every backend (see VarphiCompiler.compile_stream())."""
+        return self._fan_out(super().compile_stream, lines)
+
+    def compile_to(
+        self,
+        program: "str | Iterable[str]",
+        destination: "str | os.PathLike | TextIO",
+    ) -> None:
+        """Not supported: every backend has an output of its own, which compile() returns."""
+        raise NotImplementedError(
+            f"{type(self).__name__} produces one output per backend: use compile() or compile_stream(), "
+            "or compile_to() with each backend"
+        )
+
+    def init_session(self, session: VarphiCompileSession) -> None:
+        if session.config.compact:
+            raise ValueError("Backends of a fan-out compiler receive VarphiTransitions")
+        self._batch = []
+        backends = [self._fresh_backend(backend) for backend in self.backends]
+        if self.mode == "inline":
+            self._channels = [_InlineChannel(backend) for backend in backends]
+        elif self.mode == "thread":
+            self._channels = [
+                _ThreadChannel(backend, self.queue_size) for backend in backends
+            ]
+        else:
+            self._channels = [
+                _ProcessChannel(backend, self.queue_size) for backend in backends
+            ]
+
+    def _fresh_backend(
+        self, backend: "VarphiCompiler | Callable[[], VarphiCompiler]"
+    ) -> VarphiCompiler:
+        """Get the backend running a compile: a copy of a backend instance, or a new backend from a factory."""
+        if not isinstance(backend, VarphiCompiler):
+            return backend()
+        if self.mode == "process":
+            # Worker processes get copies anyway
+            return backend
+        return copy.deepcopy(backend)
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        self._batch.append(transition)
+        if len(self._batch) >= BATCH_SIZE:
+            self._send()
+
+    def handle_transitions(self, transitions: list[VarphiTransition]) -> None:
+        self._batch.extend(transitions)
+        if len(self._batch) >= BATCH_SIZE:
+            self._send()
+
+    def generate_compiled_program(self) -> list[str]:
+        if self._batch:
+            self._send()
+        # If a backend fails, the compile fails and the backends that are not done yet are aborted
+        outputs = [channel.finish() for channel in self._channels]
+        self._channels = []
+        return outputs
+
+    def _send(self) -> None:
+        """Send the current batch of transitions to every backend."""
+        batch, self._batch = self._batch, []
+        for channel in self._channels:
+            channel.send(batch)
+
+    def _fan_out(self, compile: Callable[..., list[str]], *args) -> list[str]:
+        """Run a compile method of the base class, stopping the backends still running if it fails."""
+        try:
+            return compile(*args)
+        except BaseException:
+            channels, self._channels = self._channels, []
+            for channel in channels:
+                if not channel.done:
+                    channel.abort()
+            raise
+
+
+class _Channel:
+    """
+    Hands the batches of transitions of a program to a backend, and gets its output back.
+    Attributes:
+        - done (bool): Whether the backend finished or was aborted.
+    """
+
+    done = False
+
+    def send(self, batch: list[VarphiTransition]) -> None:
+        """Hand a batch of transitions to the backend (raises the error of the backend, if it already failed)."""
+        raise NotImplementedError
+
+    def finish(self) -> str:
+        """Wait for the backend to handle every transition, and return its output (or raise its error)."""
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        """Stop the backend without generating its output."""
+        raise NotImplementedError
+
+
+class _InlineChannel(_Channel):
+    """Runs a backend in the thread parsing the program."""
+
+    def __init__(self, backend: VarphiCompiler):
+        self.backend = backend
+        self.session = _open_backend_session(backend)
+
+    def send(self, batch: list[VarphiTransition]) -> None:
+        with self.backend._session_scope(self.session):
+            _handle_batch(self.backend, self.session, batch)
+
+    def finish(self) -> str:
+        self.done = True
+        with self.backend._session_scope(self.session):
+            return self.backend.generate_compiled_program()
+
+    def abort(self) -> None:
+        self.done = True
+
+
+class _ThreadChannel(_Channel):
+    """Runs a backend in a worker thread, fed through a bounded queue."""
+
+    def __init__(self, backend: VarphiCompiler, queue_size: int):
+        import queue
+        import threading
+
+        self.queue: "queue.Queue" = queue.Queue(queue_size)
+        self.output: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(
+            target=self._run, args=(backend,), name="varphi-fan-out", daemon=True
+        )
+        self.thread.start()
+
+    def _run(self, backend: VarphiCompiler) -> None:
+        try:
+            self.output = _drive(backend, self.queue.get)
+        except BaseException as error:
+            self.error = error
+            # Keep draining the queue, so that the thread parsing the program is never blocked on it
+            while not isinstance(self.queue.get(), str):
+                pass
+
+    def send(self, batch: list[VarphiTransition]) -> None:
+        if self.error is not None:
+            raise self.error
+        self.queue.put(batch)
+
+    def finish(self) -> str:
+        self.done = True
+        self.queue.put(_FINISH)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.output
+
+    def abort(self) -> None:
+        self.done = True
+        self.queue.put(_ABORT)
+        self.thread.join()
+
+
+class _ProcessChannel(_Channel):
+    """Runs a copy of a backend in a worker process, fed through a bounded queue."""
+
+    def __init__(self, backend: VarphiCompiler, queue_size: int):
+        import multiprocessing
+
+        context = multiprocessing.get_context()
+        self.queue = context.Queue(queue_size)
+        self.receiver, sender = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_run_in_process,
+            args=(backend, self.queue, sender),
+            name="varphi-fan-out",
+            daemon=True,
+        )
+        self.process.start()
+        sender.close()
+
+    def send(self, batch: list[VarphiTransition]) -> None:
+        if self.receiver.poll():
+            # The backend only answers early when it failed
+            self._fail()
+        # Transitions are sent as plain tuples, which are much faster to pickle
+        self._put(
+            [
+                (
+                    t.current_state,
+                    t.read_symbols,
+                    t.next_state,
+                    t.write_symbols,
+                    t.shift_directions,
+                    t.line_number,
+                )
+                for t in batch
+            ]
+        )
+
+    def finish(self) -> str:
+        self.done = True
+        self._put(_FINISH)
+        try:
+            ok, result = self.receiver.recv()
+        except EOFError:
+            raise self._died() from None
+        finally:
+            self._stop()
+        if not ok:
+            raise result
+        return result
+
+    def abort(self) -> None:
+        self.done = True
+        try:
+            self._put(_ABORT)
+        except Exception:
+            # The backend failed meanwhile (and its worker process was stopped), which no longer matters
+            return
+        self._stop()
+
+    def _fail(self) -> None:
+        """Raise the error of a backend that answered early, or whose worker process died."""
+        try:
+            ok, error = self.receiver.recv()
+        except EOFError:
+            self.done = True
+            self._stop()
+            raise self._died() from None
+        # The worker process keeps draining the queue until it is stopped
+        self.abort()
+        raise error
+
+    def _died(self) -> RuntimeError:
+        return RuntimeError(
+            f"The worker process of a backend exited with code {self.process.exitcode}"
+        )
+
+    def _put(self, item: "list | str") -> None:
+        """
+        Put an item in the queue of the worker process, waiting while it is full.
+        Raises the error of the backend if it fails meanwhile, or RuntimeError if its worker process dies.
+        """
+        import queue
+
+        while True:
+            try:
+                self.queue.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                # The pipe of a worker process that died is closed, so it can be read too
+                if self.receiver.poll() or not self.process.is_alive():
+                    self._fail()
+
+    def _stop(self) -> None:
+        """Wait for the worker process to exit."""
+        self.process.join()
+        self.receiver.close()
+        if self.process.exitcode != 0:
+            # Nothing reads the queue anymore, so what is left in it can never be flushed
+            self.queue.cancel_join_thread()
+        self.queue.close()
+        # Wait for the thread feeding the queue too, so that no thread is left behind when forking the next workers
+        self.queue.join_thread()
+
+
+def _open_backend_session(backend: VarphiCompiler) -> VarphiCompileSession:
+    """Open the session of a backend for the compile of a program."""
+    session = backend._open_session()
+    # The compile control (if any) belongs to the fan-out compiler, which already checks it for every transition
+    session.control = None
+    return session
+
+
+def _handle_batch(
+    backend: VarphiCompiler,
+    session: VarphiCompileSession,
+    batch: list[VarphiTransition],
+) -> None:
+    """Hand a batch of transitions to a backend, in its session."""
+    if session.expected_tape_count is None:
+        session.expected_tape_count = len(batch[0].read_symbols)
+    backend._emit_all(session, batch)
+
+
+def _drive(backend: VarphiCompiler, get: Callable[[], "list | str"]) -> Optional[str]:
+    """
+    Hand the batches of transitions got from a queue to a backend, in a session of its own.
+    Returns the output of the backend once the program has been parsed, or None if its compile was aborted.
+    """
+    session = _open_backend_session(backend)
+    with backend._session_scope(session):
+        while True:
+            batch = get()
+            if batch == _FINISH:
+                return backend.generate_compiled_program()
+            if batch == _ABORT:
+                return None
+            _handle_batch(backend, session, batch)
+
+
+def _run_in_process(
+    backend: VarphiCompiler,
+    batches: "multiprocessing.Queue",
+    results: "multiprocessing.connection.Connection",
+) -> None:
+    """Run a backend in a worker process, and send back (True, output) or (False, error)."""
+
+    def get() -> "list[VarphiTransition] | str":
+        batch = batches.get()
+        if isinstance(batch, str):
+            return batch
+        return [VarphiTransition(*fields) for fields in batch]
+
+    try:
+        output = _drive(backend, get)
+    except Exception as error:
+        try:
+            results.send((False, error))
+        except Exception:
+            # The error cannot be pickled
+            results.send((False, RuntimeError(f"{type(error).__name__}: {error}")))
+        # Keep draining the queue, so that the process parsing the program is never blocked on it
+        while not isinstance(batches.get(), str):
+            pass
+        return
+    if output is not None:
+        results.send((True, output))
@@ -0,0 +1,266 @@
+"""
+Incremental recompilation of successive versions of a Varphi program.
+
+Parse results are kept per physical line. When a new version of the program is compiled, it is compared with the
+previous one line by line, and only the region that changed is re-scanned. Unchanged lines keep their parse results,
+and line numbers are derived from line positions, so lines after an edit simply shift.
+"""
+
+from collections import Counter
+from dataclasses import replace
+from itertools import islice
+from typing import Callable, Iterator, Optional, Union
+
+from .compiler import (
+    VarphiCompiler,
+    VarphiCompileSession,
+    VarphiTransition,
+    _canonicalize_variables,
+)
+from .scanner import RawTransition, scan
+
+# Markers for physical lines that do not start a (valid) transition
+_CONTINUATION = (
+    "continuation"  # A later physical line of a transition spanning several lines
+)
+_ERROR = "error"  # The first physical line of a logical line containing an error
+
+# Per physical line: None (blank), a marker, or (transition, offset of the transition's line from this line)
+_Entry = Union[None, str, tuple[VarphiTransition, int]]
+
+
+def _common_prefix_length(a: list[str], b: list[str]) -> int:
+    """Count the leading lines two lists of lines have in common, comparing growing slices at C speed."""
+    n = min(len(a), len(b))
+    start, size = 0, 64
+    while start < n:
+        end = min(start + size, n)
+        if a[start:end] != b[start:end]:
+            # The first difference is in [start, end): bisect it
+            while end - start > 1:
+                middle = (start + end) // 2
+                if a[start:middle] == b[start:middle]:
+                    start = middle
+                else:
+                    end = middle
+            return start
+        start = end
+        size *= 2
+    return n
+
+
+def _common_suffix_length(a: list[str], b: list[str], limit: int) -> int:
+    """Count the trailing lines (at most limit) two lists of lines have in common."""
+    a_end, b_end = len(a), len(b)
+    count, size = 0, 64
+    while count < limit:
+        step = min(size, limit - count)
+        if (
+            a[a_end - count - step : a_end - count]
+            != b[b_end - count - step : b_end - count]
+        ):
+            # The last difference is in the current block: bisect it
+            while step > 1:
+                half = step // 2
+                if (
+                    a[a_end - count - half : a_end - count]
+                    == b[b_end - count - half : b_end - count]
+                ):
+                    count += half
+                    step -= half
+                else:
+                    step = half
+            return count
+        count += step
+        size *= 2
+    return count
+
+
+class VarphiIncrementalCompiler:
+    """
+    Recompiles successive versions of a Varphi program, re-parsing only the lines that changed.
+
+    The compiler is created with a factory (typically the VarphiCompiler subclass itself) for backend instances.
+    Successive calls to compile() are compared with the previous version, and only the edited region (from the first
+    to the last changed line) is re-scanned and re-validated. The tape count is re-validated from per-count tallies, without visiting unchanged transitions.
+    How the backend is updated depends on whether it implements retract_transition():
+        - If it does, it is kept across compiles, and only the transitions affected by an edit are retracted and
+          handled. Transitions that merely moved keep the line_number they were handled with; the up-to-date list is
+          available through the `transitions` property.
+        - Otherwise, a fresh backend is created and all transitions are replayed, without re-parsing unchanged lines.
+    When a version contains an error, it is compiled from scratch by a fresh backend to raise the usual diagnostic.
+    Backends that cannot use the fast front end (see VarphiCompiler.frontend) are always compiled from scratch.
+    """
+
+    def __init__(self, compiler_factory: Callable[[], VarphiCompiler]):
+        """Initialize this incremental compiler with a factory for backend instances."""
+        self._factory = compiler_factory
+        self.compiler = compiler_factory()
+        self._incremental = self.compiler._uses_fast_frontend(self.compiler.config)
+        self._retracts = (
+            type(self.compiler).retract_transition
+            is not VarphiCompiler.retract_transition
+        )
+        # The session the backend has handled the transitions in (kept across compiles while in sync)
+        self._session: Optional[VarphiCompileSession] = None
+        self._lines: list[str] = []
+        self._entries: list[_Entry] = []
+        self._tape_counts: Counter[int] = Counter()
+        self._error_count = 0
+        # Whether the backend has handled exactly the transitions in self._entries
+        self._in_sync = False
+
+    @property
+    def transitions(self) -> list[VarphiTransition]:
+        """The transitions of the last compiled version, with up-to-date line numbers."""
+        return list(self._iter_transitions())
+
+    def compile(self, program: str) -> str:
+        """Compile a new version of the program, re-parsing only what changed since the previous version."""
+        if not self._incremental:
+            self.compiler = self._factory()
+            return self.compiler.compile(program)
+
+        lines = program.split("\n")
+        old_lines, old_entries = self._lines, self._entries
+
+        # The last line of either version is not followed by a newline, so it always counts as changed
+        prefix = min(
+            _common_prefix_length(old_lines, lines),
+            max(len(old_lines) - 1, 0),
+            len(lines) - 1,
+        )
+        limit = min(len(old_lines), len(lines)) - prefix
+        suffix = _common_suffix_length(old_lines, lines, limit)
+
+        # Back up to a line where scanning can start outside of any block comment
+        start = prefix
+        if start < len(old_entries) and old_entries[start] is _CONTINUATION:
+            while old_entries[start] is _CONTINUATION:
+                start -= 1
+        elif start < len(old_entries) and old_entries[start] is None:
+            while start > 0 and old_entries[start - 1] is None:
+                start -= 1
+
+        region, old_resume = self._scan_region(
+            lines, start, len(lines) - suffix, len(lines) - len(old_lines)
+        )
+        removed = old_entries[start:old_resume]
+
+        for entry in removed:
+            self._count(entry, -1)
+        for entry in region:
+            self._count(entry, 1)
+        self._lines = lines
+        self._entries = old_entries[:start] + region + old_entries[old_resume:]
+
+        if self._error_count or len(+self._tape_counts) != 1:
+            return self._compile_from_scratch(program)
+
+        if self._retracts and self._in_sync:
+            compiler, session = self.compiler, self._session
+            with compiler._session_scope(session):
+                for entry in removed:
+                    if type(entry) is tuple:
+                        compiler._retract(session, entry[0])
+                for index, entry in enumerate(region, start + 1):
+                    if type(entry) is tuple:
+                        transition, offset = entry
+                        if transition.line_number != index + offset:
+                            transition = replace(transition, line_number=index + offset)
+                            self._entries[index - 1] = (transition, offset)
+                        compiler._emit(session, transition)
+                return compiler.generate_compiled_program()
+
+        self.compiler = compiler = self._factory()
+        self._session = session = compiler._open_session()
+        with compiler._session_scope(session):
+            for transition in self._iter_transitions(refresh=True):
+                compiler._emit(session, transition)
+            self._in_sync = True
+            return compiler.generate_compiled_program()
+
+    def _scan_region(
+        self, lines: list[str], start: int, changed_end: int, delta: int
+    ) -> tuple[list[_Entry], int]:
+        """
+        Scan lines from start until past changed_end, at the first logical line that also started a logical line in
+        the previous version (shifted by delta lines). Returns the entries of the scanned region, along with the index
+        in the previous version at which its entries can be reused.
+        """
+        old_entries = self._entries
+
+        def physical_lines() -> Iterator[str]:
+            last = len(lines) - 1
+            for index, line in enumerate(islice(lines, start, None), start):
+                yield line if index == last else line + "\n"
+
+        region: list[_Entry] = []
+        for raw, first_line, source in scan(physical_lines()):
+            index = start + first_line - 1
+            if index >= changed_end:
+                old_index = index - delta
+                old_entry = old_entries[old_index]
+                if old_entry is not None and old_entry is not _CONTINUATION:
+                    region.extend([None] * (index - start - len(region)))
+                    return region, old_index
+            region.extend([None] * (index - start - len(region)))
+            region.append(self._make_entry(raw, first_line, start))
+            region.extend([_CONTINUATION] * source.count("\n"))
+
+        region.extend([None] * (len(lines) - start - len(region)))
+        return region, len(old_entries)
+
+    @staticmethod
+    def _make_entry(
+        raw: Optional[RawTransition], first_line: int, line_offset: int
+    ) -> _Entry:
+        """
+        Validate and canonicalize a raw transition on its own (the global tape count is checked separately).
+        Line numbers of the raw transition are relative to the scanned region, which starts after line_offset lines.
+        """
+        if raw is None:
+            return _ERROR
+        current_state, reads, next_state, writes, shifts, token_line = raw
+        if len(writes) != len(reads) or len(shifts) != len(reads):
+            return _ERROR
+        canonical_reads, canonical_writes, undefined = _canonicalize_variables(
+            reads, writes
+        )
+        if undefined is not None:
+            return _ERROR
+        transition = VarphiTransition(
+            current_state=current_state,
+            read_symbols=canonical_reads,
+            next_state=next_state,
+            write_symbols=canonical_writes,
+            shift_directions=shifts,
+            line_number=token_line + line_offset,
+        )
+        return transition, token_line - first_line
+
+    def _count(self, entry: _Entry, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) an entry from the tallies used to validate the program."""
+        if entry is _ERROR:
+            self._error_count += sign
+        elif type(entry) is tuple:
+            self._tape_counts[len(entry[0].read_symbols)] += sign
+
+    def _iter_transitions(self, refresh: bool = False) -> Iterator[VarphiTransition]:
+        """Yield the current transitions with up-to-date line numbers, optionally storing the refreshed ones."""
+        entries = self._entries
+        for index, entry in enumerate(entries):
+            if type(entry) is tuple:
+                transition, offset = entry
+                line_number = index + 1 + offset
+                if transition.line_number != line_number:
+                    transition = replace(transition, line_number=line_number)
+                    if refresh:
+                        entries[index] = (transition, offset)
+                yield transition
+
+    def _compile_from_scratch(self, program: str) -> str:
+        """Compile a program with a fresh backend, which raises the diagnostic for any error it contains."""
+        self._in_sync = False
+        self.compiler = self._factory()
+        return self.compiler.compile(program)
@@ -0,0 +1,385 @@
+"""
+A reference execution engine for Varphi programs.
+
+A VarphiMachine runs the transitions of a program on k tapes. Every tape is infinite in both directions and blank but
+for its input, which is written from position 0, where every head starts. The machine starts in the current state of
+the first transition of the program, and halts once no transition matches the current state and the symbols under
+the heads. Each step applies the matching transition: it writes its write symbols (variables writing back what they
+read), moves each head LEFT, RIGHT or STAY, and goes to its next state.
+
+Variables match any symbol, BLANK included, and a variable read on several tapes (e.g. ($x, $x)) only matches equal
+symbols. When several transitions match, the one defined first in the program applies, so runs are deterministic.
+
+Transitions are not scanned at each step: they are indexed by current state, then by read pattern (the positions of
+literal symbols, and the positions that must read equal symbols), so that resolving a step takes one dictionary lookup
+per distinct pattern of the current state. Resolved steps are memoized by (state, symbols read), so machines spending
+their time in a few configurations (i.e. almost all of them) resolve most steps with a single lookup. The memo holds
+at most memo_size steps: it is emptied once full, so that machines with large alphabets use bounded memory.
+"""
+
+import sys
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Sequence
+
+from .compiler import (
+    VarphiCompiler,
+    VarphiCompileSession,
+    VarphiTransition,
+    BLANK,
+    LEFT,
+    RIGHT,
+    STAY,
+)
+
+_MOVES = {LEFT: -1, RIGHT: 1, STAY: 0}
+# The default maximum number of resolved steps memoized by a machine
+MEMO_SIZE = 1 << 16
+# Stands in for steps of the memo that were not resolved yet (None means that the machine halts)
+_UNRESOLVED = object()
+
+
+class VarphiTape:
+    """
+    A tape of a VarphiMachine, infinite in both directions.
+    Attributes:
+        - cells (dict[int, str]): The symbols written on the tape, by position (every other position is BLANK).
+        - head (int): The position of the head.
+    """
+
+    def __init__(self, symbols: Iterable[str] = (), head: int = 0):
+        """Initialize a tape with the given symbols written from position 0, and its head at the given position."""
+        self.cells: dict[int, str] = {
+            position: symbol
+            for position, symbol in enumerate(symbols)
+            if symbol != BLANK
+        }
+        self.head = head
+
+    def __getitem__(self, position: int) -> str:
+        return self.cells.get(position, BLANK)
+
+    def read(self) -> str:
+        """The symbol under the head."""
+        return self.cells.get(self.head, BLANK)
+
+    def contents(self) -> tuple[str, ...]:
+        """The symbols from the leftmost to the rightmost non-blank symbol (empty if the tape is blank)."""
+        positions = [p for p, symbol in self.cells.items() if symbol != BLANK]
+        if not positions:
+            return ()
+        return tuple(self[p] for p in range(min(positions), max(positions) + 1))
+
+    def __repr__(self) -> str:
+        return f"VarphiTape({list(self.contents())!r}, head={self.head})"
+
+
+@dataclass
+class VarphiRun:
+    """
+    The result of running a VarphiMachine.
+    Attributes:
+        - state (str): The state of the machine at the end of the run.
+        - steps (int): The number of steps taken.
+        - halted (bool): Whether the machine halted (False if it ran out of steps first).
+        - tapes (list[VarphiTape]): The tapes of the machine at the end of the run.
+    """
+
+    state: str
+    steps: int
+    halted: bool
+    tapes: list[VarphiTape] = field(default_factory=list)
+
+
+class _Pattern:
+    """
+    The transitions of a state sharing a read pattern: the same positions of literal symbols and of variables.
+    Attributes:
+        - literal_positions (tuple[int, ...]): The positions of the literal symbols.
+        - equal_positions (tuple[tuple[int, int], ...]): Pairs of positions reading the same variable.
+        - transitions (dict[tuple[str, ...], VarphiTransition]): The first transition defined with each literal symbols.
+    """
+
+    __slots__ = ("literal_positions", "equal_positions", "transitions")
+
+    def __init__(self, read_symbols: tuple[str, ...]):
+        """Initialize an empty pattern, given the (canonical) read symbols of one of its transitions."""
+        first_positions = {}
+        literal_positions = []
+        equal_positions = []
+        for position, symbol in enumerate(read_symbols):
+            if not symbol.startswith("$"):
+                literal_positions.append(position)
+            elif symbol in first_positions:
+                equal_positions.append((first_positions[symbol], position))
+            else:
+                first_positions[symbol] = position
+        self.literal_positions = tuple(literal_positions)
+        self.equal_positions = tuple(equal_positions)
+        self.transitions: dict[tuple[str, ...], VarphiTransition] = {}
+
+    def match(self, reads: tuple[str, ...]) -> Optional[VarphiTransition]:
+        """Find the first transition of this pattern matching the given symbols, if any."""
+        for first, other in self.equal_positions:
+            if reads[first] != reads[other]:
+                return None
+        return self.transitions.get(tuple(reads[i] for i in self.literal_positions))
+
+
+def _pattern_shape(read_symbols: tuple[str, ...]) -> tuple[Optional[str], ...]:
+    """The key of the read pattern of a transition: its (canonical) variables, with None for literal symbols."""
+    return tuple(symbol if symbol.startswith("$") else None for symbol in read_symbols)
+
+
+class VarphiMachine:
+    """
+    A multi-tape Turing machine executing the transitions of a Varphi program (see the module documentation).
+    Attributes:
+        - tape_count (int): The number of tapes of the machine.
+        - initial_state (Optional[str]): The state runs start in, i.e. the current state of the first transition added.
+        - transition_count (int): The number of transitions of the machine.
+        - memo_size (int): The maximum number of resolved steps memoized by the machine.
+    """
+
+    def __init__(
+        self,
+        tape_count: int,
+        transitions: Iterable[VarphiTransition] = (),
+        memo_size: int = MEMO_SIZE,
+    ):
+        """Initialize a machine with tape_count tapes, and add transitions to it (in the order of the program)."""
+        if memo_size < 1:
+            raise ValueError(f"Memo sizes must be positive, not {memo_size}")
+        self.tape_count = tape_count
+        self.memo_size = memo_size
+        self.initial_state: Optional[str] = None
+        self.transition_count = 0
+        # The patterns of each state, by shape
+        self._patterns: dict[str, dict[tuple[Optional[str], ...], _Pattern]] = {}
+        # The resolved steps: (next state, write symbols, head moves) by (state, symbols read), None for halts
+        self._steps: dict[tuple[str, tuple[str, ...]], Optional[tuple]] = {}
+        # The same for machines with a single tape, by (state, symbol read) and with a single symbol and move
+        self._one_tape_steps: dict[tuple[str, str], Optional[tuple]] = {}
+        for transition in transitions:
+            self.add(transition)
+
+    def add(self, transition: VarphiTransition) -> None:
+        """Add a transition to the machine (the first one added gives the initial state)."""
+        if len(transition.read_symbols) != self.tape_count:
+            raise ValueError(
+                f"Transition uses {len(transition.read_symbols)} tapes, "
+                f"but the machine has {self.tape_count}"
+            )
+        if self.initial_state is None:
+            self.initial_state = transition.current_state
+        patterns = self._patterns.setdefault(transition.current_state, {})
+        shape = _pattern_shape(transition.read_symbols)
+        pattern = patterns.get(shape)
+        if pattern is None:
+            pattern = patterns[shape] = _Pattern(transition.read_symbols)
+        key = tuple(transition.read_symbols[i] for i in pattern.literal_positions)
+        # Transitions defined earlier take precedence
+        existing = pattern.transitions.get(key)
+        if existing is None or transition.line_number < existing.line_number:
+            pattern.transitions[key] = transition
+        self.transition_count += 1
+        self._steps.clear()
+        self._one_tape_steps.clear()
+
+    @property
+    def states(self) -> set[str]:
+        """The states of the machine (with at least one transition from them)."""
+        return set(self._patterns)
+
+    def find_transition(
+        self, state: str, reads: Sequence[str]
+    ) -> Optional[VarphiTransition]:
+        """Find the transition applying in a state, given the symbols under the heads (None if the machine halts)."""
+        reads = tuple(reads)
+        found = None
+        for pattern in self._patterns.get(state, {}).values():
+            transition = pattern.match(reads)
+            if transition is not None and (
+                found is None or transition.line_number < found.line_number
+            ):
+                found = transition
+        return found
+
+    def _resolve(self, state: str, reads: tuple[str, ...]) -> Optional[tuple]:
+        """Resolve the step taken in a state given the symbols under the heads, binding the variables of its transition."""
+        transition = self.find_transition(state, reads)
+        if transition is None:
+            return None
+        bindings = {}
+        for symbol, read in zip(transition.read_symbols, reads):
+            if symbol.startswith("$"):
+                bindings.setdefault(symbol, read)
+        writes = tuple(
+            bindings[symbol] if symbol.startswith("$") else symbol
+            for symbol in transition.write_symbols
+        )
+        moves = tuple(_MOVES[direction] for direction in transition.shift_directions)
+        return transition.next_state, writes, moves
+
+    def run(
+        self,
+        tapes: Optional[Sequence[Iterable[str]]] = None,
+        *,
+        max_steps: Optional[int] = None,
+        state: Optional[str] = None,
+    ) -> VarphiRun:
+        """
+        Run the machine until it halts, or until it has taken max_steps steps (without limit if None).
+        tapes holds the input of each tape (sequences of symbols, all tapes blank if None), and state is the state to
+        start in (the initial state of the machine if None).
+        """
+        if tapes is None:
+            tapes = [()] * self.tape_count
+        if len(tapes) != self.tape_count:
+            raise ValueError(
+                f"The machine has {self.tape_count} tapes, but {len(tapes)} inputs were given"
+            )
+        if max_steps is not None and max_steps < 0:
+            raise ValueError(f"Step budgets cannot be negative, not {max_steps}")
+        tapes = [VarphiTape(symbols) for symbols in tapes]
+        state = self.initial_state if state is None else state
+        if state is None:
+            raise ValueError("The machine has no transitions")
+
+        budget = max_steps if max_steps is not None else sys.maxsize
+        if self.tape_count == 1:
+            state, steps, halted = self._run_one_tape(tapes[0], state, budget)
+        else:
+            state, steps, halted = self._run_tapes(tapes, state, budget)
+        return VarphiRun(state, steps, halted, tapes)
+
+    def _run_tapes(
+        self, tapes: list[VarphiTape], state: str, budget: int
+    ) -> tuple[str, int, bool]:
+        """Run the machine on its tapes for at most budget steps, and return its state, steps and whether it halted."""
+        cells = [tape.cells for tape in tapes]
+        heads = [tape.head for tape in tapes]
+        tape_range = range(self.tape_count)
+        memo = self._steps
+        steps = 0
+        halted = False
+        while True:
+            reads = tuple([c.get(h, BLANK) for c, h in zip(cells, heads)])
+            key = (state, reads)
+            step = memo.get(key, _UNRESOLVED)
+            if step is _UNRESOLVED:
+                if len(memo) >= self.memo_size:
+                    memo.clear()
+                step = memo[key] = self._resolve(state, reads)
+            if step is None:
+                halted = True
+                break
+            if steps == budget:
+                break
+            state, writes, moves = step
+            for i in tape_range:
+                head = heads[i]
+                cells[i][head] = writes[i]
+                heads[i] = head + moves[i]
+            steps += 1
+
+        for tape, head in zip(tapes, heads):
+            tape.head = head
+        return state, steps, halted
+
+    def _run_one_tape(
+        self, tape: VarphiTape, state: str, budget: int
+    ) -> tuple[str, int, bool]:
+        """Same as _run_tapes() for machines with a single tape, without building tuples of symbols at each step."""
+        cells = tape.cells
+        head = tape.head
+        memo = self._one_tape_steps
+        steps = 0
+        halted = False
+        while True:
+            symbol = cells.get(head, BLANK)
+            key = (state, symbol)
+            step = memo.get(key, _UNRESOLVED)
+            if step is _UNRESOLVED:
+                step = self._resolve(state, (symbol,))
+                if step is not None:
+                    next_state, writes, moves = step
+                    step = next_state, writes[0], moves[0]
+                if len(memo) >= self.memo_size:
+                    memo.clear()
+                memo[key] = step
+            if step is None:
+                halted = True
+                break
+            if steps == budget:
+                break
+            state, cells[head], move = step
+            head += move
+            steps += 1
+
+        tape.head = head
+        return state, steps, halted
+
+
+class VarphiInterpreter(VarphiCompiler):
+    """
+    A Varphi backend building a VarphiMachine out of the transitions of a program.
+
+    build() compiles a program into its machine, and run() compiles a program and runs its machine in one call.
+    compile() returns a summary of the machine instead, which is then available through the `machine` attribute.
+    The machine is kept in the session of each compile, and build() returns it from that session, so a single
+    interpreter can build several machines at the same time, from several threads. Compact transitions are not
+    supported.
+    """
+
+    def init_session(self, session: VarphiCompileSession) -> None:
+        """Start each compile without a machine."""
+        if session.config.compact:
+            raise ValueError("The interpreter executes VarphiTransitions")
+        super().init_session(session)
+        session.machine = None
+
+    @property
+    def machine(self) -> Optional[VarphiMachine]:
+        """The machine of the current (or last) compile in the current thread."""
+        session = self.session
+        return getattr(session, "machine", None)
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        """Add a transition to the machine of the program."""
+        session = self.session
+        if session.machine is None:
+            session.machine = VarphiMachine(len(transition.read_symbols))
+        session.machine.add(transition)
+
+    def handle_transitions(self, transitions: list[VarphiTransition]) -> None:
+        """Add a batch of transitions to the machine of the program."""
+        session = self.session
+        if session.machine is None:
+            session.machine = VarphiMachine(len(transitions[0].read_symbols))
+        add = session.machine.add
+        for transition in transitions:
+            add(transition)
+
+    def generate_compiled_program(self) -> str:
+        """Summarize the machine of the program."""
+        machine = self.machine
+        return (
+            f"{machine.transition_count} transitions, {len(machine.states)} states, "
+            f"{machine.tape_count} tapes, initial state {machine.initial_state}\n"
+        )
+
+    def run(
+        self,
+        program: str,
+        tapes: Optional[Sequence[Iterable[str]]] = None,
+        *,
+        max_steps: Optional[int] = None,
+    ) -> VarphiRun:
+        """Compile a Varphi program, and run its machine (see VarphiMachine.run())."""
+        return self.build(program).run(tapes, max_steps=max_steps)
+
+    def build(self, program: str) -> VarphiMachine:
+        """Compile a Varphi program into its machine."""
+        with self._session_scope() as session:
+            self._handle_program(session, program)
+            return session.machine
@@ -0,0 +1,159 @@
+"""
+Instrumentation of compiles.
+
+Attaching a VarphiCompileObserver to a compiler (through its `observer` attribute) makes every compile collect
+VarphiCompileStats: the time spent in each phase and counts of what was compiled. The observer is told when each compile
+starts and ends, and when each phase starts and ends, so that it can feed metrics or tracing spans. Without an observer,
+nothing is collected or timed.
+
+Phases:
+    - "scan": Scanning (lexing, parsing and validating) lines with the hand-written scanner.
+    - "lex": Lexing with the ANTLR-generated lexer.
+    - "parse": Parsing with the ANTLR-generated parser.
+    - "walk": Extracting transitions from the parse tree (or, without a parse tree, from the tokens).
+    - "handle": Handing transitions to the backend (handle_transition() or handle_transitions()).
+    - "generate": Generating the compiled program (generate_compiled_program() or write_compiled_program()).
+Phases may be nested (e.g. "handle" in "walk", as each transition is handled as soon as it is extracted): the time of a
+phase excludes the time of the phases nested in it. The observer is only told about transitions handled one at a time
+through their accumulated time in the statistics, not with a phase_started()/phase_finished() call each.
+"""
+
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .compiler import VarphiCompileSession, VarphiTransition
+
+# Returned by _phase() for sessions collecting no statistics
+_NO_PHASE = nullcontext()
+
+
+@dataclass
+class VarphiCompileStats:
+    """
+    The statistics of a single compile, collected when an observer is attached to the compiler.
+    Attributes:
+        - phase_seconds (dict[str, float]): The time spent in each phase, excluding the phases nested in it.
+        - seconds (float): The duration of the whole compile (once it is over).
+        - tokens (int): The number of tokens produced by the ANTLR lexer (0 if ANTLR was not used).
+        - transitions (int): The number of transitions handled.
+        - states (set[str]): The distinct states of the handled transitions.
+        - symbols (set[str]): The distinct symbols of the handled transitions (including BLANK and canonical variables).
+        - tape_count (Optional[int]): The number of tapes used by the transitions, once known.
+    """
+
+    phase_seconds: dict[str, float] = field(default_factory=dict)
+    seconds: float = 0.0
+    tokens: int = 0
+    transitions: int = 0
+    states: set[str] = field(default_factory=set)
+    symbols: set[str] = field(default_factory=set)
+    tape_count: Optional[int] = None
+    # The phases in progress, innermost last
+    _phases: list["_Phase"] = field(default_factory=list, repr=False, compare=False)
+
+    def count(self, transition: "VarphiTransition") -> None:
+        """Count a handled transition."""
+        self.transitions += 1
+        self.states.add(transition.current_state)
+        self.states.add(transition.next_state)
+        self.symbols.update(transition.read_symbols)
+        self.symbols.update(transition.write_symbols)
+
+    def as_dict(self) -> dict:
+        """The statistics as a JSON-serializable dictionary (with the numbers of distinct states and symbols)."""
+        return {
+            "phase_seconds": dict(self.phase_seconds),
+            "seconds": self.seconds,
+            "tokens": self.tokens,
+            "transitions": self.transitions,
+            "states": len(self.states),
+            "symbols": len(self.symbols),
+            "tape_count": self.tape_count,
+        }
+
+
+class VarphiCompileObserver:
+    """
+    Observes the compiles of the compilers it is attached to (see the module documentation).
+    Every callback does nothing by default: subclasses override the ones they need. Callbacks are called from the
+    thread compiling the program, so observers attached to compilers used by several threads must be thread-safe.
+    """
+
+    def compile_started(self, stats: VarphiCompileStats) -> None:
+        """Called when a compile starts."""
+        pass
+
+    def phase_started(self, phase: str, stats: VarphiCompileStats) -> None:
+        """Called when a phase of a compile starts."""
+        pass
+
+    def phase_finished(
+        self, phase: str, seconds: float, stats: VarphiCompileStats
+    ) -> None:
+        """Called when a phase of a compile ends, with its duration (excluding the phases nested in it)."""
+        pass
+
+    def compile_finished(self, stats: VarphiCompileStats) -> None:
+        """Called when a compile succeeds, with its complete statistics."""
+        pass
+
+    def compile_failed(self, stats: VarphiCompileStats, error: BaseException) -> None:
+        """Called when a compile fails, with its statistics so far and the error."""
+        pass
+
+
+class _Phase:
+    """Times a phase of a compile (excluding the phases nested in it), and tells the observer about it if notify is set."""
+
+    __slots__ = ("stats", "observer", "name", "notify", "start", "nested")
+
+    def __init__(
+        self,
+        stats: VarphiCompileStats,
+        observer: VarphiCompileObserver,
+        name: str,
+        notify: bool,
+    ):
+        self.stats = stats
+        self.observer = observer
+        self.name = name
+        self.notify = notify
+        self.start: Optional[float] = None
+        self.nested = 0.0
+
+    def __enter__(self) -> None:
+        phases = self.stats._phases
+        if phases and phases[-1].name == self.name:
+            # Already in this phase (e.g. a transition handled as part of a batch)
+            return
+        if self.notify:
+            self.observer.phase_started(self.name, self.stats)
+        phases.append(self)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        if self.start is None:
+            return
+        elapsed = time.perf_counter() - self.start
+        phases = self.stats._phases
+        phases.pop()
+        if phases:
+            phases[-1].nested += elapsed
+        seconds = elapsed - self.nested
+        phase_seconds = self.stats.phase_seconds
+        phase_seconds[self.name] = phase_seconds.get(self.name, 0.0) + seconds
+        if self.notify:
+            self.observer.phase_finished(self.name, seconds, self.stats)
+
+
+def _phase(
+    session: "VarphiCompileSession", name: str, notify: bool = True
+) -> "_Phase | nullcontext":
+    """Get a context manager timing a phase of the compile of a session (doing nothing if it collects no statistics)."""
+    stats = session.stats
+    if stats is None:
+        return _NO_PHASE
+    return _Phase(stats, session.config.observer, name, notify)
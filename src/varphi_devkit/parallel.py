@@ -0,0 +1,134 @@
+"""
+Parallel scanning of large Varphi programs.
+
+Every transition ends at a NEWLINE, so a program can be split into chunks at any line boundary that is not inside a
+block comment. Each chunk is scanned, validated and canonicalized in a worker process, and the parent merges the results
+in source order, checks the global tape count, and builds the transitions.
+"""
+
+import io
+import re
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .compiler import VarphiTransition, _canonicalize_variables
+from .scanner import scan
+
+# Chunks smaller than this are not worth sending to another process
+MIN_CHUNK_SIZE = 256 * 1024
+# Number of chunks per worker, so that uneven chunks still keep every worker busy
+CHUNKS_PER_WORKER = 4
+
+_COMMENT_START = re.compile(r"//|/\*")
+
+# A canonicalized transition, as exchanged with worker processes:
+# (current_state, read_symbols, next_state, write_symbols, shift_directions, line_number)
+_Row = tuple[str, tuple[str, ...], str, tuple[str, ...], tuple[str, ...], int]
+
+
+def _block_comments(program: str) -> tuple[list[int], list[int]]:
+    """Find the start and end offsets of every block comment, ignoring comment markers inside other comments."""
+    starts, ends = [], []
+    pos = 0
+    while True:
+        match = _COMMENT_START.search(program, pos)
+        if match is None:
+            return starts, ends
+        if match.group() == "//":
+            pos = program.find("\n", match.end())
+            if pos < 0:
+                return starts, ends
+        else:
+            end = program.find("*/", match.end())
+            end = len(program) if end < 0 else end + 2
+            starts.append(match.start())
+            ends.append(end)
+            pos = end
+
+
+def split_program(program: str, chunk_count: int) -> list[tuple[str, int]]:
+    """
+    Split a program into at most chunk_count chunks of similar size, at line boundaries outside of block comments.
+    Returns the chunks along with the line number of their first line.
+    """
+    starts, ends = _block_comments(program) if "/*" in program else ([], [])
+    target = len(program) // chunk_count
+    chunks = []
+    chunk_start = 0
+    first_line = 1
+    while len(chunks) < chunk_count - 1:
+        split = program.find("\n", chunk_start + target)
+        # Move past any block comment the newline falls into
+        while split >= 0:
+            index = bisect_right(starts, split) - 1
+            if index < 0 or ends[index] <= split:
+                break
+            split = program.find("\n", ends[index])
+        if split < 0:
+            break
+        chunks.append((program[chunk_start : split + 1], first_line))
+        first_line += program.count("\n", chunk_start, split + 1)
+        chunk_start = split + 1
+    chunks.append((program[chunk_start:], first_line))
+    return chunks
+
+
+def scan_chunk(chunk: str, first_line: int) -> Optional[tuple[list[_Row], set[int]]]:
+    """
+    Scan, validate and canonicalize a chunk of a program in isolation.
+    Returns its canonicalized transitions and the set of tape counts they use, or None if the chunk contains an error.
+    """
+    rows = []
+    tape_counts = set()
+    offset = first_line - 1
+    for raw, _, _ in scan(io.StringIO(chunk, newline="\n")):
+        if raw is None:
+            return None
+        current_state, reads, next_state, writes, shifts, line_number = raw
+        if len(writes) != len(reads) or len(shifts) != len(reads):
+            return None
+        canonical_reads, canonical_writes, undefined = _canonicalize_variables(
+            reads, writes
+        )
+        if undefined is not None:
+            return None
+        tape_counts.add(len(reads))
+        rows.append(
+            (
+                current_state,
+                canonical_reads,
+                next_state,
+                canonical_writes,
+                shifts,
+                line_number + offset,
+            )
+        )
+    return rows, tape_counts
+
+
+def scan_parallel(program: str, workers: int) -> Optional[list[VarphiTransition]]:
+    """
+    Scan a program in chunks on a pool of worker processes.
+    Returns its transitions in source order, or None if the program contains any error (just like a sequential scan).
+    """
+    chunk_count = min(workers * CHUNKS_PER_WORKER, len(program) // MIN_CHUNK_SIZE)
+    chunks = split_program(program, max(chunk_count, 1))
+    if len(chunks) == 1:
+        results = [scan_chunk(*chunks[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            results = list(executor.map(scan_chunk, *zip(*chunks)))
+
+    transitions = []
+    tape_counts = set()
+    for result in results:
+        if result is None:
+            return None
+        rows, chunk_tape_counts = result
+        tape_counts |= chunk_tape_counts
+        transitions.extend(VarphiTransition(*row) for row in rows)
+    # The grammar requires at least one transition, and all of them must use the same number of tapes
+    if len(tape_counts) != 1:
+        return None
+    return transitions
@@ -0,0 +1,156 @@
+"""
+A hand-written, single-pass scanner for Varphi programs.
+
+The grammar in `grammar/Varphi.g4` is line-oriented: transitions are separated by NEWLINE tokens, and only block
+comments (`/* ... */`) can carry a transition across physical lines. This module exploits that to recognize a whole
+transition with one regular expression per line, instead of running the ANTLR-generated lexer and parser token by
+token.
+
+The scanner never reports errors itself. It only *accepts* input that the ANTLR grammar accepts, and marks every
+logical line it cannot recognize as failed, so that callers can re-parse the offending source with ANTLR to produce
+rich diagnostics.
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+# A raw (not yet validated or canonicalized) transition:
+# (current_state, read_symbols, next_state, write_symbols, shift_directions, line_number)
+RawTransition = tuple[str, tuple[str, ...], str, tuple[str, ...], tuple[str, ...], int]
+
+# state_id accepts ID, ALPHANUM and every keyword, which together cover any run of word characters
+_TRANSITION = re.compile(
+    r"[ \t]*([A-Za-z0-9_]+)[ \t]*\(([^()]*)\)"
+    r"[ \t]*([A-Za-z0-9_]+)[ \t]*\(([^()]*)\)"
+    r"[ \t]*\(([^()]*)\)[ \t]*(?://[^\r]*)?"
+)
+_BLANK_LINE = re.compile(r"[ \t]*(?://[^\r]*)?")
+
+_SYMBOL = r"[ \t]*(?:[A-Za-z0-9]|BLANK|\$[A-Za-z0-9_]+)[ \t]*"
+_SYMBOLS = re.compile(rf"{_SYMBOL}(?:,{_SYMBOL})*")
+_DIRECTION = r"[ \t]*(?:LEFT|RIGHT|STAY)[ \t]*"
+_DIRECTIONS = re.compile(rf"{_DIRECTION}(?:,{_DIRECTION})*")
+
+
+@lru_cache(maxsize=4096)
+def _parse_symbols(text: str) -> Optional[tuple[str, ...]]:
+    """Parse the inside of a read/write tuple, or return None if it is not valid."""
+    if _SYMBOLS.fullmatch(text) is None:
+        return None
+    symbols = [s.strip(" \t") for s in text.split(",")]
+    return tuple("_" if s == "BLANK" else s for s in symbols)
+
+
+@lru_cache(maxsize=1024)
+def _parse_directions(text: str) -> Optional[tuple[str, ...]]:
+    """Parse the inside of a shift direction tuple, or return None if it is not valid."""
+    if _DIRECTIONS.fullmatch(text) is None:
+        return None
+    return tuple(d.strip(" \t") for d in text.split(","))
+
+
+def parse_transition(text: str, line_number: int) -> Optional[RawTransition]:
+    """Recognize a single comment-free logical line as a transition, or return None if it is not one."""
+    match = _TRANSITION.fullmatch(text)
+    if match is None:
+        return None
+    current_state, reads, next_state, writes, shifts = match.groups()
+    reads = _parse_symbols(reads)
+    writes = _parse_symbols(writes)
+    shifts = _parse_directions(shifts)
+    if reads is None or writes is None or shifts is None:
+        return None
+    return (current_state, reads, next_state, writes, shifts, line_number)
+
+
+def _strip_comments(line: str, in_comment: bool) -> tuple[str, bool]:
+    """
+    Remove comments from a physical line.
+    in_comment tells whether the line starts inside a block comment; the returned flag tells whether it ends inside one.
+    Every block comment is replaced by a single space, since (like whitespace) it separates tokens.
+    """
+    parts = []
+    pos = 0
+    while True:
+        if in_comment:
+            end = line.find("*/", pos)
+            if end < 0:
+                return "".join(parts), True
+            parts.append(" ")
+            pos = end + 2
+            in_comment = False
+        else:
+            start = line.find("/*", pos)
+            line_comment = line.find("//", pos)
+            if line_comment >= 0 and (start < 0 or line_comment < start):
+                parts.append(line[pos:line_comment])
+                # A line comment stops at a lone carriage return, which is not a valid token
+                if "\r" in line[line_comment:]:
+                    parts.append("\r")
+                return "".join(parts), False
+            if start < 0:
+                parts.append(line[pos:])
+                return "".join(parts), False
+            parts.append(line[pos:start])
+            pos = start + 2
+            in_comment = True
+
+
+def scan(lines: Iterable[str]) -> Iterator[tuple[Optional[RawTransition], int, str]]:
+    """
+    Scan a Varphi program given as physical lines (each optionally terminated by "\\n" or "\\r\\n").
+
+    Yields a (transition, first_line, source) triple for every logical line that is not blank:
+        - transition (Optional[RawTransition]): The recognized transition, or None if the line could not be recognized.
+        - first_line (int): The number of the first physical line of the logical line.
+        - source (str): The original source text of the logical line (without its final line terminator).
+    """
+    line_number = 0
+    # Source lines and comment-free text of a logical line that spans several physical lines
+    pending_source: list[str] = []
+    pending_text: list[str] = []
+    pending_start = 0
+    token_line = 0
+    in_comment = False
+
+    for line in lines:
+        line_number += 1
+        if line[-1:] == "\n":
+            line = line[:-2] if line[-2:-1] == "\r" else line[:-1]
+
+        # Fast path: a self-contained physical line
+        if not in_comment and "/*" not in line:
+            transition = parse_transition(line, line_number)
+            if transition is not None:
+                yield transition, line_number, line
+            elif _BLANK_LINE.fullmatch(line) is None:
+                yield None, line_number, line
+            continue
+
+        # Slow path: block comments, possibly spanning several physical lines
+        if not in_comment:
+            pending_start = line_number
+            token_line = 0
+        inside_comment = in_comment
+        text, in_comment = _strip_comments(line, in_comment)
+        # Lines entirely inside a block comment can never be quoted by a diagnostic, so they are not retained (but a
+        # line ending a comment and starting another one may hold tokens in between)
+        entirely_comment = inside_comment and in_comment and "*/" not in line
+        pending_source.append("" if entirely_comment else line)
+        pending_text.append(text)
+        if not token_line and text.strip(" \t"):
+            token_line = line_number
+        if in_comment:
+            continue
+
+        text = "".join(pending_text)
+        source = "\n".join(pending_source)
+        pending_text.clear()
+        pending_source.clear()
+        if token_line:
+            yield parse_transition(text, token_line), pending_start, source
+
+    if in_comment:
+        # Unterminated block comment
+        yield None, pending_start, "\n".join(pending_source)
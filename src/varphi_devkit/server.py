@@ -0,0 +1,356 @@
+"""
+A long-lived compile daemon, and its client.
+
+Starting an interpreter and loading the ANTLR machinery costs more than compiling a typical program. The daemon pays
+for that once: it keeps the DFA caches of the ANTLR recognizers warm, and remembers the results of recent compiles.
+It accepts compile requests on a local Unix domain socket, one JSON object per line, and answers each with one line:
+    - {"op": "compile", "program": "..."} -> {"ok": true, "output": "...", "cached": false}, or on a diagnostic
+      {"ok": false, "error": {"type": "VarphiUndefinedVariableError", "line": ..., "column": ..., ...}}
+    - {"op": "metrics"} -> {"ok": true, "metrics": {...}}
+    - {"op": "ping"} -> {"ok": true}
+Its metrics (request counts, cache hit rate and latency percentiles) can also be scraped over HTTP, in the Prometheus
+text format.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Callable, Optional
+
+from .compiler import VarphiCompiler
+from . import exceptions
+from .exceptions import VarphiSyntaxError, _rebuild_error
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Default number of compile results kept by the daemon
+CACHE_SIZE = 1024
+# Number of most recent requests the latency percentiles are computed from
+LATENCY_WINDOW = 10_000
+# Latency quantiles reported by the metrics
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Diagnostics the client rebuilds (any other error is reported as a VarphiDaemonError)
+_ERROR_TYPES = {
+    cls.__name__: cls
+    for cls in (
+        exceptions.VarphiSyntaxError,
+        exceptions.VarphiTransitionInconsistentTapeCountError,
+        exceptions.VarphiGlobalTapeCountError,
+        exceptions.VarphiUndefinedVariableError,
+    )
+}
+
+
+class VarphiDaemonError(RuntimeError):
+    """Raised by the client when the daemon fails to compile a program for another reason than a diagnostic."""
+
+
+def default_socket_path() -> str:
+    """The socket the daemon listens on by default, private to the current user."""
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"varphi-devkit-{os.getuid()}.sock")
+
+
+class _Metrics:
+    """Request counters and a window of recent latencies, updated by every request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, latency: float, ok: bool, cached: bool) -> None:
+        """Record a compile request."""
+        with self._lock:
+            self.requests += 1
+            self.errors += not ok
+            self.cache_hits += cached
+            self.latencies.append(latency)
+
+    def snapshot(self) -> dict:
+        """The current metrics, as a JSON-serializable dictionary."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            requests, errors, hits = self.requests, self.errors, self.cache_hits
+        quantiles = {
+            str(q): latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+            for q in QUANTILES
+            if latencies
+        }
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "requests": requests,
+            "errors": errors,
+            "cache_hits": hits,
+            "cache_misses": requests - hits,
+            "cache_hit_rate": hits / requests if requests else 0.0,
+            "latency_seconds": quantiles,
+        }
+
+
+def format_prometheus(metrics: dict) -> str:
+    """Render metrics returned by the daemon in the Prometheus text exposition format."""
+    lines = [
+        "# TYPE varphi_devkit_uptime_seconds gauge",
+        f"varphi_devkit_uptime_seconds {metrics['uptime_seconds']}",
+        "# TYPE varphi_devkit_requests_total counter",
+        f"varphi_devkit_requests_total {metrics['requests']}",
+        "# TYPE varphi_devkit_errors_total counter",
+        f"varphi_devkit_errors_total {metrics['errors']}",
+        "# TYPE varphi_devkit_cache_hits_total counter",
+        f"varphi_devkit_cache_hits_total {metrics['cache_hits']}",
+        "# TYPE varphi_devkit_cache_misses_total counter",
+        f"varphi_devkit_cache_misses_total {metrics['cache_misses']}",
+        "# TYPE varphi_devkit_cache_hit_rate gauge",
+        f"varphi_devkit_cache_hit_rate {metrics['cache_hit_rate']}",
+        "# TYPE varphi_devkit_latency_seconds summary",
+    ]
+    for quantile, value in metrics["latency_seconds"].items():
+        lines.append(f'varphi_devkit_latency_seconds{{quantile="{quantile}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answers the requests sent on a connection, one line each, until the client disconnects."""
+
+    server: "VarphiCompileServer"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request["op"]
+            except (ValueError, TypeError, KeyError):
+                response = _failure("ProtocolError", "Malformed request")
+            else:
+                if op == "compile":
+                    response = self.server.compile(request.get("program", ""))
+                elif op == "metrics":
+                    response = {"ok": True, "metrics": self.server.metrics.snapshot()}
+                elif op == "ping":
+                    response = {"ok": True}
+                else:
+                    response = _failure("ProtocolError", f"Unknown op: {op!r}")
+            try:
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away without waiting for the response
+                return
+
+
+class VarphiCompileServer(socketserver.ThreadingUnixStreamServer):
+    """
+    A compile daemon listening on a Unix domain socket (see the module documentation for the protocol).
+
+    Every request is compiled by a new instance of the backend (so backends keeping state on themselves are fine), in
+    a thread of its own. The responses to the most recent distinct programs are kept in an LRU cache.
+    Attributes:
+        - backend (Callable[[], VarphiCompiler]): The factory of compilers, typically a VarphiCompiler subclass.
+        - cache_size (int): The maximum number of compile results kept (0 disables the cache).
+        - metrics (_Metrics): The metrics of the requests served so far.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        path: str,
+        backend: Callable[[], VarphiCompiler],
+        cache_size: int = CACHE_SIZE,
+    ):
+        """Bind the socket at path (replacing a stale one), readable and writable by the current user only."""
+        self.backend = backend
+        self.cache_size = cache_size
+        self.metrics = _Metrics()
+        self._cache: OrderedDict[bytes, dict] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        if os.path.exists(path):
+            _remove_stale_socket(path)
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        # Warm up the ANTLR machinery now rather than on the first error
+        from . import antlr  # noqa: F401
+
+    def compile(self, program: str) -> dict:
+        """
+        Compile a program (or fetch the result of a previous compile), and build the response.
+        Programs that are not strings, or that hold lone surrogates (which JSON strings can encode), are answered with
+        a ProtocolError.
+        """
+        if not isinstance(program, str):
+            return _failure("ProtocolError", "The program must be a string")
+        try:
+            encoded = program.encode("utf-8", errors="strict")
+        except UnicodeEncodeError as error:
+            return _failure(
+                "ProtocolError", f"The program is not valid Unicode: {error.reason}"
+            )
+        start = time.perf_counter()
+        key = hashlib.sha256(encoded).digest()
+        with self._cache_lock:
+            response = self._cache.get(key)
+            if response is not None:
+                self._cache.move_to_end(key)
+        cached = response is not None
+        if not cached:
+            response = _compile(self.backend, program)
+            if self.cache_size > 0:
+                with self._cache_lock:
+                    self._cache[key] = response
+                    if len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        self.metrics.record(time.perf_counter() - start, response["ok"], cached)
+        return dict(response, cached=cached) if response["ok"] else response
+
+    def server_close(self) -> None:
+        """Close the socket, and remove its file."""
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def _compile(backend: Callable[[], VarphiCompiler], program: str) -> dict:
+    """Compile a program with a new backend instance, and build the response."""
+    try:
+        output = backend().compile(program)
+    except VarphiSyntaxError as error:
+        state = {
+            "line": error.line,
+            "column": error.column,
+            "msg": error.msg,
+            "token_length": error.token_length,
+            "source_line": error.source_line,
+        }
+        return {"ok": False, "error": {"type": type(error).__name__, **state}}
+    except Exception as error:
+        return _failure(type(error).__name__, str(error))
+    return {"ok": True, "output": output}
+
+
+def _failure(error_type: str, message: str) -> dict:
+    """Build the response to a request that failed for another reason than a diagnostic."""
+    return {"ok": False, "error": {"type": error_type, "message": message}}
+
+
+def _remove_stale_socket(path: str) -> None:
+    """Remove the socket file left behind by a daemon that is gone (raises OSError if one still listens on it)."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"A daemon is already listening on {path}")
+
+
+def serve_metrics(
+    server: VarphiCompileServer, host: str, port: int
+) -> "ThreadingHTTPServer":
+    """Serve the metrics of a daemon over HTTP at /metrics, in the Prometheus text format, from a background thread."""
+    # Only the daemon needs an HTTP server, not the clients
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = format_prometheus(server.metrics.snapshot()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:
+            # Scrapes are too frequent to be logged
+            pass
+
+    http_server = ThreadingHTTPServer((host, port), MetricsHandler)
+    http_server.daemon_threads = True
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return http_server
+
+
+class VarphiCompileClient:
+    """
+    A client of the compile daemon, keeping a single connection open.
+    Clients are not thread-safe: each thread should use a client of its own.
+    """
+
+    def __init__(self, path: Optional[str] = None, timeout: Optional[float] = None):
+        """Connect to the daemon listening at path (default_socket_path() if None)."""
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(path if path is not None else default_socket_path())
+        except OSError:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile("rwb")
+
+    def compile(self, program: str) -> str:
+        """
+        Compile a program on the daemon, and return the compiled program.
+        Diagnostics are raised as the same VarphiSyntaxErrors a local compile would raise, and other failures as
+        VarphiDaemonErrors.
+        """
+        response = self._request({"op": "compile", "program": program})
+        if response["ok"]:
+            return response["output"]
+        error = response["error"]
+        error_type = _ERROR_TYPES.get(error["type"])
+        if error_type is None:
+            raise VarphiDaemonError(f"{error['type']}: {error.get('message', '')}")
+        state = {name: value for name, value in error.items() if name != "type"}
+        raise _rebuild_error(error_type, (state["msg"],), state)
+
+    def metrics(self) -> dict:
+        """Fetch the metrics of the daemon."""
+        return self._request({"op": "metrics"})["metrics"]
+
+    def ping(self) -> None:
+        """Check that the daemon is answering."""
+        self._request({"op": "ping"})
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._file.close()
+        self._socket.close()
+
+    def _request(self, request: dict) -> dict:
+        """Send a request, and wait for its response."""
+        self._file.write(json.dumps(request).encode() + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise VarphiDaemonError("The daemon closed the connection")
+        response = json.loads(line)
+        if not response["ok"] and response["error"]["type"] == "ProtocolError":
+            raise VarphiDaemonError(response["error"]["message"])
+        return response
+
+    def __enter__(self) -> "VarphiCompileClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,166 @@
+"""
+A columnar representation of the transitions of a program.
+
+Instead of one object per transition, a VarphiTransitionTable stores each field in a contiguous array of integer IDs
+(tape fields as rows of tape_count consecutive entries), with the names behind the IDs in a set of symbol tables.
+Backends can process whole columns at once (e.g. as NumPy arrays), and tables pickle as a handful of byte buffers.
+"""
+
+from abc import ABC
+from array import array
+from typing import Iterable, Iterator, Optional
+
+from .compiler import VarphiCompiler, VarphiCompileSession, VarphiTransition
+from .compact import VarphiSymbolTables
+
+# Typecodes of the columns: IDs and line numbers are unsigned 32-bit integers, directions fit in a byte
+_ID_TYPECODE = "I"
+_DIRECTION_TYPECODE = "B"
+
+
+class VarphiTransitionTable:
+    """
+    The transitions of a program, stored column by column.
+    Attributes:
+        - tape_count (int): The number of tapes used by every transition.
+        - tables (VarphiSymbolTables): The symbol tables the IDs in the columns refer to.
+        - current_states (array): ID of the current state of each transition, in tables.states.
+        - next_states (array): ID of the next state of each transition, in tables.states.
+        - read_symbols (array): IDs of the read symbols in tables.symbols, tape_count per transition (row-major).
+        - write_symbols (array): IDs of the write symbols in tables.symbols, tape_count per transition (row-major).
+        - shift_directions (array): IDs of the shift directions in tables.directions, tape_count per transition (row-major).
+        - line_numbers (array): The line number in the source code of each transition.
+    """
+
+    def __init__(self, tape_count: int, tables: Optional[VarphiSymbolTables] = None):
+        """Initialize an empty table for transitions using tape_count tapes."""
+        self.tape_count = tape_count
+        self.tables = tables if tables is not None else VarphiSymbolTables()
+        self.current_states = array(_ID_TYPECODE)
+        self.next_states = array(_ID_TYPECODE)
+        self.read_symbols = array(_ID_TYPECODE)
+        self.write_symbols = array(_ID_TYPECODE)
+        self.shift_directions = array(_DIRECTION_TYPECODE)
+        self.line_numbers = array(_ID_TYPECODE)
+
+    def append(self, transition: VarphiTransition) -> None:
+        """Append a transition to the table, interning its names."""
+        if len(transition.read_symbols) != self.tape_count:
+            raise ValueError(
+                f"Transition uses {len(transition.read_symbols)} tapes, "
+                f"but the table holds transitions using {self.tape_count}"
+            )
+        states = self.tables.states
+        symbols = self.tables.symbols
+        self.current_states.append(states.intern(transition.current_state))
+        self.next_states.append(states.intern(transition.next_state))
+        self.read_symbols.extend(symbols.intern_tuple(transition.read_symbols))
+        self.write_symbols.extend(symbols.intern_tuple(transition.write_symbols))
+        self.shift_directions.extend(
+            self.tables.directions.intern_tuple(transition.shift_directions)
+        )
+        self.line_numbers.append(transition.line_number)
+
+    def extend(self, transitions: Iterable[VarphiTransition]) -> None:
+        """Append several transitions to the table (faster than appending them one at a time)."""
+        intern_state = self.tables.states.intern
+        intern_symbols = self.tables.symbols.intern_tuple
+        intern_directions = self.tables.directions.intern_tuple
+        for transition in transitions:
+            if len(transition.read_symbols) != self.tape_count:
+                raise ValueError(
+                    f"Transition uses {len(transition.read_symbols)} tapes, "
+                    f"but the table holds transitions using {self.tape_count}"
+                )
+            self.current_states.append(intern_state(transition.current_state))
+            self.next_states.append(intern_state(transition.next_state))
+            self.read_symbols.extend(intern_symbols(transition.read_symbols))
+            self.write_symbols.extend(intern_symbols(transition.write_symbols))
+            self.shift_directions.extend(intern_directions(transition.shift_directions))
+            self.line_numbers.append(transition.line_number)
+
+    def transition(self, index: int) -> VarphiTransition:
+        """Build the string view of the transition in a given row."""
+        states = self.tables.states.names
+        symbols = self.tables.symbols.names
+        directions = self.tables.directions.names
+        start = index * self.tape_count
+        end = start + self.tape_count
+        return VarphiTransition(
+            current_state=states[self.current_states[index]],
+            read_symbols=tuple(symbols[i] for i in self.read_symbols[start:end]),
+            next_state=states[self.next_states[index]],
+            write_symbols=tuple(symbols[i] for i in self.write_symbols[start:end]),
+            shift_directions=tuple(
+                directions[i] for i in self.shift_directions[start:end]
+            ),
+            line_number=self.line_numbers[index],
+        )
+
+    def to_numpy(self) -> dict:
+        """
+        View the columns as NumPy arrays (without copying them), keyed by attribute name.
+        Tape fields have shape (len(self), tape_count), and the others have shape (len(self),).
+        Requires NumPy, which is not a dependency of the devkit.
+        """
+        import numpy
+
+        def view(column: array, shape: tuple[int, ...]):
+            dtype = numpy.dtype(f"u{column.itemsize}")
+            return numpy.frombuffer(column, dtype=dtype).reshape(shape)
+
+        rows = (len(self),)
+        tapes = (len(self), self.tape_count)
+        return {
+            "current_states": view(self.current_states, rows),
+            "next_states": view(self.next_states, rows),
+            "read_symbols": view(self.read_symbols, tapes),
+            "write_symbols": view(self.write_symbols, tapes),
+            "shift_directions": view(self.shift_directions, tapes),
+            "line_numbers": view(self.line_numbers, rows),
+        }
+
+    def __len__(self) -> int:
+        return len(self.current_states)
+
+    def __iter__(self) -> Iterator[VarphiTransition]:
+        for index in range(len(self)):
+            yield self.transition(index)
+
+
+class VarphiTableCompiler(VarphiCompiler, ABC):
+    """
+    An abstract Varphi compiler collecting the transitions of a program into a VarphiTransitionTable.
+
+    Concrete implementations must implement generate_compiled_program(self) -> str, which can use the complete table
+    of the program through the `table` attribute (None until the first transition has been handled).
+    The table is kept in the session of each compile, so a single compiler can build several tables at the same time.
+    Compact transitions are not supported.
+    """
+
+    def init_session(self, session: VarphiCompileSession) -> None:
+        """Start each compile without a table."""
+        if session.config.compact:
+            raise ValueError("The table holds the names of VarphiTransitions")
+        super().init_session(session)
+        session.table = None
+
+    @property
+    def table(self) -> Optional[VarphiTransitionTable]:
+        """The table of the current (or last) compile."""
+        session = self.session
+        return getattr(session, "table", None)
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        """Append a transition to the table of the program."""
+        session = self.session
+        if session.table is None:
+            session.table = VarphiTransitionTable(len(transition.read_symbols))
+        session.table.append(transition)
+
+    def handle_transitions(self, transitions: list[VarphiTransition]) -> None:
+        """Append a batch of transitions to the table of the program."""
+        session = self.session
+        if session.table is None:
+            session.table = VarphiTransitionTable(len(transitions[0].read_symbols))
+        session.table.extend(transitions)
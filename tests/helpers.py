@@ -0,0 +1,19 @@
+from typing import List
+from varphi_devkit import VarphiCompiler, VarphiTransition
+
+
+class MockCompiler(VarphiCompiler):
+    """
+    A concrete implementation of VarphiCompiler for testing.
+    It simply captures the transitions it processes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.captured_transitions: List[VarphiTransition] = []
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        self.captured_transitions.append(transition)
+
+    def generate_compiled_program(self) -> str:
+        return "COMPILATION_SUCCESS"
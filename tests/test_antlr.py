@@ -0,0 +1,111 @@
+import os
+import pytest
+import subprocess
+import sys
+import textwrap
+from varphi_devkit import VarphiSyntaxError, VarphiUndefinedVariableError
+import helpers
+
+
+class MockCompiler(helpers.MockCompiler):
+    frontend = "antlr"
+
+
+def run_python(code: str, **env) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)],
+        env=dict(os.environ, **env),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+COMPILE = """
+import sys
+from varphi_devkit import VarphiCompiler
+
+
+class MockCompiler(VarphiCompiler):
+    frontend = {frontend!r}
+
+    def handle_transition(self, transition):
+        pass
+
+    def generate_compiled_program(self):
+        return ""
+
+
+MockCompiler().compile({program!r})
+print("antlr4" in sys.modules)
+"""
+
+
+def test_valid_programs_do_not_load_antlr():
+    code = COMPILE.format(frontend="fast", program="s0 (1) s1 (0) (LEFT)\n")
+    assert run_python(code) == "False"
+
+
+def test_antlr_is_loaded_when_needed():
+    code = COMPILE.format(frontend="fast", program="s0 (1) s1 (0)\n")
+    code = f"try:\n{textwrap.indent(code, '    ')}\nexcept Exception:\n    print('antlr4' in sys.modules)"
+    assert run_python(code) == "True"
+
+    code = COMPILE.format(frontend="antlr", program="s0 (1) s1 (0) (LEFT)\n")
+    assert run_python(code) == "True"
+
+
+def test_antlr_writes_nothing_to_the_home_directory(tmp_path):
+    code = COMPILE.format(frontend="antlr", program="s0 (1) s1 (0) (LEFT)\n")
+    assert run_python(code, HOME=str(tmp_path), XDG_CACHE_HOME="") == "True"
+    assert not os.listdir(tmp_path)
+
+
+def compile_in_mode(program: str, mode: str):
+    compiler = MockCompiler()
+    compiler.antlr_mode = mode
+    try:
+        compiler.compile(program)
+    except VarphiSyntaxError as error:
+        return compiler.captured_transitions, (type(error), str(error))
+    return compiler.captured_transitions, None
+
+
+@pytest.mark.parametrize(
+    "program",
+    [
+        "\n// header\ns0 ($x, 1) s1 ($x, BLANK) (LEFT, STAY)\n\n/* a\n b */ BLANK (0, $y) LEFT ($y, 1) (RIGHT, RIGHT)\n",
+        "s0 (1) s1 (0) (LEFT)\ns1 (1, 1) s2 (0, 0) (LEFT, LEFT)",
+        "s0 (1) s1 (0) (LEFT)\ns1 ($x) s2 ($y) (LEFT)",
+        "s0 (1) s1 (0, 1) (LEFT)",
+        "s0 (1) s1 (0) (LEFT)\ns1 (1) s2 (0) (UP)",
+        "s0 (1) s1 (0) (LEFT) # comment",
+        "",
+    ],
+)
+def test_treeless_mode_matches_tree_mode(program):
+    assert compile_in_mode(program, "treeless") == compile_in_mode(program, "tree")
+
+
+def test_treeless_mode_reports_precise_locations():
+    transitions, (error_type, _) = compile_in_mode(
+        "s0 (1, 1) s1 (0, 0) (LEFT, LEFT)\ns1 ($x, 1) s2 (0, $y) (LEFT, STAY)",
+        "treeless",
+    )
+    assert error_type is VarphiUndefinedVariableError
+    assert [t.line_number for t in transitions] == [1]
+
+    compiler = MockCompiler()
+    with pytest.raises(VarphiUndefinedVariableError) as exc:
+        compiler.compile(
+            "s0 (1, 1) s1 (0, 0) (LEFT, LEFT)\ns1 ($x, 1) s2 (0, $y) (LEFT, STAY)"
+        )
+    assert (exc.value.line, exc.value.column) == (2, 18)
+
+
+def test_unknown_antlr_mode():
+    compiler = MockCompiler()
+    compiler.antlr_mode = "bogus"
+    with pytest.raises(ValueError):
+        compiler.compile("s0 (1) s1 (0) (LEFT)")
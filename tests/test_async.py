@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import pytest
+from varphi_devkit import VarphiTransition, VarphiSyntaxError
+import helpers
+
+
+class MockCompiler(helpers.MockCompiler):
+    def generate_compiled_program(self) -> str:
+        return str(len(self.captured_transitions))
+
+
+class SlowCompiler(MockCompiler):
+    def __init__(self, started: threading.Event = None):
+        super().__init__()
+        self.started = started
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        if self.started is not None:
+            self.started.set()
+        threading.Event().wait(0.001)
+        super().handle_transition(transition)
+
+
+def program(n: int) -> str:
+    return "".join(f"q{i} (0) q{i + 1} (1) (RIGHT)\n" for i in range(n))
+
+
+def test_compile_async():
+    compiler = MockCompiler()
+    assert asyncio.run(compiler.compile_async(program(100))) == "100"
+    assert compiler.captured_transitions[-1].line_number == 100
+
+
+def test_compile_async_raises_diagnostics():
+    with pytest.raises(VarphiSyntaxError):
+        asyncio.run(MockCompiler().compile_async("q0 (0) q1 (1)"))
+
+
+def test_compile_async_timeout():
+    compiler = SlowCompiler()
+    with pytest.raises(TimeoutError):
+        asyncio.run(compiler.compile_async(program(10_000), timeout=0.05))
+    assert len(compiler.captured_transitions) < 10_000
+
+
+def test_compile_async_cancellation():
+    started = threading.Event()
+    compiler = SlowCompiler(started)
+
+    async def main():
+        task = asyncio.create_task(compiler.compile_async(program(10_000)))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Give the executor time to notice the cancellation
+        await asyncio.sleep(0.1)
+        return len(compiler.captured_transitions)
+
+    count = asyncio.run(main())
+    assert 0 < count < 10_000
+
+
+def test_compile_async_semaphore_bounds_concurrency():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    class TrackingCompiler(MockCompiler):
+        def compile(self, program: str, workers: int = 1) -> str:
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            try:
+                threading.Event().wait(0.01)
+                return super().compile(program, workers)
+            finally:
+                with lock:
+                    active -= 1
+
+    async def main():
+        semaphore = asyncio.Semaphore(2)
+        return await asyncio.gather(
+            *(
+                TrackingCompiler().compile_async(program(5), semaphore=semaphore)
+                for _ in range(8)
+            )
+        )
+
+    assert asyncio.run(main()) == ["5"] * 8
+    assert peak <= 2
+
+
+def test_compile_async_cancellation_holds_the_semaphore():
+    started = threading.Event()
+    release = threading.Event()
+
+    class BlockingCompiler(MockCompiler):
+        def handle_transition(self, transition: VarphiTransition) -> None:
+            started.set()
+            # Stands for a parse that cannot be interrupted
+            release.wait(5)
+            super().handle_transition(transition)
+
+    async def main():
+        semaphore = asyncio.Semaphore(1)
+        task = asyncio.create_task(
+            BlockingCompiler().compile_async(program(1), semaphore=semaphore)
+        )
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The compile still runs in the executor
+        held = semaphore.locked()
+        release.set()
+        async with asyncio.timeout(5):
+            await semaphore.acquire()
+        return held
+
+    assert asyncio.run(main())
+
+
+def test_compile_async_iter():
+    async def main():
+        compiler = MockCompiler()
+        transitions = [t async for t in compiler.compile_async_iter(program(1000))]
+        return compiler, transitions
+
+    compiler, transitions = asyncio.run(main())
+    assert transitions == compiler.captured_transitions
+    assert len(transitions) == 1000
+
+
+def test_compile_async_iter_stops_the_compile_when_abandoned():
+    compiler = SlowCompiler()
+
+    async def main():
+        async with asyncio.timeout(5):
+            iterator = compiler.compile_async_iter(program(10_000))
+            async for transition in iterator:
+                break
+            await iterator.aclose()
+            await asyncio.sleep(0.2)
+        return len(compiler.captured_transitions)
+
+    assert asyncio.run(main()) < 10_000
+
+
+def test_compile_async_iter_raises_diagnostics():
+    async def main():
+        return [t async for t in MockCompiler().compile_async_iter("q0 (0) q1 (1)")]
+
+    with pytest.raises(VarphiSyntaxError):
+        asyncio.run(main())
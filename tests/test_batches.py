@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from typing import List
+from varphi_devkit import (
+    VarphiCompactTransition,
+    VarphiTableCompiler,
+    VarphiTransition,
+    VarphiUndefinedVariableError,
+)
+from helpers import MockCompiler
+
+
+class BatchCompiler(MockCompiler):
+    batch_size = 4
+
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes: List[int] = []
+
+    def handle_transitions(self, transitions: List[VarphiTransition]) -> None:
+        self.batch_sizes.append(len(transitions))
+        self.captured_transitions.extend(transitions)
+
+
+class TableCompiler(VarphiTableCompiler):
+    def generate_compiled_program(self) -> str:
+        return "COMPILATION_SUCCESS"
+
+
+def program(n: int) -> str:
+    return "".join(f"q{i} ($x, 0) q{i + 1} (1, $x) (RIGHT, STAY)\n" for i in range(n))
+
+
+@pytest.mark.parametrize("frontend", ["fast", "antlr"])
+def test_batches_match_single_transitions(frontend):
+    expected = MockCompiler()
+    expected.compile(program(10))
+
+    compiler = BatchCompiler()
+    compiler.frontend = frontend
+    compiler.compile(program(10))
+    assert compiler.captured_transitions == expected.captured_transitions
+    assert compiler.batch_sizes == [4, 4, 2]
+
+
+def test_batches_of_file(tmp_path):
+    path = tmp_path / "program.varphi"
+    path.write_text(program(9))
+    compiler = BatchCompiler()
+    compiler.batch_size = 5
+    compiler.compile_file(path)
+    assert compiler.batch_sizes == [5, 4]
+
+
+def test_single_transitions_without_batches():
+    # Streamed transitions are handled as soon as their line is complete
+    compiler = BatchCompiler()
+    compiler.compile_stream(program(3).splitlines(True))
+    assert len(compiler.captured_transitions) == 3
+    assert compiler.batch_sizes == []
+
+    # Parse trees are walked one transition at a time
+    compiler.captured_transitions = []
+    compiler.antlr_mode = "tree"
+    compiler.frontend = "antlr"
+    compiler.compile(program(3))
+    assert len(compiler.captured_transitions) == 3
+    assert compiler.batch_sizes == []
+
+
+def test_compact_batches():
+    compiler = BatchCompiler()
+    compiler.compact = True
+    compiler.compile(program(6))
+    assert all(
+        type(t) is VarphiCompactTransition for t in compiler.captured_transitions
+    )
+    assert compiler.captured_transitions[5].to_transition() == VarphiTransition(
+        "q5", ("$1", "0"), "q6", ("1", "$1"), ("RIGHT", "STAY"), 6
+    )
+
+
+def test_errors_in_batches():
+    compiler = BatchCompiler()
+    with pytest.raises(VarphiUndefinedVariableError):
+        compiler.compile(program(10) + "q10 ($x, 0) q11 ($y, 0) (LEFT, LEFT)\n")
+
+
+def test_async_batches():
+    compiler = BatchCompiler()
+
+    async def main():
+        return [t async for t in compiler.compile_async_iter(program(10))]
+
+    assert [t.line_number for t in asyncio.run(main())] == list(range(1, 11))
+
+
+def test_invalid_batch_size():
+    compiler = BatchCompiler()
+    compiler.batch_size = 0
+    with pytest.raises(ValueError):
+        compiler.compile(program(1))
+
+
+@pytest.mark.parametrize("frontend", ["fast", "antlr"])
+def test_table_batches(frontend):
+    compiler = TableCompiler()
+    compiler.frontend = frontend
+    compiler.compile(program(600))
+    expected = MockCompiler()
+    expected.compile(program(600))
+    assert list(compiler.table) == expected.captured_transitions
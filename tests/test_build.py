@@ -0,0 +1,123 @@
+import json
+import os
+import pytest
+from varphi_devkit.build import MANIFEST_NAME, build
+from varphi_devkit.cli import main
+import helpers
+
+
+class MockCompiler(helpers.MockCompiler):
+    def generate_compiled_program(self) -> str:
+        return " ".join(t.current_state for t in self.captured_transitions) + "\n"
+
+
+class OtherCompiler(MockCompiler):
+    def generate_compiled_program(self) -> str:
+        return "other\n"
+
+
+BACKEND = "test_build:MockCompiler"
+
+
+@pytest.fixture
+def tree(tmp_path):
+    source_dir = tmp_path / "src"
+    for i in range(6):
+        path = source_dir / f"dir{i % 2}" / f"p{i}.varphi"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"q{i} (0) r (1) (LEFT)\nr (0) q{i} (1) (LEFT)\n")
+    (source_dir / "notes.txt").write_text("not a program")
+    return source_dir, tmp_path / "out"
+
+
+def backdate(path, seconds: int = 10) -> None:
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 10**9))
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_build_tree(tree, jobs):
+    source_dir, output_dir = tree
+    streamed = []
+    summary = build(
+        str(source_dir), str(output_dir), BACKEND, jobs=jobs, on_result=streamed.append
+    )
+    assert summary.count("compiled") == 6
+    assert sorted(r.source for r in streamed) == sorted(
+        os.path.join(f"dir{i % 2}", f"p{i}.varphi") for i in range(6)
+    )
+    assert (output_dir / "dir1" / "p3.out").read_text() == "q3 r\n"
+    assert not (output_dir / "notes.out").exists()
+    assert "6 compiled, 0 up to date, 0 failed" in summary.format()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_outputs_follow_the_umask(tree):
+    source_dir, output_dir = tree
+    umask = os.umask(0o022)
+    os.umask(umask)
+    build(str(source_dir), str(output_dir), BACKEND)
+    for path in [output_dir / "dir1" / "p3.out", output_dir / MANIFEST_NAME]:
+        assert path.stat().st_mode & 0o777 == 0o666 & ~umask
+
+
+def test_up_to_date_outputs_are_skipped(tree):
+    source_dir, output_dir = tree
+    for path in source_dir.rglob("*.varphi"):
+        backdate(path)
+    build(str(source_dir), str(output_dir), BACKEND, jobs=1)
+
+    # Untouched sources are skipped without being read
+    summary = build(str(source_dir), str(output_dir), BACKEND, jobs=1)
+    assert (summary.up_to_date, summary.results) == (6, [])
+
+    # Touched sources are hashed, but not compiled again
+    (source_dir / "dir0" / "p0.varphi").touch()
+    # Changed sources are compiled again
+    (source_dir / "dir1" / "p1.varphi").write_text("s (0) s (1) (LEFT)\n")
+    summary = build(str(source_dir), str(output_dir), BACKEND, jobs=1)
+    statuses = {r.source: r.status for r in summary.results}
+    assert statuses == {
+        os.path.join("dir0", "p0.varphi"): "unchanged",
+        os.path.join("dir1", "p1.varphi"): "compiled",
+    }
+    assert (output_dir / "dir1" / "p1.out").read_text() == "s\n"
+    assert build(str(source_dir), str(output_dir), BACKEND, jobs=1).up_to_date == 6
+
+    # Deleted outputs, other backends and forced builds rebuild
+    (output_dir / "dir0" / "p2.out").unlink()
+    assert build(str(source_dir), str(output_dir), BACKEND).count("compiled") == 1
+    summary = build(str(source_dir), str(output_dir), "test_build:OtherCompiler")
+    assert summary.count("compiled") == 6
+    summary = build(str(source_dir), str(output_dir), BACKEND, jobs=1, force=True)
+    assert summary.count("compiled") == 6
+
+
+def test_failures(tree):
+    source_dir, output_dir = tree
+    build(str(source_dir), str(output_dir), BACKEND, jobs=1)
+    bad = source_dir / "dir0" / "p0.varphi"
+    bad.write_text("q (0) r ($x) (LEFT)\n")
+
+    summary = build(str(source_dir), str(output_dir), BACKEND, jobs=2)
+    (failure,) = [r for r in summary.results if r.status == "failed"]
+    assert "Undefined variable" in failure.error
+    # Failed sources leave no output behind, and are not recorded as built
+    assert not (output_dir / "dir0" / "p0.out").exists()
+    manifest = json.loads((output_dir / MANIFEST_NAME).read_text())
+    assert os.path.join("dir0", "p0.varphi") not in manifest["sources"]
+    assert build(str(source_dir), str(output_dir), BACKEND).count("failed") == 1
+
+
+def test_cli(tree, capsys):
+    source_dir, output_dir = tree
+    args = ["build", str(source_dir), "-o", str(output_dir), "--backend", BACKEND]
+    assert main([*args, "-j", "2", "-v"]) == 0
+    err = capsys.readouterr().err
+    assert err.count("compiled dir") == 6
+    assert "Built 6 programs" in err and "Slowest: " in err
+
+    (source_dir / "dir0" / "p0.varphi").write_text("q (0) r (1)\n")
+    assert main(args) == 1
+    assert "FAILED " + os.path.join("dir0", "p0.varphi") in capsys.readouterr().err
+    assert main([*args[:-1], "test_build:Missing"]) == 2
@@ -0,0 +1,100 @@
+import os
+import pytest
+from varphi_devkit import VarphiTransition, VarphiTransitionCache, VarphiSyntaxError
+import varphi_devkit.compiler
+from helpers import MockCompiler
+
+CODE = """
+s0 ($x, 1) s1 ($x, BLANK) (LEFT, STAY)
+s1 (0, 1) s0 (1, 0) (RIGHT, RIGHT)
+"""
+
+
+def test_cache_hit_skips_parsing(tmp_path, monkeypatch):
+    cache = VarphiTransitionCache(tmp_path)
+    first = MockCompiler()
+    first.cache = cache
+    first.compile(CODE)
+    assert len(os.listdir(tmp_path)) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the program should not be parsed again")
+
+    monkeypatch.setattr(varphi_devkit.compiler, "scan", fail)
+    second = MockCompiler()
+    second.cache = cache
+    assert second.compile(CODE) == "COMPILATION_SUCCESS"
+    assert second.captured_transitions == first.captured_transitions
+
+
+def test_errors_are_not_cached(tmp_path):
+    compiler = MockCompiler()
+    compiler.cache = VarphiTransitionCache(tmp_path)
+    with pytest.raises(VarphiSyntaxError):
+        compiler.compile("s0 (a) s1 (b)")
+    assert os.listdir(tmp_path) == []
+
+
+def test_corrupt_entries_are_misses(tmp_path):
+    cache = VarphiTransitionCache(tmp_path)
+    compiler = MockCompiler()
+    compiler.cache = cache
+    compiler.compile(CODE)
+    with open(tmp_path / (cache.key(CODE) + ".vtc"), "wb") as f:
+        f.write(b"garbage")
+    assert cache.get(CODE) is None
+
+    compiler = MockCompiler()
+    compiler.cache = cache
+    compiler.compile(CODE)
+    assert len(compiler.captured_transitions) == 2
+    assert cache.get(CODE) == compiler.captured_transitions
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = VarphiTransitionCache(tmp_path)
+    programs = [f"s{i} (0) s{i} (1) (LEFT)" for i in range(3)]
+    for i, program in enumerate(programs):
+        cache.put(
+            program, [VarphiTransition(f"s{i}", ("0",), f"s{i}", ("1",), ("LEFT",), 1)]
+        )
+        path = tmp_path / (cache.key(program) + ".vtc")
+        os.utime(path, (1000 + i, 1000 + i))
+    entry_size = os.path.getsize(path)
+
+    # Eviction makes room down to 90% of max_size: only the least recently used entry goes
+    cache.max_size = int(2.5 * entry_size)
+    cache.get(programs[0])  # Most recently used now
+    cache.put(programs[2], cache.get(programs[2]))
+    assert cache.get(programs[1]) is None
+    assert cache.get(programs[0]) is not None
+    assert cache.get(programs[2]) is not None
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+
+def test_writes_do_not_scan_the_cache(tmp_path, monkeypatch):
+    cache = VarphiTransitionCache(tmp_path)
+    scans = 0
+    entries = VarphiTransitionCache._entries
+
+    def counting_entries(self):
+        nonlocal scans
+        scans += 1
+        return entries(self)
+
+    monkeypatch.setattr(VarphiTransitionCache, "_entries", counting_entries)
+    transitions = [VarphiTransition("s0", ("0",), "s1", ("1",), ("LEFT",), 1)]
+    for i in range(50):
+        cache.put(f"s{i} (0) s1 (1) (LEFT)", transitions)
+    assert scans == 1
+
+    # Once full, the cache is only scanned again after another 10% of max_size has been written
+    entry_size = os.path.getsize(
+        tmp_path / (cache.key("s0 (0) s1 (1) (LEFT)") + ".vtc")
+    )
+    cache.max_size = 20 * entry_size
+    scans = 0
+    for i in range(50, 100):
+        cache.put(f"s{i} (0) s1 (1) (LEFT)", transitions)
+    assert scans <= 50 // 2 + 1
+    assert len(os.listdir(tmp_path)) <= 20
@@ -0,0 +1,108 @@
+import pytest
+from varphi_devkit import (
+    VarphiSyntaxError,
+    VarphiTransitionInconsistentTapeCountError,
+    VarphiGlobalTapeCountError,
+    VarphiUndefinedVariableError,
+)
+from helpers import MockCompiler
+
+CODE = """s0 (1, 0) s1 (0, 1) (LEFT, LEFT)
+s1 (1) s2 (0) (LEFT)
+s2 (1, $x) s2 (0, $y) (LEFT, RIGHT)
+/* a block
+   comment */ s2 (1, 1) s3 (0) (LEFT, RIGHT)
+s3 (1 1) s3 (0, 0) (LEFT, RIGHT)
+s3 (1, 1) s4 (0, 0) (LEFT, RIGHT)
+"""
+
+
+def test_check_collects_every_error():
+    compiler = MockCompiler()
+    errors = compiler.check(CODE)
+    # compile() reports the syntax error first, and so does check()
+    assert [(type(e), e.line, e.column) for e in errors] == [
+        (VarphiSyntaxError, 6, 6),
+        (VarphiGlobalTapeCountError, 2, 0),
+        (VarphiUndefinedVariableError, 3, 18),
+        (VarphiTransitionInconsistentTapeCountError, 5, 14),
+    ]
+    assert not compiler.captured_transitions
+
+
+def test_check_errors_carry_their_source_line():
+    errors = MockCompiler().check(CODE)
+    assert [e.source_line for e in errors] == [
+        "s3 (1 1) s3 (0, 0) (LEFT, RIGHT)",
+        "s1 (1) s2 (0) (LEFT)",
+        "s2 (1, $x) s2 (0, $y) (LEFT, RIGHT)",
+        "   comment */ s2 (1, 1) s3 (0) (LEFT, RIGHT)",
+    ]
+    assert "s3 (1 1) s3 (0, 0) (LEFT, RIGHT)" in str(errors[0])
+
+
+def test_check_first_error_matches_compile():
+    program = "s0 (1) s1 (0) (LEFT)\ns1 (1) s2 (0) (LEFT) junk\ns2 (1) s3 (0) (UP)\n"
+    errors = MockCompiler().check(program)
+    assert len(errors) == 2
+    try:
+        MockCompiler().compile(program)
+    except VarphiSyntaxError as error:
+        assert (error.line, error.column, error.msg) == (
+            errors[0].line,
+            errors[0].column,
+            errors[0].msg,
+        )
+
+
+def test_check_valid_and_empty_programs():
+    compiler = MockCompiler()
+    assert compiler.check("s0 (1) s1 (0) (LEFT)") == []
+    assert len(compiler.check("// nothing here\n")) == 1
+    # check() leaves the compiler ready to compile
+    assert compiler.compile("s0 (1, 1) s1 (0, 0) (LEFT, LEFT)") == "COMPILATION_SUCCESS"
+
+
+@pytest.mark.parametrize(
+    "program",
+    [
+        "",
+        "\n// only a comment",
+        "s0 ",
+        "s0 (1) s1 (0) (LEFT)\r\ns1 (1) s2 (0) (LEFT) junk\r\n",
+        "s0 (1) s1 (0) (LEFT)\n)s1 s0 ",
+        "s0 (1) s1 (0) (LEFT)\n/* a\n$y\r\n/* ",
+        "s0 (0) s1 ( /* a\nb */ 1 , /* c\nd */ 0 ) (LEFT)\n",
+        "s0 (1) s1 (0) (LEFT)\ns1 (1, 1) s2 (0, 0) (LEFT, LEFT)\ns2 (1) s3 (0) (UP)\n",
+    ],
+)
+@pytest.mark.parametrize("frontend", ["fast", "antlr"])
+def test_check_reports_the_error_of_compile(program, frontend):
+    compiler = MockCompiler()
+    compiler.frontend = frontend
+    errors = compiler.check(program)
+    with pytest.raises(VarphiSyntaxError) as exc:
+        compiler.compile(program)
+    error = exc.value
+    assert (type(errors[0]), errors[0].line, errors[0].column, errors[0].msg) == (
+        type(error),
+        error.line,
+        error.column,
+        error.msg,
+    )
+
+
+def test_check_does_not_change_later_diagnostics():
+    # Recovering from the extraneous token used to extend the token sets cached by the ATN, which every later parse
+    # in the process then reported as expected
+    code = "s0 ($x, a) s1 ($x,$x) (RIGHT, LEFT)\nLEFT (1, 1) q (1,1$y) (RIGHT, LEFT)"
+    expected = "extraneous input '$y' expecting {')', ','}"
+
+    def compile_error() -> str:
+        with pytest.raises(VarphiSyntaxError) as error:
+            MockCompiler().compile(code)
+        return error.value.msg
+
+    assert compile_error() == expected
+    assert [e.msg for e in MockCompiler().check(code)] == [expected]
+    assert compile_error() == expected
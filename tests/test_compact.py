@@ -0,0 +1,119 @@
+import tracemalloc
+import pytest
+from typing import List
+from varphi_devkit import (
+    VarphiCompactTransition,
+    VarphiIncrementalCompiler,
+    VarphiTransition,
+    LEFT,
+    RIGHT,
+    STAY,
+)
+from helpers import MockCompiler
+
+
+class CompactCompiler(MockCompiler):
+    compact = True
+
+
+class RetractingCompactCompiler(CompactCompiler):
+    def retract_transition(self, transition) -> None:
+        self.captured_transitions.remove(transition)
+
+
+CODE = """
+s0 ($x, 1) s1 ($x, BLANK) (LEFT, STAY)
+s1 (0, $y) s0 ($y, 0) (RIGHT, RIGHT)
+s0 (0, 1) s1 (0, BLANK) (LEFT, STAY)
+"""
+
+
+def full_transitions(program: str) -> List[VarphiTransition]:
+    compiler = MockCompiler()
+    compiler.compile(program)
+    return compiler.captured_transitions
+
+
+@pytest.mark.parametrize("frontend", ["fast", "antlr"])
+def test_compact_transitions_expand_to_full_ones(frontend):
+    compiler = CompactCompiler()
+    compiler.frontend = frontend
+    compiler.compile(CODE)
+    assert all(
+        type(t) is VarphiCompactTransition for t in compiler.captured_transitions
+    )
+    assert [
+        t.to_transition() for t in compiler.captured_transitions
+    ] == full_transitions(CODE)
+
+
+def test_compact_stream_and_file(tmp_path):
+    compiler = CompactCompiler()
+    compiler.compile_stream(CODE.splitlines(keepends=True))
+    assert [
+        t.to_transition() for t in compiler.captured_transitions
+    ] == full_transitions(CODE)
+
+    path = tmp_path / "program.varphi"
+    path.write_text(CODE)
+    compiler = CompactCompiler()
+    compiler.compile_file(path)
+    assert [
+        t.to_transition() for t in compiler.captured_transitions
+    ] == full_transitions(CODE)
+
+
+def test_names_are_interned_into_dense_ids():
+    compiler = CompactCompiler()
+    compiler.compile(CODE)
+    tables = compiler.symbol_tables
+    first, second, third = compiler.captured_transitions
+
+    assert tables.states.names == ["s0", "s1"]
+    assert tables.symbols.names == ["$1", "1", "_", "0"]
+    assert tables.directions.names == [LEFT, RIGHT, STAY]
+    assert (first.current_state, first.next_state) == (0, 1)
+    assert first.shift_directions == (0, 2)
+    # Equal tuples of names are shared
+    assert first.shift_directions is third.shift_directions
+    assert first.tables is tables
+
+
+def test_each_compile_gets_new_tables():
+    compiler = CompactCompiler()
+    compiler.compile(CODE)
+    tables = compiler.symbol_tables
+    compiler.compile("q (1) q (1) (STAY)")
+    assert compiler.symbol_tables is not tables
+    assert compiler.symbol_tables.states.names == ["q"]
+
+
+def test_incremental_retracts_compact_transitions():
+    incremental = VarphiIncrementalCompiler(RetractingCompactCompiler)
+    lines = CODE.splitlines()
+    incremental.compile("\n".join(lines))
+    backend = incremental.compiler
+
+    lines[2] = "s1 (0, $y) s2 ($y, 0) (RIGHT, RIGHT)"
+    incremental.compile("\n".join(lines))
+    assert incremental.compiler is backend
+    expected = full_transitions("\n".join(lines))
+    actual = [t.to_transition() for t in backend.captured_transitions]
+    assert sorted(actual, key=lambda t: t.line_number) == expected
+
+
+def test_compact_transitions_use_less_memory():
+    program = "".join(
+        f"q{i % 100} (0, $x) q{i % 70} (1, $x) (RIGHT, LEFT)\n" for i in range(20_000)
+    )
+
+    def retained(compiler):
+        tracemalloc.start()
+        try:
+            compiler.compile(program)
+            return tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    # Plain transitions already share their canonical read/write tuples, but not their state names or own storage
+    assert 1.5 * retained(CompactCompiler()) < retained(MockCompiler())
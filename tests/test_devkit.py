@@ -1,8 +1,5 @@
 import pytest
-from typing import List
 from varphi_devkit import (
-    VarphiCompiler,
-    VarphiTransition,
     VarphiSyntaxError,
     VarphiTransitionInconsistentTapeCountError,
     VarphiGlobalTapeCountError,
@@ -11,23 +8,7 @@ from varphi_devkit import (
     LEFT,
     RIGHT,
 )
-
-
-class MockCompiler(VarphiCompiler):
-    """
-    A concrete implementation of VarphiCompiler for testing.
-    It simply captures the transitions it processes.
-    """
-
-    def __init__(self):
-        super().__init__()
-        self.captured_transitions: List[VarphiTransition] = []
-
-    def handle_transition(self, transition: VarphiTransition) -> None:
-        self.captured_transitions.append(transition)
-
-    def generate_compiled_program(self) -> str:
-        return "COMPILATION_SUCCESS"
+from helpers import MockCompiler
 
 
 @pytest.fixture
@@ -85,6 +66,25 @@ def test_variable_ordering_consistency(compiler):
     assert t.write_symbols == ("$1", "$2")
 
 
+@pytest.mark.parametrize("frontend", ["fast", "antlr"])
+def test_repeated_patterns_share_canonical_tuples(compiler, frontend):
+    """Test that transitions with the same read/write pattern share their canonical tuples."""
+    compiler.frontend = frontend
+    code = "s0 ($x, $y) s1 ($y, $x) (LEFT, LEFT)\ns1 ($a, $b) s2 ($b, $a) (LEFT, LEFT)\ns2 ($x, $y) s3 ($y, $x) (LEFT, LEFT)"
+    compiler.compile(code)
+
+    first, second, third = compiler.captured_transitions
+    assert first.read_symbols == second.read_symbols == ("$1", "$2")
+    assert third.read_symbols is first.read_symbols
+    assert third.write_symbols is first.write_symbols
+
+    # The undefined variable check still applies to patterns seen before
+    with pytest.raises(VarphiUndefinedVariableError):
+        MockCompiler().compile("s0 ($x, $y) s1 ($y, $z) (LEFT, LEFT)")
+    with pytest.raises(VarphiUndefinedVariableError):
+        MockCompiler().compile("s0 ($x, $y) s1 ($y, $z) (LEFT, LEFT)")
+
+
 def test_literals_and_blanks(compiler):
     """Test that literals and keywords are preserved and not treated as variables."""
     code = "s0 (0, BLANK, 1) s1 (1, BLANK, 0) (LEFT, STAY, RIGHT)"
@@ -0,0 +1,66 @@
+import gc
+import pickle
+import pytest
+from varphi_devkit import (
+    VarphiSyntaxError,
+    VarphiTransitionInconsistentTapeCountError,
+    VarphiGlobalTapeCountError,
+    VarphiUndefinedVariableError,
+)
+from helpers import MockCompiler
+
+PROGRAMS = [
+    ("s0 (1) s1 (0) (LEFT)\ns1 (1) s2 (0) (LEFT) junk\n", VarphiSyntaxError),
+    ("s0 (1) s1 (0) (LEFT)\ns1 (1) s2 (0) (LEFT) #\n", VarphiSyntaxError),
+    ("s0 (1, 0) s1 (0) (LEFT, STAY)\n", VarphiTransitionInconsistentTapeCountError),
+    (
+        "s0 (1) s1 (0) (LEFT)\ns1 (1, 1) s2 (0, 0) (LEFT, STAY)\n",
+        VarphiGlobalTapeCountError,
+    ),
+    ("s0 ($x) s1 ($y) (LEFT)\n", VarphiUndefinedVariableError),
+]
+
+
+def compile_error(program: str, frontend: str, mode: str) -> VarphiSyntaxError:
+    compiler = MockCompiler()
+    compiler.frontend = frontend
+    compiler.antlr_mode = mode
+    with pytest.raises(VarphiSyntaxError) as exc:
+        compiler.compile(program)
+    return exc.value
+
+
+def live_recognizers() -> list:
+    from varphi_devkit.antlr import VarphiLexer, VarphiParser, parser_pool
+
+    # Idle recognizers are kept alive by the pool, but by nothing else
+    parser_pool.clear()
+    gc.collect()
+    return [o for o in gc.get_objects() if isinstance(o, (VarphiLexer, VarphiParser))]
+
+
+@pytest.mark.parametrize("program, error_type", PROGRAMS)
+@pytest.mark.parametrize("mode", ["tree", "treeless"])
+def test_diagnostics_pickle(program, error_type, mode):
+    error = compile_error(program, "antlr", mode)
+    assert type(error) is error_type
+    assert error.source_line is not None
+
+    copy = pickle.loads(pickle.dumps(error))
+    assert type(copy) is error_type
+    assert (copy.line, copy.column, copy.msg) == (error.line, error.column, error.msg)
+    assert str(copy) == str(error)
+
+
+@pytest.mark.parametrize("frontend, mode", [("fast", "treeless"), ("antlr", "tree")])
+def test_diagnostics_do_not_keep_the_parser_alive(frontend, mode):
+    errors = [compile_error(program, frontend, mode) for program, _ in PROGRAMS]
+    errors += MockCompiler().check("".join(program for program, _ in PROGRAMS))
+    assert live_recognizers() == []
+    assert all(error.source_line for error in errors)
+
+
+def test_diagnostics_capture_the_token_span():
+    error = compile_error("s0 (1) s1 (0) (LEFT) junk\n", "antlr", "treeless")
+    assert (error.column, error.token_length) == (21, 4)
+    assert error.source_line == "s0 (1) s1 (0) (LEFT) junk"
@@ -0,0 +1,168 @@
+import os
+import sys
+import threading
+import pytest
+from typing import List
+from varphi_devkit import (
+    VarphiCompiler,
+    VarphiCompileSession,
+    VarphiFanOutCompiler,
+    VarphiTransition,
+    VarphiSyntaxError,
+)
+import helpers
+
+
+class MockCompiler(helpers.MockCompiler):
+    def generate_compiled_program(self) -> str:
+        return f"{len(self.captured_transitions)} transitions"
+
+
+class StatesCompiler(VarphiCompiler):
+    """Keeps its state in sessions, and receives compact transitions."""
+
+    compact = True
+
+    def init_session(self, session: VarphiCompileSession) -> None:
+        session.states = []
+
+    def handle_transition(self, transition) -> None:
+        self.session.states.append(
+            self.symbol_tables.states.names[transition.current_state]
+        )
+
+    def generate_compiled_program(self) -> str:
+        return " ".join(self.session.states)
+
+
+class FailingCompiler(MockCompiler):
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        if transition.line_number == 300:
+            raise RuntimeError("backend failure")
+        super().handle_transition(transition)
+
+
+class ResettingCompiler(VarphiCompiler):
+    """Keeps its state on itself, and resets it in compile() as documented."""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def compile(self, program: str, **kwargs) -> str:
+        self.count = 0
+        return super().compile(program, **kwargs)
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        self.count += 1
+
+    def generate_compiled_program(self) -> str:
+        return f"{self.count}\n"
+
+
+class ExitingCompiler(MockCompiler):
+    """Kills its worker process without answering."""
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        os._exit(3)
+
+
+def program(n: int) -> str:
+    return "".join(f"q{i} (0) q{i + 1} (1) (RIGHT)\n" for i in range(n))
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+def test_fan_out_matches_separate_compiles(mode):
+    code = program(1000)
+    fan_out = VarphiFanOutCompiler([MockCompiler(), StatesCompiler()], mode=mode)
+    outputs = fan_out.compile(code)
+    assert outputs == [MockCompiler().compile(code), StatesCompiler().compile(code)]
+
+    # Every compile starts over with fresh backends
+    assert fan_out.compile_stream(program(3).splitlines(True)) == [
+        "3 transitions",
+        "q0 q1 q2",
+    ]
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+def test_fan_out_resets_backends(mode):
+    backend = ResettingCompiler()
+    fan_out = VarphiFanOutCompiler([backend, ResettingCompiler], mode=mode)
+    assert fan_out.compile(program(1)) == ["1\n", "1\n"]
+    assert fan_out.compile(program(1)) == ["1\n", "1\n"]
+    # The backend instances given are left untouched
+    assert backend.count == 0
+
+
+def test_fan_out_parses_once():
+    class CountingFanOut(VarphiFanOutCompiler):
+        parsed = 0
+
+        def handle_transition(self, transition: VarphiTransition) -> None:
+            self.parsed += 1
+            super().handle_transition(transition)
+
+        def handle_transitions(self, transitions: List[VarphiTransition]) -> None:
+            self.parsed += len(transitions)
+            super().handle_transitions(transitions)
+
+    backends = []
+
+    def factory():
+        backends.append(MockCompiler())
+        return backends[-1]
+
+    fan_out = CountingFanOut([factory, factory, factory])
+    fan_out.compile(program(10))
+    assert fan_out.parsed == 10
+    assert all(len(backend.captured_transitions) == 10 for backend in backends)
+    assert backends[0].captured_transitions[0] is backends[1].captured_transitions[0]
+
+
+def test_fan_out_file(tmp_path):
+    path = tmp_path / "program.varphi"
+    path.write_text(program(5))
+    fan_out = VarphiFanOutCompiler([StatesCompiler()], mode="thread")
+    assert fan_out.compile_file(path) == ["q0 q1 q2 q3 q4"]
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+def test_fan_out_syntax_error_stops_backends(mode):
+    fan_out = VarphiFanOutCompiler([MockCompiler(), MockCompiler()], mode=mode)
+    with pytest.raises(VarphiSyntaxError):
+        fan_out.compile(program(2000) + "garbage\n")
+    assert not [t for t in threading.enumerate() if t.name == "varphi-fan-out"]
+    assert fan_out.compile(program(2)) == ["2 transitions", "2 transitions"]
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+def test_fan_out_backend_error(mode):
+    fan_out = VarphiFanOutCompiler([MockCompiler(), FailingCompiler()], mode=mode)
+    with pytest.raises(RuntimeError, match="backend failure"):
+        fan_out.compile(program(5000))
+    assert not [t for t in threading.enumerate() if t.name == "varphi-fan-out"]
+
+
+def test_fan_out_dead_worker_process():
+    fan_out = VarphiFanOutCompiler([ExitingCompiler()], mode="process", queue_size=1)
+    with pytest.raises(RuntimeError, match="exited with code 3"):
+        fan_out.compile(program(5000))
+
+
+def test_fan_out_rejects_unknown_modes():
+    with pytest.raises(ValueError):
+        VarphiFanOutCompiler([MockCompiler()], mode="fiber")
+
+
+def test_importing_the_package_does_not_import_fan_out():
+    import subprocess
+
+    code = (
+        "import sys, varphi_devkit; "
+        "print([m for m in ('varphi_devkit.fanout', 'multiprocessing', 'queue') if m in sys.modules])"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "[]"
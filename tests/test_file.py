@@ -0,0 +1,87 @@
+import tracemalloc
+import pytest
+from varphi_devkit import (
+    VarphiCompiler,
+    VarphiTransition,
+    VarphiTransitionCache,
+    VarphiSyntaxError,
+)
+from helpers import MockCompiler
+
+
+class CountingCompiler(VarphiCompiler):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        self.count += 1
+
+    def generate_compiled_program(self) -> str:
+        return str(self.count)
+
+
+CODE = """// héllo wörld
+s0 ($x, 1) s1 ($x, BLANK) (LEFT, STAY)\r
+/* a
+   block */ s1 (0, 1) s0 (1, 0) (RIGHT, RIGHT)
+"""
+
+
+@pytest.mark.parametrize("frontend", ["fast", "antlr"])
+def test_file_matches_compile(tmp_path, frontend):
+    path = tmp_path / "program.varphi"
+    path.write_bytes(CODE.encode("utf-8"))
+    expected = MockCompiler()
+    expected.compile(CODE)
+
+    compiler = MockCompiler()
+    compiler.frontend = frontend
+    assert compiler.compile_file(path) == "COMPILATION_SUCCESS"
+    assert compiler.captured_transitions == expected.captured_transitions
+
+
+def test_file_errors_show_the_source_line(tmp_path):
+    path = tmp_path / "program.varphi"
+    path.write_bytes(b"s0 (a) s1 (b) (LEFT)\n\ns1 (a) s2 (b) (LEFT) junk\n")
+    with pytest.raises(VarphiSyntaxError) as exc:
+        MockCompiler().compile_file(str(path))
+    assert exc.value.line == 3
+    assert "s1 (a) s2 (b) (LEFT) junk" in str(exc.value)
+
+
+def test_empty_file_is_an_error(tmp_path):
+    path = tmp_path / "program.varphi"
+    path.write_bytes(b"")
+    with pytest.raises(VarphiSyntaxError):
+        MockCompiler().compile_file(path)
+
+
+def test_file_shares_cache_entries_with_compile(tmp_path):
+    path = tmp_path / "program.varphi"
+    path.write_bytes(CODE.encode("utf-8"))
+    cache = VarphiTransitionCache(tmp_path / "cache")
+
+    compiler = MockCompiler()
+    compiler.cache = cache
+    compiler.compile_file(path)
+    assert cache.get(CODE) == compiler.captured_transitions
+
+
+def test_file_does_not_hold_the_whole_source(tmp_path):
+    path = tmp_path / "program.varphi"
+    with open(path, "w") as f:
+        for i in range(20_000):
+            f.write(f"q{i % 10} (0, $x) q{i % 7} (1, $x) (RIGHT, LEFT)\n")
+
+    def peak(compile):
+        tracemalloc.start()
+        try:
+            compile()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    mapped = peak(lambda: CountingCompiler().compile_file(path))
+    read = peak(lambda: CountingCompiler().compile(path.read_text()))
+    assert read - mapped > path.stat().st_size
@@ -0,0 +1,103 @@
+import pytest
+from typing import List
+from varphi_devkit import (
+    VarphiIncrementalCompiler,
+    VarphiTransition,
+    VarphiGlobalTapeCountError,
+    VarphiSyntaxError,
+)
+import helpers
+
+
+class MockCompiler(helpers.MockCompiler):
+    def generate_compiled_program(self) -> str:
+        return "\n".join(t.current_state for t in self.captured_transitions)
+
+
+class RetractingCompiler(MockCompiler):
+    def __init__(self):
+        super().__init__()
+        self.retracted: List[VarphiTransition] = []
+
+    def retract_transition(self, transition: VarphiTransition) -> None:
+        self.retracted.append(transition)
+        self.captured_transitions.remove(transition)
+
+
+PROGRAM = [
+    "s0 ($x) s1 ($x) (LEFT)",
+    "/* a block",
+    "   comment */ s1 (1) s2 (0) (RIGHT)",
+    "",
+    "s2 (0) s3 (1) (STAY)",
+]
+
+
+def full_compile(lines: List[str]) -> List[VarphiTransition]:
+    compiler = MockCompiler()
+    compiler.compile("\n".join(lines))
+    return compiler.captured_transitions
+
+
+def test_incremental_matches_full_compile():
+    incremental = VarphiIncrementalCompiler(MockCompiler)
+    lines = list(PROGRAM)
+    assert incremental.compile("\n".join(lines)) == "s0\ns1\ns2"
+    assert incremental.transitions == full_compile(lines)
+
+    lines.insert(0, "start (1) s0 (1) (LEFT)")
+    lines[3] = "   comment */ t1 (1) s2 (0) (RIGHT)"
+    assert incremental.compile("\n".join(lines)) == "start\ns0\nt1\ns2"
+    assert incremental.transitions == full_compile(lines)
+    assert incremental.compiler.captured_transitions == full_compile(lines)
+
+
+def test_opening_a_comment_affects_following_lines():
+    incremental = VarphiIncrementalCompiler(MockCompiler)
+    lines = list(PROGRAM)
+    incremental.compile("\n".join(lines))
+
+    lines[3] = "/*"
+    lines.append("*/")
+    incremental.compile("\n".join(lines))
+    assert [t.current_state for t in incremental.transitions] == ["s0", "s1"]
+
+
+def test_retracting_backends_only_see_affected_transitions():
+    incremental = VarphiIncrementalCompiler(RetractingCompiler)
+    lines = list(PROGRAM)
+    incremental.compile("\n".join(lines))
+    backend = incremental.compiler
+
+    lines.insert(0, "// a new comment shifts every line")
+    incremental.compile("\n".join(lines))
+    assert backend.retracted == []
+
+    lines[5] = "s2 (0) s4 (1) (STAY)"
+    incremental.compile("\n".join(lines))
+
+    assert incremental.compiler is backend
+    assert [t.next_state for t in backend.retracted] == ["s3"]
+    assert [t.next_state for t in backend.captured_transitions] == ["s1", "s2", "s4"]
+    assert backend.captured_transitions[-1].line_number == 6
+    assert [t.line_number for t in incremental.transitions] == [2, 4, 6]
+
+
+def test_errors_raise_the_usual_diagnostics():
+    incremental = VarphiIncrementalCompiler(RetractingCompiler)
+    lines = list(PROGRAM)
+    incremental.compile("\n".join(lines))
+
+    lines[4] = "s2 (0, 1) s3 (1, 0) (STAY, STAY)"
+    with pytest.raises(VarphiGlobalTapeCountError) as exc:
+        incremental.compile("\n".join(lines))
+    assert exc.value.line == 5
+
+    lines[4] = "s2 (0) s3 (1)"
+    with pytest.raises(VarphiSyntaxError):
+        incremental.compile("\n".join(lines))
+
+    # Recovering from an error replays everything into a fresh backend
+    lines[4] = "s2 (0) s3 (1) (LEFT)"
+    assert incremental.compile("\n".join(lines)) == "s0\ns1\ns2"
+    assert incremental.compiler.captured_transitions == full_compile(lines)
@@ -0,0 +1,90 @@
+import itertools
+import pytest
+from varphi_devkit import (
+    VarphiSyntaxError,
+    VarphiGlobalTapeCountError,
+    VarphiUndefinedVariableError,
+    iter_transitions,
+)
+from helpers import MockCompiler
+
+CODE = """// A program
+q0 ($x, 1) q1 ($x, BLANK) (RIGHT, LEFT)
+q1 (0, 1) /* spanning
+lines */ q2 (1, 0) (STAY, STAY)
+q2 ($a, $b) q0 ($b, $a) (LEFT, RIGHT)
+"""
+
+
+def test_iter_matches_compile():
+    compiler = MockCompiler()
+    compiler.compile(CODE)
+    assert list(iter_transitions(CODE)) == compiler.captured_transitions
+    assert list(iter_transitions(CODE.splitlines(True))) == (
+        compiler.captured_transitions
+    )
+
+
+def test_iter_keeps_tokens_between_comments():
+    # A line ending a block comment and starting another one, with tokens in between
+    valid = "s0 (0, 1) s1 ( /* a\nb */ 1 , /* c\nd */ 0 ) (LEFT, RIGHT)\n"
+    [transition] = iter_transitions(valid)
+    assert transition.write_symbols == ("1", "0")
+
+    invalid = "s0 (0) s1 ( /* a\nb */ 1 , /* c\nd */ 0 ) (LEFT)\n"
+    with pytest.raises(VarphiSyntaxError) as exc:
+        list(iter_transitions(invalid))
+    assert exc.value.line == 1
+    with pytest.raises(VarphiSyntaxError):
+        MockCompiler().compile(invalid)
+
+
+def test_iter_from_file(tmp_path):
+    path = tmp_path / "program.varphi"
+    path.write_text(CODE)
+    with open(path, newline="\n") as f:
+        assert [t.line_number for t in iter_transitions(f)] == [2, 3, 5]
+
+
+def test_iter_is_lazy():
+    consumed = []
+
+    def lines():
+        for i in range(1000):
+            consumed.append(i)
+            yield f"q{i} (0) q{i + 1} (1) (RIGHT)\n"
+        yield "garbage\n"
+
+    first = list(itertools.islice(iter_transitions(lines()), 3))
+    assert [t.current_state for t in first] == ["q0", "q1", "q2"]
+    assert len(consumed) <= 4
+
+    # Errors past the point where the consumer stops are never reached
+    states = itertools.takewhile(
+        lambda t: t.current_state != "q500",
+        iter_transitions(lines()),
+    )
+    assert sum(1 for _ in states) == 500
+
+
+def test_iter_raises_diagnostics_when_reached():
+    transitions = iter_transitions(
+        "q0 (0) q1 (1) (RIGHT)\nq1 ($x) q2 ($y) (LEFT)\nq2 (0) q3 (1) (LEFT)\n"
+    )
+    assert next(transitions).current_state == "q0"
+    with pytest.raises(VarphiUndefinedVariableError) as exc:
+        next(transitions)
+    assert exc.value.line == 2
+    assert exc.value.source_line == "q1 ($x) q2 ($y) (LEFT)"
+
+
+def test_iter_enforces_global_tape_count():
+    with pytest.raises(VarphiGlobalTapeCountError):
+        list(
+            iter_transitions("q0 (0) q1 (1) (RIGHT)\nq1 (0, 0) q2 (1, 1) (LEFT, LEFT)")
+        )
+
+
+def test_iter_requires_a_transition():
+    with pytest.raises(VarphiSyntaxError):
+        list(iter_transitions("// nothing here\n"))
@@ -0,0 +1,195 @@
+import pytest
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from varphi_devkit import (
+    VarphiInterpreter,
+    VarphiMachine,
+    VarphiTape,
+    VarphiTransition,
+    BLANK,
+)
+
+# Appends a 1 to a unary number
+UNARY_INCREMENT = """q0 (1) q0 (1) (RIGHT)
+q0 (BLANK) qh (1) (STAY)
+"""
+
+# Increments a binary number
+BINARY_INCREMENT = """right (0) right (0) (RIGHT)
+right (1) right (1) (RIGHT)
+right (BLANK) carry (BLANK) (LEFT)
+carry (1) carry (0) (LEFT)
+carry (0) done (1) (STAY)
+carry (BLANK) done (1) (STAY)
+"""
+
+# Copies tape 1 to tape 2, up to the first blank (variables match BLANK too, so it must be matched first)
+COPY = """q0 (BLANK, BLANK) done (BLANK, BLANK) (STAY, STAY)
+q0 ($x, BLANK) q0 ($x, $x) (RIGHT, RIGHT)
+"""
+
+
+def run(program, tapes=None, **kwargs):
+    return VarphiInterpreter().run(program, tapes, **kwargs)
+
+
+def test_unary_increment():
+    result = run(UNARY_INCREMENT, ["111"])
+    assert result.halted
+    assert result.state == "qh"
+    assert result.steps == 4
+    assert result.tapes[0].contents() == ("1", "1", "1", "1")
+    assert result.tapes[0].head == 3
+
+
+def test_heads_move_left_of_the_input():
+    result = run(BINARY_INCREMENT, ["11"])
+    assert result.state == "done"
+    assert result.tapes[0].contents() == ("1", "0", "0")
+    assert result.tapes[0].head == -1
+    assert result.tapes[0][-1] == "1"
+    assert run(BINARY_INCREMENT, ["1011"]).tapes[0].contents() == tuple("1100")
+
+
+def test_variables_are_written_back():
+    result = run(COPY, [["a", "b", BLANK, "c"], []])
+    assert result.halted
+    assert result.tapes[1].contents() == ("a", "b")
+    assert result.tapes[0].contents() == ("a", "b", BLANK, "c")
+
+
+def test_variables_match_blank():
+    result = run("q0 ($x) q1 ($x) (RIGHT)\n")
+    assert result.halted
+    assert result.state == "q1"
+    assert result.tapes[0].contents() == ()
+
+
+def test_repeated_variables_only_match_equal_symbols():
+    program = """q0 ($x, $x) same ($x, $x) (STAY, STAY)
+q0 ($x, $y) different ($y, $x) (STAY, STAY)
+"""
+    assert run(program, [["1"], ["1"]]).state == "same"
+    result = run(program, [["0"], ["1"]])
+    assert result.state == "different"
+    assert [tape.read() for tape in result.tapes] == ["1", "0"]
+
+
+def test_first_defined_transition_applies():
+    program = """q0 ($x, 1) a (0, 0) (STAY, STAY)
+q0 (1, $x) b (0, 0) (STAY, STAY)
+q0 (1, 1) c (0, 0) (STAY, STAY)
+"""
+    assert run(program, [["1"], ["1"]]).state == "a"
+    assert run(program, [["1"], ["0"]]).state == "b"
+    assert run(program, [["0"], ["0"]]).state == "q0"
+
+
+def test_step_budget():
+    program = "q0 ($x) q0 ($x) (RIGHT)\n"
+    result = run(program, max_steps=1000)
+    assert not result.halted
+    assert result.steps == 1000
+    assert result.tapes[0].head == 1000
+
+    result = run(COPY, [["1"] * 10, []], max_steps=4)
+    assert not result.halted
+    assert [tape.head for tape in result.tapes] == [4, 4]
+    assert result.tapes[1].contents() == ("1",) * 4
+
+    # A machine halting exactly on its budget halted
+    result = run(UNARY_INCREMENT, ["111"], max_steps=4)
+    assert result.halted
+    assert run(UNARY_INCREMENT, ["111"], max_steps=3).steps == 3
+    with pytest.raises(ValueError):
+        run(program, max_steps=-1)
+
+
+def test_machines_can_run_several_times():
+    interpreter = VarphiInterpreter()
+    assert interpreter.compile(UNARY_INCREMENT) == (
+        "2 transitions, 1 states, 1 tapes, initial state q0\n"
+    )
+    machine = interpreter.machine
+    assert machine.run(["1"]).tapes[0].contents() == ("1", "1")
+    assert machine.run(["11"]).tapes[0].contents() == ("1", "1", "1")
+    assert machine.run([[]], state="qh").steps == 0
+    with pytest.raises(ValueError):
+        machine.run([[], []])
+
+
+def test_machines_from_transitions():
+    def transition(current, read, line):
+        return VarphiTransition(current, (read,), "h", ("1",), ("STAY",), line)
+
+    # Added out of order: the transition defined first still applies
+    machine = VarphiMachine(1, [transition("q0", "$1", 2), transition("q0", "0", 1)])
+    assert machine.find_transition("q0", ("0",)).line_number == 1
+    assert machine.find_transition("q0", ("1",)).line_number == 2
+    assert machine.find_transition("h", ("1",)) is None
+    with pytest.raises(ValueError):
+        machine.add(
+            VarphiTransition("q0", ("0", "0"), "h", ("0", "0"), ("STAY", "STAY"), 3)
+        )
+
+
+def test_tapes():
+    tape = VarphiTape(["0", BLANK, "1", BLANK])
+    assert tape.contents() == ("0", BLANK, "1")
+    assert tape[-5] == BLANK
+    assert VarphiTape().contents() == ()
+
+
+def test_compact_transitions_are_rejected():
+    interpreter = VarphiInterpreter()
+    interpreter.compact = True
+    with pytest.raises(ValueError):
+        interpreter.compile(UNARY_INCREMENT)
+
+
+def test_concurrent_runs_by_one_interpreter():
+    interpreter = VarphiInterpreter()
+    programs = [
+        f"q0 (1) q0 (1) (RIGHT)\nq0 (BLANK) h{i} (BLANK) (STAY)\n" for i in range(8)
+    ]
+
+    def run_program(i):
+        return [interpreter.run(programs[i], ["1" * i]).state for _ in range(20)]
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(run_program, range(8)))
+    assert results == [[f"h{i}"] * 20 for i in range(8)]
+
+
+def test_build_returns_the_machine():
+    machine = VarphiInterpreter().build(UNARY_INCREMENT)
+    assert machine.transition_count == 2
+    assert machine.initial_state == "q0"
+
+
+def test_memo_is_bounded():
+    # This machine goes through 10 configurations
+    program = "q0 ($x) q0 ($x) (RIGHT)\n"
+    machine = VarphiInterpreter().build(program)
+    machine.memo_size = 4
+    result = machine.run([[str(i % 10) for i in range(1000)]], max_steps=1000)
+    assert result.steps == 1000
+    assert len(machine._one_tape_steps) <= 4
+
+    copy = VarphiInterpreter().build(COPY)
+    copy.memo_size = 4
+    result = copy.run([list("0123456789"), []])
+    assert result.tapes[1].contents() == tuple("0123456789")
+    assert len(copy._steps) <= 4
+    with pytest.raises(ValueError):
+        VarphiMachine(1, memo_size=0)
+
+
+def test_importing_the_package_does_not_import_the_interpreter():
+    import subprocess
+
+    code = "import sys, varphi_devkit; print('varphi_devkit.machine' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "False"
@@ -0,0 +1,177 @@
+import varphi_devkit.observe as observe
+import pytest
+from varphi_devkit import (
+    VarphiCompileObserver,
+    VarphiCompileStats,
+    VarphiSyntaxError,
+    BLANK,
+)
+import helpers
+
+
+class MockCompiler(helpers.MockCompiler):
+    def generate_compiled_program(self) -> str:
+        return f"{len(self.captured_transitions)} transitions\n"
+
+
+class RecordingObserver(VarphiCompileObserver):
+    def __init__(self):
+        self.events = []
+
+    def compile_started(self, stats):
+        self.events.append(("compile_started",))
+
+    def phase_started(self, phase, stats):
+        self.events.append(("phase_started", phase))
+
+    def phase_finished(self, phase, seconds, stats):
+        assert seconds >= 0
+        self.events.append(("phase_finished", phase))
+
+    def compile_finished(self, stats):
+        self.events.append(("compile_finished",))
+
+    def compile_failed(self, stats, error):
+        self.events.append(("compile_failed", type(error).__name__))
+
+    def phases(self):
+        return [event[1] for event in self.events if event[0] == "phase_started"]
+
+
+PROGRAM = """q0 ($x, 0) q1 ($x, 1) (RIGHT, STAY)
+// a comment
+q1 (1, BLANK) q2 (0, 0) (LEFT, RIGHT)
+q2 ($y, $z) q0 ($z, $y) (STAY, STAY)
+"""
+
+
+def observed(frontend="fast", antlr_mode="treeless"):
+    compiler = MockCompiler()
+    compiler.frontend = frontend
+    compiler.antlr_mode = antlr_mode
+    compiler.observer = RecordingObserver()
+    return compiler
+
+
+def check_counts(stats: VarphiCompileStats):
+    assert stats.transitions == 3
+    assert stats.states == {"q0", "q1", "q2"}
+    assert stats.symbols == {"$1", "$2", "0", "1", BLANK}
+    assert stats.tape_count == 2
+    assert stats.seconds > 0
+    assert sum(stats.phase_seconds.values()) <= stats.seconds
+
+
+def test_fast_frontend_phases_and_counters():
+    compiler = observed()
+    assert compiler.compile(PROGRAM) == "3 transitions\n"
+    stats = compiler.stats
+    check_counts(stats)
+    assert stats.tokens == 0
+    assert set(stats.phase_seconds) == {"scan", "handle", "generate"}
+    events = compiler.observer.events
+    assert events[0] == ("compile_started",)
+    assert events[-1] == ("compile_finished",)
+    assert compiler.observer.phases() == ["scan", "handle", "generate"]
+
+
+@pytest.mark.parametrize("antlr_mode", ["treeless", "tree"])
+def test_antlr_frontend_phases_and_counters(antlr_mode):
+    compiler = observed("antlr", antlr_mode)
+    compiler.compile(PROGRAM)
+    stats = compiler.stats
+    check_counts(stats)
+    assert stats.tokens > 3 * 14
+    assert set(stats.phase_seconds) == {"lex", "parse", "walk", "handle", "generate"}
+    assert compiler.observer.phases() == ["lex", "parse", "walk", "generate"]
+
+
+def test_stream_and_file_compiles_are_observed(tmp_path):
+    compiler = observed()
+    compiler.compile_stream(PROGRAM.splitlines(True))
+    check_counts(compiler.stats)
+    assert compiler.observer.phases() == ["scan", "generate"]
+    assert set(compiler.stats.phase_seconds) == {"scan", "handle", "generate"}
+
+    path = tmp_path / "program.varphi"
+    path.write_text(PROGRAM)
+    compiler.compile_file(path)
+    check_counts(compiler.stats)
+
+    compiler.compile_to(PROGRAM, tmp_path / "out.txt")
+    check_counts(compiler.stats)
+
+
+def test_each_compile_has_its_own_stats():
+    compiler = observed()
+    compiler.compile(PROGRAM)
+    first = compiler.stats
+    compiler.compile("q0 (0) q1 (1) (RIGHT)\n")
+    assert compiler.stats is not first
+    assert compiler.stats.transitions == 1
+    assert compiler.stats.tape_count == 1
+    assert first.transitions == 3
+
+
+def test_phase_time_excludes_nested_phases(monkeypatch):
+    # A clock only moving forward while the backend handles transitions (1s each) and generates its output (10s)
+    class Clock:
+        now = 0.0
+
+        @classmethod
+        def perf_counter(cls) -> float:
+            return cls.now
+
+    monkeypatch.setattr(observe, "time", Clock)
+
+    class SlowCompiler(MockCompiler):
+        def handle_transition(self, transition):
+            super().handle_transition(transition)
+            Clock.now += 1
+
+        def generate_compiled_program(self):
+            Clock.now += 10
+            return ""
+
+    compiler = SlowCompiler()
+    compiler.observer = VarphiCompileObserver()
+    compiler.compile_stream(PROGRAM.splitlines(True))
+    phases = compiler.stats.phase_seconds
+    assert phases["handle"] == len(compiler.captured_transitions) > 0
+    assert phases["generate"] == 10
+    # The phases the others are nested in get none of their time
+    assert {name: seconds for name, seconds in phases.items() if seconds} == {
+        "handle": phases["handle"],
+        "generate": 10,
+    }
+
+
+def test_failed_compiles_are_reported():
+    compiler = observed()
+    with pytest.raises(VarphiSyntaxError):
+        compiler.compile(PROGRAM + "q0 (0, 1) q1 (1) (RIGHT, LEFT)\n")
+    events = compiler.observer.events
+    assert events[-1] == (
+        "compile_failed",
+        "VarphiTransitionInconsistentTapeCountError",
+    )
+    assert compiler.stats.seconds > 0
+    assert compiler.stats._phases == []
+
+
+def test_stats_as_dict():
+    compiler = observed()
+    compiler.compile(PROGRAM)
+    result = compiler.stats.as_dict()
+    assert result["transitions"] == 3
+    assert result["states"] == 3
+    assert result["symbols"] == 5
+    assert result["tape_count"] == 2
+    assert set(result["phase_seconds"]) == {"scan", "handle", "generate"}
+
+
+def test_no_stats_without_an_observer():
+    compiler = MockCompiler()
+    compiler.compile(PROGRAM)
+    assert compiler.stats is None
+    assert compiler.session.stats is None
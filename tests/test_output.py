@@ -0,0 +1,144 @@
+import io
+import os
+import tracemalloc
+import pytest
+from typing import TextIO
+from varphi_devkit import (
+    VarphiCompiler,
+    VarphiCompileSession,
+    VarphiFanOutCompiler,
+    VarphiIncrementalCompiler,
+    VarphiTransition,
+    VarphiSyntaxError,
+)
+import helpers
+
+
+class MockCompiler(helpers.MockCompiler):
+    def generate_compiled_program(self) -> str:
+        return f"{len(self.captured_transitions)} transitions\n"
+
+
+class StreamingCompiler(VarphiCompiler):
+    """Writes a line per transition as it arrives, and a summary at the end."""
+
+    def init_session(self, session: VarphiCompileSession) -> None:
+        session.count = 0
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        self.session.count += 1
+        self.output.write(
+            f"{transition.current_state} -> {transition.next_state} "
+            f"({', '.join(transition.read_symbols)})\n"
+        )
+
+    def write_compiled_program(self, output: TextIO) -> None:
+        output.write(f"// {self.session.count} transitions\n")
+
+
+class SummaryCompiler(VarphiCompiler):
+    """Only writes its output at the end, one chunk at a time."""
+
+    def init_session(self, session: VarphiCompileSession) -> None:
+        session.states = []
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        self.session.states.append(transition.current_state)
+
+    def retract_transition(self, transition: VarphiTransition) -> None:
+        self.session.states.remove(transition.current_state)
+
+    def write_compiled_program(self, output: TextIO) -> None:
+        output.writelines(f"{state}\n" for state in self.session.states)
+
+
+def program(n: int) -> str:
+    return "".join(f"q{i} ($x, 0) q{i + 1} (1, $x) (RIGHT, STAY)\n" for i in range(n))
+
+
+def expected(n: int) -> str:
+    lines = [f"q{i} -> q{i + 1} ($1, 0)\n" for i in range(n)]
+    return "".join(lines) + f"// {n} transitions\n"
+
+
+@pytest.mark.parametrize("frontend", ["fast", "antlr"])
+def test_compile_to_matches_compile(frontend, tmp_path):
+    compiler = StreamingCompiler()
+    compiler.frontend = frontend
+    assert compiler.compile(program(3)) == expected(3)
+    assert compiler.compile_stream(program(2).splitlines(True)) == expected(2)
+
+    path = tmp_path / "out.txt"
+    compiler.compile_to(program(3), path)
+    assert path.read_text() == expected(3)
+
+    sink = io.StringIO()
+    compiler.compile_to(program(4).splitlines(True), sink)
+    assert sink.getvalue() == expected(4)
+
+
+def test_compile_to_with_string_backends(tmp_path):
+    path = tmp_path / "out.txt"
+    MockCompiler().compile_to(program(5), str(path))
+    assert path.read_text() == "5 transitions\n"
+
+
+def test_compile_to_keeps_previous_output_on_errors(tmp_path):
+    path = tmp_path / "out.txt"
+    path.write_text("previous\n")
+    with pytest.raises(VarphiSyntaxError):
+        StreamingCompiler().compile_to(program(3) + "garbage\n", path)
+    assert path.read_text() == "previous\n"
+    assert os.listdir(tmp_path) == ["out.txt"]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_compile_to_outputs_follow_the_umask(tmp_path):
+    umask = os.umask(0o022)
+    os.umask(umask)
+    path = tmp_path / "out.txt"
+    MockCompiler().compile_to(program(1), path)
+    assert path.stat().st_mode & 0o777 == 0o666 & ~umask
+
+
+def test_fan_out_compilers_reject_compile_to(tmp_path):
+    compiler = VarphiFanOutCompiler([MockCompiler(), StreamingCompiler()])
+    with pytest.raises(NotImplementedError):
+        compiler.compile_to(program(1), tmp_path / "out.txt")
+    assert os.listdir(tmp_path) == []
+    assert compiler.compile(program(1)) == ["1 transitions\n", expected(1)]
+
+
+def test_generated_program_can_be_generated_again():
+    incremental = VarphiIncrementalCompiler(SummaryCompiler)
+    assert incremental.compile(program(2)) == "q0\nq1\n"
+    assert incremental.compile(program(3)) == "q0\nq1\nq2\n"
+
+
+def test_compilers_must_generate_programs():
+    class SilentCompiler(VarphiCompiler):
+        def handle_transition(self, transition: VarphiTransition) -> None:
+            pass
+
+    with pytest.raises(NotImplementedError):
+        SilentCompiler().compile(program(1))
+
+
+def test_compile_to_memory_is_bounded(tmp_path):
+    def lines(n):
+        for i in range(n):
+            yield f"q{i} ($x, 0) q{i + 1} (1, $x) (RIGHT, STAY)\n"
+
+    def peak(n):
+        compiler = StreamingCompiler()
+        tracemalloc.start()
+        try:
+            compiler.compile_to(lines(n), tmp_path / "out.txt")
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    # Measured first, so that memory allocated once (e.g. by caches) counts here
+    small = peak(2_000)
+    # Memory growing with the number of lines would take about 50 times as much
+    assert peak(100_000) < 3 * small
@@ -0,0 +1,60 @@
+import pytest
+from varphi_devkit import VarphiGlobalTapeCountError, VarphiUndefinedVariableError
+import varphi_devkit.parallel
+from varphi_devkit.parallel import split_program
+from helpers import MockCompiler
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(varphi_devkit.parallel, "MIN_CHUNK_SIZE", 64)
+
+
+def make_program(n: int) -> str:
+    lines = []
+    for i in range(n):
+        lines.append(f"q{i} ($x, 1) q{i + 1} ($x, BLANK) (LEFT, STAY)")
+        if i % 7 == 0:
+            lines.append("/* a block\n   comment\n */ // and a line comment /*")
+    return "\n".join(lines) + "\n"
+
+
+def test_split_program_avoids_block_comments():
+    program = "a\n/* x\ny\nz */\nb\n" * 10
+    chunks = split_program(program, 8)
+    assert "".join(chunk for chunk, _ in chunks) == program
+    assert len(chunks) > 1
+    offset = 0
+    for chunk, first_line in chunks:
+        assert chunk.count("/*") == chunk.count("*/")
+        assert first_line == program.count("\n", 0, offset) + 1
+        offset += len(chunk)
+
+
+def test_parallel_compile_matches_sequential():
+    program = make_program(200)
+    sequential = MockCompiler()
+    sequential.compile(program)
+
+    parallel = MockCompiler()
+    assert parallel.compile(program, workers=3) == "COMPILATION_SUCCESS"
+    assert parallel.captured_transitions == sequential.captured_transitions
+
+
+@pytest.mark.parametrize(
+    "bad_line, error",
+    [
+        ("s0 (a, b, c) s1 (a, b, c) (LEFT, LEFT, LEFT)", VarphiGlobalTapeCountError),
+        ("s0 ($x, 1) s1 ($y, 1) (LEFT, LEFT)", VarphiUndefinedVariableError),
+    ],
+)
+def test_parallel_compile_reports_errors_like_sequential(bad_line, error):
+    program = make_program(100) + bad_line + "\n" + make_program(100)
+    with pytest.raises(error) as sequential:
+        MockCompiler().compile(program)
+
+    compiler = MockCompiler()
+    with pytest.raises(error) as parallel:
+        compiler.compile(program, workers=2)
+    assert parallel.value.line == sequential.value.line
+    assert parallel.value.msg == sequential.value.msg
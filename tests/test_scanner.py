@@ -0,0 +1,154 @@
+import pytest
+from typing import List
+from varphi_devkit import (
+    VarphiTransition,
+    VarphiSyntaxError,
+    VarphiGlobalTapeCountError,
+    VarphiUndefinedVariableError,
+    VarphiTransitionInconsistentTapeCountError,
+)
+from varphi_devkit.scanner import scan
+from helpers import MockCompiler
+
+
+def compile_with(frontend: str, code: str) -> List[VarphiTransition]:
+    compiler = MockCompiler()
+    compiler.frontend = frontend
+    compiler.compile(code)
+    return compiler.captured_transitions
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "s0 ($x, $y) s1 ($y, $x) (LEFT, RIGHT)",
+        "s0(a,BLANK)s1(BLANK,b)(STAY,STAY)",
+        "\n\n  LEFT (1) BLANK (0) (RIGHT) // trailing comment\r\n\r\nq_1 (0) q_2 (1) (LEFT)\n",
+        "s0 (a) /* inline */ s1 (b) (LEFT)",
+        "/* leading\n comment */ s0 (a) s1 (b) (LEFT)\ns1 (b) /* spans\n\n lines */ s2 (a) (RIGHT)",
+        "s0 (a) s1 (b) (LEFT) // see /* not a block comment\ns1 (b) s0 (a) (STAY)",
+    ],
+)
+def test_fast_frontend_matches_antlr(code):
+    """The hand-written scanner must produce exactly the transitions ANTLR does."""
+    assert compile_with("fast", code) == compile_with("antlr", code)
+
+
+def test_multiline_comment_line_numbers():
+    """A transition's line number is the line of its first token."""
+    code = "/* a\nb */ s0 (a) s1 (b) (LEFT)\n\ns1 (b) /*\n*/ s0 (a) (LEFT)"
+    transitions = compile_with("fast", code)
+    assert [t.line_number for t in transitions] == [2, 4]
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "s0 (ab) s1 (b) (LEFT)",
+        "s0 (a) s1 (b) (LEFT) s1 (b) s2 (a) (LEFT)",
+        "s0 (a) s1 (b) (UP)",
+        "s0 () s1 () ()",
+        "s0 (a) s1 (b) (LEFT)\r",
+        "s0 (a) s1 (b) /* unterminated (LEFT)",
+        "",
+    ],
+)
+def test_scanner_rejects_invalid_lines(code):
+    """Invalid input falls back to ANTLR, which raises the rich diagnostic."""
+    with pytest.raises(VarphiSyntaxError):
+        compile_with("fast", code)
+
+
+def test_scan_reports_source_of_failed_lines():
+    lines = ["s0 (a) s1 (b) (LEFT)\n", "\n", "s1 (a /*\n", "*/ ) s0 (b) (?)\n"]
+    results = list(scan(lines))
+    assert results[0][1:] == (1, "s0 (a) s1 (b) (LEFT)")
+    assert results[1] == (None, 3, "s1 (a /*\n*/ ) s0 (b) (?)")
+
+
+# A line ending a block comment and starting another one, with tokens in between
+INTERLEAVED_COMMENTS = (
+    "s0 (0{reads}) s1 ( /* a\nb */ 1 , /* c\nd */ 0 ) (LEFT{shifts})\n"
+)
+
+
+def test_scan_keeps_tokens_between_comments():
+    code = INTERLEAVED_COMMENTS.format(reads="", shifts="")
+    [(transition, first_line, source)] = list(scan(code.splitlines(True)))
+    assert transition == ("s0", ("0",), "s1", ("1", "0"), ("LEFT",), 1)
+    assert first_line == 1
+    assert source == code.rstrip("\n")
+
+
+@pytest.mark.parametrize("frontend", ["fast", "antlr"])
+def test_interleaved_multiline_comments(frontend):
+    valid = INTERLEAVED_COMMENTS.format(reads=", 1", shifts=", RIGHT")
+    [transition] = compile_with(frontend, valid)
+    assert transition.read_symbols == ("0", "1")
+    assert transition.write_symbols == ("1", "0")
+
+    compiler = MockCompiler()
+    compiler.frontend = frontend
+    with pytest.raises(VarphiTransitionInconsistentTapeCountError) as exc:
+        compiler.compile_stream(
+            INTERLEAVED_COMMENTS.format(reads="", shifts="").splitlines(True)
+        )
+    assert exc.value.line == 1
+    assert compiler.captured_transitions == []
+
+
+def test_semantic_errors_fall_back_before_dispatch():
+    """Errors found by the fast front end are re-raised by ANTLR, with identical handle_transition() calls."""
+    code = "s0 (a) s1 (b) (LEFT)\ns1 (a, b) s2 (b, a) (LEFT, LEFT)"
+    compiler = MockCompiler()
+    with pytest.raises(VarphiGlobalTapeCountError) as exc:
+        compiler.compile(code)
+    assert exc.value.line == 2
+    assert len(compiler.captured_transitions) == 1
+
+    with pytest.raises(VarphiUndefinedVariableError):
+        MockCompiler().compile("s0 ($x) s1 ($y) (LEFT)")
+
+
+def test_listener_overrides_use_antlr():
+    class ContextCompiler(MockCompiler):
+        def enterTransition(self, ctx):
+            self.contexts = getattr(self, "contexts", 0) + 1
+            super().enterTransition(ctx)
+
+    compiler = ContextCompiler()
+    compiler.compile("s0 (a) s1 (b) (LEFT)")
+    assert compiler.contexts == 1
+    assert len(compiler.captured_transitions) == 1
+
+
+def test_listener_overrides_can_call_super():
+    class ContextCompiler(MockCompiler):
+        def enterProgram(self, ctx):
+            self.callbacks = ["enterProgram"]
+            super().enterProgram(ctx)
+
+        def exitTransition(self, ctx):
+            self.callbacks.append("exitTransition")
+            super().exitTransition(ctx)
+
+        def exitSymbol(self, ctx):
+            self.callbacks.append("exitSymbol")
+            super().exitSymbol(ctx)
+
+    compiler = ContextCompiler()
+    compiler.compile("s0 (a) s1 (b) (LEFT)")
+    assert compiler.callbacks == [
+        "enterProgram",
+        "exitSymbol",
+        "exitSymbol",
+        "exitTransition",
+    ]
+    assert len(compiler.captured_transitions) == 1
+
+    # Every callback of the generated listener is available
+    from varphi_devkit.antlr import VarphiListener
+
+    for name in dir(VarphiListener):
+        if name.startswith(("enter", "exit", "visit")):
+            assert callable(getattr(MockCompiler, name))
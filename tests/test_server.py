@@ -0,0 +1,153 @@
+import json
+import os
+import pytest
+import threading
+import urllib.request
+from varphi_devkit import VarphiTransition, VarphiSyntaxError
+from varphi_devkit.cli import load_backend, main
+from varphi_devkit.server import (
+    VarphiCompileClient,
+    VarphiCompileServer,
+    VarphiDaemonError,
+    format_prometheus,
+    serve_metrics,
+)
+import helpers
+
+
+class MockCompiler(helpers.MockCompiler):
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        if transition.current_state == "crash":
+            raise RuntimeError("backend failure")
+        super().handle_transition(transition)
+
+    def generate_compiled_program(self) -> str:
+        return " ".join(t.current_state for t in self.captured_transitions)
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = VarphiCompileServer(str(tmp_path / "d.sock"), MockCompiler, cache_size=2)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_compile(server):
+    with VarphiCompileClient(server.server_address) as client:
+        client.ping()
+        assert client.compile("a (0) b (1) (LEFT)\nb (0) a (1) (LEFT)") == "a b"
+        assert client.compile("a (0) b (1) (LEFT)\nb (0) a (1) (LEFT)") == "a b"
+
+
+def test_diagnostics_are_rebuilt(server):
+    program = "a (0) b (1) (LEFT)\nb ($x) a ($y) (LEFT)"
+    with pytest.raises(VarphiSyntaxError) as local:
+        MockCompiler().compile(program)
+    with VarphiCompileClient(server.server_address) as client:
+        with pytest.raises(VarphiSyntaxError) as remote:
+            client.compile(program)
+    assert type(remote.value) is type(local.value)
+    assert str(remote.value) == str(local.value)
+
+
+def test_backend_failures(server):
+    with VarphiCompileClient(server.server_address) as client:
+        with pytest.raises(VarphiDaemonError, match="backend failure"):
+            client.compile("crash (0) b (1) (LEFT)")
+        # The connection is still usable
+        assert client.compile("a (0) b (1) (LEFT)") == "a"
+
+
+def test_metrics_and_cache(server):
+    programs = [f"q{i} (0) q (1) (LEFT)" for i in range(3)]
+    with VarphiCompileClient(server.server_address) as client:
+        for program in programs + programs[2:] + ["q (0) q ($x) (LEFT)"]:
+            try:
+                client.compile(program)
+            except VarphiSyntaxError:
+                pass
+        metrics = client.metrics()
+    assert metrics["requests"] == 5
+    assert metrics["errors"] == 1
+    assert metrics["cache_hits"] == 1
+    assert metrics["cache_hit_rate"] == 0.2
+    assert set(metrics["latency_seconds"]) == {"0.5", "0.9", "0.99"}
+    # The cache holds the two most recent programs
+    assert len(server._cache) == 2
+
+    text = format_prometheus(metrics)
+    assert "varphi_devkit_requests_total 5\n" in text
+    assert 'varphi_devkit_latency_seconds{quantile="0.99"}' in text
+
+
+def test_metrics_over_http(server):
+    http_server = serve_metrics(server, "127.0.0.1", 0)
+    try:
+        url = f"http://127.0.0.1:{http_server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert b"varphi_devkit_requests_total 0" in response.read()
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+
+
+def test_stale_sockets_are_replaced(tmp_path, server):
+    path = str(tmp_path / "d.sock")
+    with pytest.raises(OSError):
+        VarphiCompileServer(path, MockCompiler)
+
+    stale = str(tmp_path / "stale.sock")
+    VarphiCompileServer(stale, MockCompiler).socket.close()
+    assert os.path.exists(stale)
+    VarphiCompileServer(stale, MockCompiler).server_close()
+    assert not os.path.exists(stale)
+
+
+def test_protocol_errors(server):
+    with VarphiCompileClient(server.server_address) as client:
+        with pytest.raises(VarphiDaemonError):
+            client._request({"op": "bogus"})
+        client._file.write(b"not json\n")
+        client._file.flush()
+        assert json.loads(client._file.readline())["ok"] is False
+        # The connection survives programs that cannot be compiled
+        for program in [None, 42, ["a (0) b (1) (LEFT)"], "a (0) b (1) (LEFT)\ud800"]:
+            with pytest.raises(VarphiDaemonError):
+                client._request({"op": "compile", "program": program})
+        assert client.compile("a (0) b (1) (LEFT)") == "a"
+
+
+def test_cli(server, tmp_path, capsys):
+    good = tmp_path / "good.varphi"
+    good.write_text("a (0) b (1) (LEFT)\n")
+    bad = tmp_path / "bad.varphi"
+    bad.write_text("a (0) b (1)\n")
+    socket_args = ["--socket", server.server_address]
+
+    assert main(["compile", *socket_args, str(good)]) == 0
+    assert capsys.readouterr().out == "a"
+    assert main(["compile", *socket_args, str(good), str(bad)]) == 1
+    assert "bad.varphi" in capsys.readouterr().err
+
+    crash = tmp_path / "crash.varphi"
+    crash.write_text("crash (0) b (1) (LEFT)\n")
+    assert main(["compile", *socket_args, str(crash), str(good)]) == 1
+    output = capsys.readouterr()
+    assert output.out == "a"
+    assert "crash.varphi: RuntimeError: backend failure" in output.err
+
+    assert main(["metrics", *socket_args, "--format", "json"]) == 0
+    assert json.loads(capsys.readouterr().out)["requests"] == 5
+    assert main(["metrics", "--socket", str(tmp_path / "missing.sock")]) == 2
+
+
+def test_load_backend():
+    assert load_backend("test_server:MockCompiler") is MockCompiler
+    with pytest.raises(ValueError):
+        load_backend("test_server")
+    with pytest.raises(ValueError):
+        load_backend("test_server:pytest")
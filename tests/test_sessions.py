@@ -0,0 +1,178 @@
+import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from varphi_devkit import (
+    VarphiCompiler,
+    VarphiCompilerConfig,
+    VarphiCompileSession,
+    VarphiIncrementalCompiler,
+    VarphiTransition,
+    VarphiSyntaxError,
+)
+from varphi_devkit.antlr import VarphiParserPool
+from helpers import MockCompiler
+
+
+class SessionCompiler(VarphiCompiler):
+    """Keeps all of its per-compile state in sessions."""
+
+    def init_session(self, session: VarphiCompileSession) -> None:
+        session.states = []
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        self.session.states.append(transition.current_state)
+
+    def retract_transition(self, transition: VarphiTransition) -> None:
+        self.session.states.remove(transition.current_state)
+
+    def generate_compiled_program(self) -> str:
+        return " ".join(self.session.states)
+
+
+def program(prefix: str, n: int) -> str:
+    return "".join(f"{prefix}{i} (0) {prefix}{i + 1} (1) (RIGHT)\n" for i in range(n))
+
+
+def expected(prefix: str, n: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def test_config_is_frozen_per_compile():
+    compiler = MockCompiler()
+    assert compiler.config == VarphiCompilerConfig()
+    compiler.frontend = "antlr"
+    assert compiler.config.frontend == "antlr"
+    with pytest.raises(AttributeError):
+        compiler.config.frontend = "fast"
+
+    compiler.frontend = "bogus"
+    with pytest.raises(ValueError):
+        compiler.config
+
+
+def test_config_changes_do_not_affect_compiles_in_progress():
+    class SwitchingCompiler(MockCompiler):
+        def handle_transition(self, transition: VarphiTransition) -> None:
+            self.compact = True
+            super().handle_transition(transition)
+
+    compiler = SwitchingCompiler()
+    compiler.compile(program("q", 3))
+    assert all(type(t) is VarphiTransition for t in compiler.captured_transitions)
+    assert compiler.session.config.compact is False
+
+
+def test_session_state():
+    compiler = SessionCompiler()
+    assert compiler.session is None
+    assert compiler.compile(program("q", 3)) == "q0 q1 q2"
+    first = compiler.session
+    assert first.compiler is compiler
+    assert first.expected_tape_count == 1
+
+    assert compiler.compile_stream(program("r", 2).splitlines(True)) == "r0 r1"
+    assert compiler.session is not first
+    assert first.states == ["q0", "q1", "q2"]
+
+
+def test_last_sessions_are_per_thread():
+    import pickle
+
+    compiler = SessionCompiler()
+    barrier = threading.Barrier(8)
+
+    def compile_and_inspect(i):
+        compiler.compile(program(f"t{i}_", i + 1))
+        # Every thread has compiled before any inspects its results
+        barrier.wait()
+        return compiler.session.states
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(compile_and_inspect, range(8)))
+    assert results == [[f"t{i}_{j}" for j in range(i + 1)] for i in range(8)]
+    assert compiler.session is None
+
+    compiler.compile(program("q", 1))
+    assert pickle.loads(pickle.dumps(compiler)).session is None
+
+
+def test_session_state_of_failed_compiles():
+    compiler = SessionCompiler()
+    compiler.compile(program("q", 3))
+    with pytest.raises(VarphiSyntaxError):
+        compiler.compile("a (0) b (1)")
+    assert compiler.session.states == []
+
+
+@pytest.mark.parametrize("frontend", ["fast", "antlr"])
+@pytest.mark.parametrize("method", ["compile", "compile_stream"])
+def test_concurrent_compiles_by_one_compiler(frontend, method):
+    compiler = SessionCompiler()
+    compiler.frontend = frontend
+    barrier = threading.Barrier(8)
+
+    def run(index: int) -> str:
+        source = program(f"t{index}_", 50 + index)
+        barrier.wait()
+        if method == "compile":
+            return compiler.compile(source)
+        return compiler.compile_stream(source.splitlines(True))
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(run, range(8)))
+    assert results == [expected(f"t{index}_", 50 + index) for index in range(8)]
+
+
+def test_concurrent_diagnostics():
+    compiler = SessionCompiler()
+    compiler.frontend = "antlr"
+    programs = [
+        program(f"t{index}_", index) + f"bad{index} (0) x (1) (LEFT, LEFT)\n"
+        for index in range(1, 9)
+    ]
+
+    def run(source: str) -> tuple:
+        try:
+            compiler.compile(source)
+        except VarphiSyntaxError as error:
+            return error.line, error.source_line
+        return None
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(run, programs * 4))
+    assert (
+        results
+        == [(index + 1, f"bad{index} (0) x (1) (LEFT, LEFT)") for index in range(1, 9)]
+        * 4
+    )
+
+
+def test_incremental_compiler_with_sessions():
+    incremental = VarphiIncrementalCompiler(SessionCompiler)
+    assert incremental.compile(program("q", 3)) == "q0 q1 q2"
+    assert incremental.compile(program("q", 4)) == "q0 q1 q2 q3"
+
+
+def test_parser_pool_reuses_recognizers():
+    pool = VarphiParserPool(max_size=1)
+    with pool.parser("s0 (1) s1 (0) (LEFT)\n") as (_, parser):
+        parser.program()
+        with pool.parser("s0 (1) s1 (0) (LEFT)\n") as (_, nested):
+            assert nested is not parser
+    assert len(pool) == 1
+
+    # The lexer error is raised while entering a rule, which leaves the state of the parser behind
+    with pytest.raises(VarphiSyntaxError):
+        with pool.parser("# s0 (1) s1 (0) (LEFT)\n", 5) as (_, reused):
+            assert reused in (parser, nested)
+            reused.program()
+
+    # Reused recognizers start over with the default settings
+    with pool.parser("a (1) b (0) (LEFT)\nb (1) c (0) (STAY)", 3) as (tokens, reused):
+        tree = reused.program()
+        assert reused.getNumberOfSyntaxErrors() == 0
+        # Error recovery walks up to a root context that was not invoked from anywhere
+        assert tree.invokingState == -1
+        assert [t.line for t in tokens.tokens if t.text == "b"] == [3, 4]
+    pool.clear()
+    assert len(pool) == 0
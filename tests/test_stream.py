@@ -0,0 +1,93 @@
+import tracemalloc
+import pytest
+from varphi_devkit import (
+    VarphiCompiler,
+    VarphiTransition,
+    VarphiSyntaxError,
+    VarphiGlobalTapeCountError,
+)
+from helpers import MockCompiler
+
+
+class CountingCompiler(VarphiCompiler):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def handle_transition(self, transition: VarphiTransition) -> None:
+        self.count += 1
+
+    def generate_compiled_program(self) -> str:
+        return str(self.count)
+
+
+CODE = """// header
+s0 ($x, 1) s1 ($x, BLANK) (LEFT, STAY)
+/* a
+   block */ s1 (0, 1) s0 (1, 0) (RIGHT, RIGHT)
+"""
+
+
+@pytest.mark.parametrize("frontend", ["fast", "antlr"])
+def test_stream_matches_compile(frontend):
+    expected = MockCompiler()
+    expected.compile(CODE)
+
+    compiler = MockCompiler()
+    compiler.frontend = frontend
+    assert (
+        compiler.compile_stream(CODE.splitlines(keepends=True)) == "COMPILATION_SUCCESS"
+    )
+    assert compiler.captured_transitions == expected.captured_transitions
+
+
+def test_stream_from_file(tmp_path):
+    path = tmp_path / "program.varphi"
+    path.write_text(CODE.replace("\n", "\r\n"), newline="")
+    compiler = MockCompiler()
+    with open(path, newline="\n") as f:
+        compiler.compile_stream(f)
+    assert [t.line_number for t in compiler.captured_transitions] == [2, 4]
+
+
+def test_stream_handles_transitions_before_errors():
+    lines = ["s0 (a) s1 (b) (LEFT)\n", "\n", "s1 (a) s2 (b) (LEFT) junk\n"]
+    compiler = MockCompiler()
+    with pytest.raises(VarphiSyntaxError) as exc:
+        compiler.compile_stream(lines)
+    assert len(compiler.captured_transitions) == 1
+    assert exc.value.line == 3
+    assert "s1 (a) s2 (b) (LEFT) junk" in str(exc.value)
+
+
+def test_stream_enforces_global_tape_count():
+    lines = ["s0 (a) s1 (b) (LEFT)\n", "s1 (a, b) s2 (b, a) (LEFT, LEFT)\n"]
+    with pytest.raises(VarphiGlobalTapeCountError) as exc:
+        MockCompiler().compile_stream(lines)
+    assert exc.value.line == 2
+    assert "previous transitions used 1" in exc.value.msg
+
+
+def test_stream_requires_a_transition():
+    with pytest.raises(VarphiSyntaxError):
+        MockCompiler().compile_stream(["// nothing here\n"])
+
+
+def test_stream_memory_is_bounded():
+    def program(n):
+        for i in range(n):
+            yield f"q{i} (0, $x) q{i + 1} (1, $x) (RIGHT, LEFT)\n"
+
+    def peak(n):
+        compiler = CountingCompiler()
+        tracemalloc.start()
+        try:
+            compiler.compile_stream(program(n))
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    # Measured first, so that memory allocated once (e.g. by caches) counts here
+    small = peak(2_000)
+    # Memory growing with the number of lines would take about 50 times as much
+    assert peak(100_000) < 3 * small
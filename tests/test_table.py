@@ -0,0 +1,97 @@
+import pickle
+import pytest
+from typing import List
+from varphi_devkit import (
+    VarphiTableCompiler,
+    VarphiTransition,
+    VarphiTransitionTable,
+    VarphiSyntaxError,
+)
+from helpers import MockCompiler
+
+
+class TableCompiler(VarphiTableCompiler):
+    def generate_compiled_program(self) -> str:
+        return str(len(self.table))
+
+
+CODE = """
+s0 ($x, 1) s1 ($x, BLANK) (LEFT, STAY)
+s1 (0, $y) s0 ($y, 0) (RIGHT, RIGHT)
+s0 (0, 1) s2 (0, BLANK) (LEFT, STAY)
+"""
+
+
+def full_transitions(program: str) -> List[VarphiTransition]:
+    compiler = MockCompiler()
+    compiler.compile(program)
+    return compiler.captured_transitions
+
+
+def test_table_columns():
+    compiler = TableCompiler()
+    assert compiler.compile(CODE) == "3"
+    table = compiler.table
+    assert table.tape_count == 2
+    assert table.tables.states.names == ["s0", "s1", "s2"]
+    assert list(table.current_states) == [0, 1, 0]
+    assert list(table.next_states) == [1, 0, 2]
+    assert list(table.shift_directions) == [0, 2, 1, 1, 0, 2]
+    assert list(table.line_numbers) == [2, 3, 4]
+    assert [table.tables.symbols[i] for i in table.write_symbols] == [
+        "$1",
+        "_",
+        "$1",
+        "0",
+        "0",
+        "_",
+    ]
+
+
+def test_table_rows_match_transitions():
+    compiler = TableCompiler()
+    compiler.compile(CODE)
+    assert list(compiler.table) == full_transitions(CODE)
+    assert compiler.table.transition(1) == full_transitions(CODE)[1]
+
+
+def test_table_is_reset_between_programs():
+    compiler = TableCompiler()
+    compiler.compile(CODE)
+    assert compiler.compile_stream(["q (1) q (0) (STAY)\n"]) == "1"
+    assert compiler.table.tables.states.names == ["q"]
+
+    with pytest.raises(VarphiSyntaxError):
+        compiler.compile("q (1) q (0)")
+    assert compiler.table is None
+
+
+def test_table_rejects_other_tape_counts():
+    table = VarphiTransitionTable(1)
+    with pytest.raises(ValueError):
+        table.append(full_transitions(CODE)[0])
+
+
+def test_table_compiler_rejects_compact_transitions():
+    class CompactTableCompiler(TableCompiler):
+        compact = True
+
+    with pytest.raises(ValueError):
+        CompactTableCompiler().compile(CODE)
+
+
+def test_table_pickles():
+    compiler = TableCompiler()
+    compiler.compile(CODE)
+    table = pickle.loads(pickle.dumps(compiler.table))
+    assert list(table) == full_transitions(CODE)
+
+
+def test_table_numpy_views():
+    pytest.importorskip("numpy")
+    compiler = TableCompiler()
+    compiler.compile(CODE)
+    columns = compiler.table.to_numpy()
+    assert columns["read_symbols"].shape == (3, 2)
+    assert columns["current_states"].tolist() == [0, 1, 0]
+    assert columns["shift_directions"].tolist() == [[0, 2], [1, 1], [0, 2]]